@@ -5,7 +5,7 @@ TABLE TRACKER PRO - CLEAN START
 
 import os
 import sys
-from flask import Flask
+from flask import Flask, Response, request, send_from_directory
 from flask_login import LoginManager
 from flask_cors import CORS
 
@@ -24,23 +24,61 @@ from routes.billing import billing_bp
 from routes.api import api_bp
 from routes.api_users import api_users_bp
 from utils.helpers import get_local_ip
+from utils.json_provider import init_json
+from utils.decorators import admin_only
+from utils.profiling import route_profiler, stack_sampler, memory_profiler, list_profile_files
+from utils.tracing import init_tracing, tracer, waterfall
+from utils.admission import admission
+from utils.tokens import token_signer
 from database.init_db import init_database
+from database.maintenance import maintenance_scheduler
+from database.venues import venue_router
+from server import serve
 
 # Initialize Table Manager
 print("🎯 Initializing Table Manager...")
 table_manager = TableManager()
+venue_router.register(Config.DEFAULT_VENUE, table_manager=table_manager)
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
     CORS(app)
     
+    # Fast JSON encoding and gzip for the large table/customer payloads
+    init_json(app)
+    
+    # Per-request trace IDs and spans (viewable at /debug/traces)
+    init_tracing(app)
+    
+    # On-demand per-route cProfile (armed via /debug/profile/route)
+    route_profiler.init_app(app)
+    
+    # Bounded read/write concurrency with load shedding, per-user rate limits
+    admission.init_app(app)
+    
     # Ensure directories
     Config.ensure_directories()
     
     # Initialize database
     init_database()
     
+    # Stored passwords are salted hashes from here on
+    User.upgrade_password_hashes()
+    
+    # Pick up table_config now that the tables exist
+    table_manager.reload_config()
+    table_manager.reload_history()
+    
+    # The models were built at import time, before the migration above;
+    # load what they could not read from the old schema
+    customer_model = venue_router.get_customers(Config.DEFAULT_VENUE)
+    customer_model._fold_ledger()
+    customer_model._load_leaderboard()
+    
+    # Daily close-out: ANALYZE, incremental vacuum, WAL checkpoint, snapshot
+    maintenance_scheduler.start()
+    
     # Setup Flask-Login
     login_manager = LoginManager()
     login_manager.init_app(app)
@@ -50,6 +88,13 @@ def create_app():
     def load_user(user_id):
         return User.get(user_id)
     
+    # API clients send `Authorization: Bearer <token>` from /api/auth/token;
+    # verified with the token key alone - no session, no users.json read
+    @login_manager.request_loader
+    def load_user_from_token(request):
+        claims = token_signer.verify_header(request.headers.get('Authorization'))
+        return User.from_token(claims) if claims else None
+    
     # Register blueprints
     app.register_blueprint(auth_bp)
     app.register_blueprint(main_bp)
@@ -65,23 +110,97 @@ app = create_app()
 
 # Debug routes
 @app.route('/debug/users')
+@admin_only
 def debug_users():
     users = User.get_all_users()
     return {
-        'users': users,
+        'users': {username: {'role': data['role']} for username, data in users.items()},
         'file': USERS_FILE,
         'total': len(users)
     }
 
-@app.route('/debug/test-auth/<username>/<password>')
-def debug_auth(username, password):
-    auth_result = User.authenticate(username, password)
+# Profiling routes (Admin only)
+@app.route('/debug/profile/route', methods=['POST'])
+@admin_only
+def debug_profile_route():
+    data = request.get_json(silent=True) or {}
+    endpoint = data.get('endpoint')
+    try:
+        count = int(data.get('count', 1))
+    except (TypeError, ValueError):
+        return {'success': False, 'error': 'count must be an integer'}, 400
+    
+    if count < 1:
+        return {'success': False, 'error': 'count must be at least 1'}, 400
+    if endpoint not in app.view_functions:
+        return {'success': False, 'error': f'Unknown endpoint: {endpoint}'}, 400
+    
+    route_profiler.arm(endpoint, count)
+    return {'success': True, 'armed': route_profiler.status()}
+
+@app.route('/debug/profile/sampler/start', methods=['POST'])
+@admin_only
+def debug_sampler_start():
+    data = request.get_json(silent=True) or {}
+    started = stack_sampler.start(data.get('interval'), data.get('duration'))
+    return {'success': started, 'sampler': stack_sampler.status()}
+
+@app.route('/debug/profile/sampler/stop', methods=['POST'])
+@admin_only
+def debug_sampler_stop():
+    path = stack_sampler.stop()
+    return {'success': path is not None, 'file': os.path.basename(path) if path else None}
+
+@app.route('/debug/profile/memory/snapshot', methods=['POST'])
+@admin_only
+def debug_memory_snapshot():
+    data = request.get_json(silent=True) or {}
+    try:
+        limit = int(data.get('limit', 25))
+    except (TypeError, ValueError):
+        return {'success': False, 'error': 'limit must be an integer'}, 400
+    return {'success': True, **memory_profiler.snapshot(limit)}
+
+@app.route('/debug/profile/memory/stop', methods=['POST'])
+@admin_only
+def debug_memory_stop():
+    memory_profiler.stop()
+    return {'success': True}
+
+@app.route('/debug/profile/files')
+@admin_only
+def debug_profile_files():
     return {
-        'username': username,
-        'success': auth_result is not None,
-        'available_users': list(User.get_all_users().keys())
+        'success': True,
+        'files': list_profile_files(),
+        'armed_routes': route_profiler.status(),
+        'sampler': stack_sampler.status()
     }
 
+@app.route('/debug/profile/files/<path:filename>')
+@admin_only
+def debug_profile_download(filename):
+    return send_from_directory(Config.PROFILE_DIR, filename, as_attachment=True)
+
+# Tracing routes (Admin only)
+@app.route('/debug/traces')
+@admin_only
+def debug_traces():
+    slow_only = request.args.get('slow') == '1'
+    limit = request.args.get('limit', 50, type=int)
+    return {'success': True, 'slow_ms': Config.TRACE_SLOW_MS, 'traces': tracer.list(slow_only, limit)}
+
+@app.route('/debug/traces/<trace_id>')
+@admin_only
+def debug_trace_detail(trace_id):
+    trace = tracer.find(trace_id)
+    if trace is None:
+        return {'success': False, 'error': 'Trace not found (may have left the buffer)'}, 404
+    
+    if request.args.get('format') == 'text':
+        return Response(waterfall(trace), mimetype='text/plain')
+    return {'success': True, 'trace': trace.to_dict()}
+
 def run_application():
     try:
         local_ip = get_local_ip()
@@ -94,15 +213,13 @@ def run_application():
         print("="*50)
         print(f"👥 USERS ({len(users)}):")
         for username, data in users.items():
-            print(f"   {username} / {data['password']} ({data['role']})")
+            print(f"   {username} ({data['role']})")
         print("="*50)
         print(f"🌐 URL: http://{local_ip}:{port}")
         print("="*50)
         
-        app.run(host='0.0.0.0', port=port, debug=False)
-        
-    except KeyboardInterrupt:
-        table_manager.stop()
+        # Drains and flushes on SIGTERM/Ctrl+C before returning
+        serve(app)
         sys.exit(0)
     except Exception as e:
         print(f"❌ Error: {e}")
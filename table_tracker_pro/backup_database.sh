@@ -1,20 +1,20 @@
 #!/bin/bash
 # Table Tracker Pro Database Backup Script
+# Database snapshots go to the deduplicated store in backups/store
+# (see database/backup_store.py for retention and restore).
 
-BACKUP_DIR="/home/h21s/table_tracker_pro/backups"
+APP_DIR="/home/h21s/table_tracker_pro"
+BACKUP_DIR="$APP_DIR/backups"
 DATE=$(date +%Y%m%d_%H%M%S)
-DB_FILE="/home/h21s/table_tracker_pro/data/table_tracker.db"
-EXPORT_FILE="/home/h21s/table_tracker_pro/data/customer_export.txt"
+EXPORT_FILE="$APP_DIR/data/customer_export.txt"
 
-# Create backup directory
-mkdir -p $BACKUP_DIR
+cd "$APP_DIR" || exit 1
 
-# Backup database
-if [ -f "$DB_FILE" ]; then
-    cp "$DB_FILE" "$BACKUP_DIR/table_tracker_$DATE.db"
-    echo "✅ Database backed up: table_tracker_$DATE.db"
+# Snapshot database (only changed chunks are stored) and apply retention
+if python3 -m database.backup_store backup scheduled; then
+    echo "✅ Database snapshot stored"
 else
-    echo "❌ Database file not found"
+    echo "❌ Database snapshot failed"
 fi
 
 # Backup export file
@@ -23,8 +23,7 @@ if [ -f "$EXPORT_FILE" ]; then
     echo "✅ Export file backed up: customer_export_$DATE.txt"
 fi
 
-# Keep only last 10 backups
-ls -t $BACKUP_DIR/table_tracker_*.db | tail -n +11 | xargs -r rm
+# Keep only last 10 export copies
 ls -t $BACKUP_DIR/customer_export_*.txt | tail -n +11 | xargs -r rm
 
 echo "🎯 Backup completed successfully!"
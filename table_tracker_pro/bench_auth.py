@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Benchmark the per-request cost of authenticating an API call
+
+Compares the cookie-session path (Flask-Login's user_loader reading
+users.json on every request) with verifying a bearer token from
+/api/auth/token, and shows the one-off salted hash check paid when a
+token is issued.
+
+Usage: python3 bench_auth.py [rounds]
+"""
+
+import json
+import os
+import sys
+import time
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from utils.tokens import TokenSigner
+
+USERS_PATH = os.path.join(os.path.dirname(__file__), 'data', 'users.json')
+
+
+def session_lookup(username):
+    # What load_user -> User.get does for each cookie-authenticated request
+    with open(USERS_PATH, 'r') as f:
+        users = json.load(f)
+    return users.get(username)
+
+
+def timeit(fn, arg, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn(arg)
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    signer = TokenSigner(secret='bench-secret')
+    token, _ = signer.issue('staff1', 'staff')
+    header = f"Bearer {token}"
+
+    print(f"🔐 Per-request authentication ({rounds} rounds)")
+    session = timeit(session_lookup, 'staff1', rounds)
+    bearer = timeit(signer.verify_header, header, rounds)
+    print(f"   session: users.json read:  {session:8.2f} µs")
+    print(f"   bearer: HMAC verify:       {bearer:8.2f} µs  ({session / bearer:.1f}x less)")
+
+    stored = generate_password_hash('staff123')
+    hash_rounds = 5
+    start = time.perf_counter()
+    for _ in range(hash_rounds):
+        check_password_hash(stored, 'staff123')
+    issue = (time.perf_counter() - start) / hash_rounds * 1000
+    print(f"   token issue: hash check:   {issue:8.2f} ms  (once per token, {stored.split('$')[0]})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark serialization and gzip for a /api/customers/all sized payload
+
+Usage: python3 bench_json.py [customer_count]
+"""
+
+import gzip
+import json
+import random
+import sys
+import time
+from datetime import datetime
+
+from utils.serialization import JSON_BACKEND, dumps_bytes
+
+
+def build_payload(count):
+    random.seed(42)
+    customers = []
+    for i in range(1, count + 1):
+        total = round(random.uniform(0, 50000), 2)
+        customers.append({
+            'id': i, 'name': f'Customer {i}', 'phone': f'98{i:08d}',
+            'total_amount': total, 'total_minutes': round(total / 3, 1),
+            'snooker_amount': round(total * 0.6, 2), 'snooker_minutes': round(total / 5, 1),
+            'pool_amount': round(total * 0.4, 2), 'pool_minutes': round(total / 7, 1),
+            'today_amount': 0, 'today_minutes': 0,
+            'last_session_time': '2025-09-15 09:16:31'
+        })
+    tables = {table_id: {'status': 'running', 'time': '12:34', 'rate': 4.0, 'amount': 50.2,
+                         'start_time': datetime.now(), 'elapsed_seconds': 754, 'sessions': [],
+                         'session_start_time': '10:00:00', 'last_update': datetime.now()}
+              for table_id in range(1, 4)}
+    return {
+        'success': True,
+        'customers': customers,
+        'today_stats': {'total_customers': count, 'today_total_amount': 0},
+        'top_customers': [[c['name'], c['total_amount']] for c in customers[:5]],
+        'tables': tables
+    }
+
+
+def flask_default_dumps(obj):
+    # Mirrors Flask's DefaultJSONProvider: sorted keys, ASCII-escaped, compact
+    def default(o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        raise TypeError
+    return json.dumps(obj, default=default, sort_keys=True, ensure_ascii=True,
+                      separators=(',', ':')).encode('utf-8')
+
+
+def timeit(fn, payload, rounds=20):
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn(payload)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    payload = build_payload(count)
+
+    print(f"📊 Payload: {count} customers, backend: {JSON_BACKEND}")
+    baseline = timeit(flask_default_dumps, payload)
+    fast = timeit(dumps_bytes, payload)
+    print(f"   stdlib json (Flask default): {baseline:8.2f} ms")
+    print(f"   dumps_bytes ({JSON_BACKEND}):      {fast:8.2f} ms  ({baseline / fast:.1f}x)")
+
+    body = dumps_bytes(payload)
+    print(f"   raw size:                    {len(body) / 1024:8.1f} KiB")
+    for level in (1, 5, 9):
+        start = time.perf_counter()
+        compressed = gzip.compress(body, compresslevel=level)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"   gzip level {level}:                {len(compressed) / 1024:8.1f} KiB  "
+              f"({len(compressed) / len(body):.0%}, {elapsed:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
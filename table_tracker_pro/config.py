@@ -4,6 +4,14 @@ class Config:
     # Database Configuration
     DATABASE_PATH = os.path.join(os.path.dirname(__file__), 'data', 'table_tracker.db')
     EXPORT_PATH = os.path.join(os.path.dirname(__file__), 'data', 'customer_export.txt')
+    PROFILE_DIR = os.path.join(os.path.dirname(__file__), 'data', 'profiles')
+    BACKUP_DIR = os.path.join(os.path.dirname(__file__), 'backups')
+    BACKUP_STORE_DIR = os.path.join(os.path.dirname(__file__), 'backups', 'store')
+    TRACE_SLOW_LOG = os.path.join(os.path.dirname(__file__), 'data', 'slow_traces.jsonl')
+    VENUE_DB_DIR = os.path.join(os.path.dirname(__file__), 'data', 'venues')
+    REPLICATION_OUTBOX_DIR = os.path.join(os.path.dirname(__file__), 'data', 'replication', 'outbox')
+    CENTRAL_DB_PATH = os.path.join(os.path.dirname(__file__), 'data', 'central_reporting.db')
+    DAILY_SNAPSHOT_DIR = os.path.join(os.path.dirname(__file__), 'backups', 'daily')
     
     # Server Configuration
     HOST = '0.0.0.0'
@@ -11,6 +19,35 @@ class Config:
     DEBUG = False  # DISABLED DEBUG MODE
     SECRET_KEY = 'table-tracker-pro-secret-key-2025'
     
+    # Response compression (gzip) for bodies above this many bytes
+    COMPRESS_MIN_SIZE = 1024
+    COMPRESS_LEVEL = 1
+    
+    # Profiling (admin /debug/profile/*)
+    PROFILE_SAMPLE_INTERVAL = 0.01
+    TRACEMALLOC_FRAMES = 10
+    
+    # Request tracing: recent traces kept in memory, slow ones logged as JSON lines
+    TRACE_BUFFER_SIZE = 200
+    TRACE_SLOW_MS = 250
+    TRACE_MAX_SPANS = 500
+    
+    # Backup store: chunking, compression and grandfather-father-son retention
+    BACKUP_PAGES_PER_CHUNK = 16
+    BACKUP_COMPRESS_LEVEL = 6
+    BACKUP_KEEP_RECENT = 10
+    BACKUP_KEEP_HOURLY = 24
+    BACKUP_KEEP_DAILY = 14
+    BACKUP_KEEP_WEEKLY = 8
+    
+    # Bulk customer import
+    IMPORT_BATCH_SIZE = 5000
+    IMPORT_MAX_ERRORS = 1000
+    PHONE_COUNTRY_CODE = '91'
+    
+    # Streaming export: rows fetched from SQLite per chunk
+    EXPORT_FETCH_SIZE = 1000
+    
     # Table Configuration
     SNOOKER_TABLES = {
         1: {"rate": 4.0},
@@ -27,6 +64,106 @@ class Config:
     # Available rates for all tables (₹2.0 to ₹10.0)
     AVAILABLE_RATES = [2.0, 2.5, 3.0, 3.5, 4.0, 4.5, 5.0, 5.5, 6.0, 6.5, 7.0, 7.5, 8.0, 8.5, 9.0, 9.5, 10.0]
     
+    # Maximum number of table actions accepted in one batch request
+    BATCH_MAX_ACTIONS = 100
+    
+    # Offline sync: operations per request, dedupe window and change feed length
+    SYNC_MAX_OPERATIONS = 200
+    SYNC_DEDUPE_TTL_SECONDS = 24 * 60 * 60
+    SYNC_DEDUPE_MAX = 20000
+    SYNC_FEED_SIZE = 5000
+    
+    # Venue shards: each extra venue gets its own database under VENUE_DB_DIR,
+    # selected per request with the X-Venue header or ?venue= parameter.
+    # VENUE_ACCESS lists the venues each role may select ('*' for all);
+    # roles not listed get DEFAULT_VENUE only
+    DEFAULT_VENUE = 'main'
+    VENUES = ['main']
+    VENUE_ACCESS = {'admin': ['*']}
+    
+    # Replication to head office: changed rows shipped per batch file (per table)
+    REPLICATION_BATCH_ROWS = 5000
+    
+    # Ledger balance snapshots: the tail of new entries is folded into customer
+    # totals every interval, or sooner once it reaches MAX_TAIL entries
+    LEDGER_SNAPSHOT_INTERVAL = 60
+    LEDGER_SNAPSHOT_MAX_TAIL = 500
+    
+    # Ledger reconciliation (python3 -m database.reconcile)
+    RECONCILE_WORKERS = os.cpu_count() or 2
+    RECONCILE_PARTITIONS_PER_WORKER = 4
+    RECONCILE_BATCH_SIZE = 1000
+    
+    # Reservations: walk-ins cannot start on a table booked within the buffer
+    RESERVATION_WALKIN_BUFFER_MINUTES = 30
+    RESERVATION_DEFAULT_MINUTES = 60
+    RESERVATION_MAX_MINUTES = 360
+    
+    # Walk-in waitlist: wait estimates use the mean of the last STATS_WINDOW
+    # sessions per game type; a called party has CALL_TIMEOUT to take the table
+    WAITLIST_STATS_WINDOW = 50
+    WAITLIST_DEFAULT_SESSION_MINUTES = 45
+    WAITLIST_DEFAULT_PRIORITY = 5
+    WAITLIST_CALL_TIMEOUT_MINUTES = 10
+    WAITLIST_KEEP_FINISHED_MINUTES = 120
+    
+    # Prepaid time blocks: warn this many minutes before expiry; alerts go to
+    # each named notifier (see models.deadlines.NOTIFIERS) and the alerts API
+    PREPAID_WARNING_MINUTES = 5
+    ALERT_NOTIFIERS = ['feed', 'log']
+    ALERT_HISTORY = 500
+    
+    # Production server (server.py): waitress threads and keep-alive; on SIGTERM
+    # in-flight requests get DRAIN_TIMEOUT seconds before clocks are saved.
+    # Table state is per process, so WORKERS above 1 is refused
+    SERVER_THREADS = 8
+    SERVER_WORKERS = 1
+    SERVER_KEEPALIVE_SECONDS = 5
+    SERVER_CONNECTION_LIMIT = 100
+    SERVER_DRAIN_TIMEOUT = 20
+    
+    # Saved clocks of running tables keep counting through a restart this short
+    CLOCK_RESTORE_MAX_GAP_MINUTES = 10
+    
+    # Close-out maintenance (database.maintenance), daily at CLOSEOUT_TIME:
+    # incremental vacuum frees VACUUM_PAGES per short step for at most
+    # VACUUM_BUDGET_SECONDS; the last KEEP_SNAPSHOTS daily copies are kept
+    MAINTENANCE_CLOSEOUT_TIME = '04:00'
+    MAINTENANCE_VACUUM_PAGES = 200
+    MAINTENANCE_VACUUM_PAUSE = 0.05
+    MAINTENANCE_VACUUM_BUDGET_SECONDS = 60
+    MAINTENANCE_ANALYSIS_LIMIT = 1000
+    MAINTENANCE_KEEP_SNAPSHOTS = 7
+    
+    # Admission control (utils.admission) for /api: at most READ/WRITE_LIMIT
+    # requests run at once per class, QUEUE more wait up to QUEUE_TIMEOUT
+    # seconds and the rest get 503 + Retry-After. Token buckets per user
+    # throttle logins (per username and address) and writes with 429.
+    # Streamed exports and history pages use their own STREAM pool
+    ADMISSION_READ_LIMIT = 4
+    ADMISSION_WRITE_LIMIT = 2
+    ADMISSION_STREAM_LIMIT = 2
+    ADMISSION_READ_QUEUE = 8
+    ADMISSION_WRITE_QUEUE = 4
+    ADMISSION_STREAM_QUEUE = 2
+    ADMISSION_QUEUE_TIMEOUT = 0.5
+    ADMISSION_RETRY_AFTER = 2
+    RATE_LIMIT_LOGIN_PER_MINUTE = 5
+    RATE_LIMIT_LOGIN_BURST = 5
+    RATE_LIMIT_WRITES_PER_SECOND = 5
+    RATE_LIMIT_WRITES_BURST = 20
+    
+    # Bearer tokens from POST /api/auth/token (utils.tokens): HMAC-signed,
+    # valid TOKEN_TTL_MINUTES, verified without touching the user store.
+    # Without TABLE_TRACKER_TOKEN_SECRET a random key is generated once and
+    # kept in TOKEN_KEY_FILE (mode 0600) - never the public SECRET_KEY
+    API_TOKEN_SECRET = os.environ.get('TABLE_TRACKER_TOKEN_SECRET')
+    API_TOKEN_KEY_FILE = os.path.join(os.path.dirname(__file__), 'data', 'api_token.key')
+    API_TOKEN_TTL_MINUTES = 30
+    
+    # Leaderboard Configuration (entries kept in each in-process top-K heap)
+    LEADERBOARD_SIZE = 50
+    
     # User Management
     DEFAULT_USERS = {
         'admin': {'password': 'admin123', 'role': 'admin'},
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Content-addressed backup store for table_tracker.db
+
+Each snapshot is a consistent copy of the database (SQLite online backup
+API) split into page-aligned chunks. Chunks are stored once, zlib
+compressed, under objects/<sha256>; a snapshot is just a JSON manifest
+listing its chunks. Retention is grandfather-father-son and unreferenced
+chunks are garbage collected after pruning.
+
+Usage (from the project directory):
+    python3 -m database.backup_store backup [label]
+    python3 -m database.backup_store list
+    python3 -m database.backup_store verify <snapshot_id>
+    python3 -m database.backup_store restore <snapshot_id> <target_path>
+    python3 -m database.backup_store prune
+    python3 -m database.backup_store import-legacy
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import zlib
+from contextlib import contextmanager
+from datetime import datetime
+from config import Config
+
+
+class BackupError(Exception):
+    pass
+
+
+class BackupStore:
+    def __init__(self, root=None, db_path=None):
+        self.root = root or Config.BACKUP_STORE_DIR
+        self.db_path = db_path or Config.DATABASE_PATH
+        self.objects_dir = os.path.join(self.root, 'objects')
+        self.snapshots_dir = os.path.join(self.root, 'snapshots')
+        self.lock_path = os.path.join(self.root, '.lock')
+        self.lock = threading.Lock()
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.snapshots_dir, exist_ok=True)
+
+    @contextmanager
+    def _locked(self, shared=False):
+        """Hold the store against other threads and other processes (the cron backup
+        and the app): chunk GC must never run between a chunk write and its manifest"""
+        with self.lock:
+            with open(self.lock_path, 'a') as f:
+                fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    # ------------------------------------------------------------------
+    # Objects and manifests
+    # ------------------------------------------------------------------
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def _write_atomic(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp_')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        dir_fd = os.open(os.path.dirname(path), os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+    def _store_chunk(self, chunk):
+        """Store a chunk if unseen, returning (digest, bytes written)"""
+        digest = hashlib.sha256(chunk).hexdigest()
+        path = self._object_path(digest)
+        if os.path.exists(path):
+            return digest, 0
+        data = zlib.compress(chunk, Config.BACKUP_COMPRESS_LEVEL)
+        self._write_atomic(path, data)
+        return digest, len(data)
+
+    def _read_chunk(self, digest):
+        with open(self._object_path(digest), 'rb') as f:
+            chunk = zlib.decompress(f.read())
+        if hashlib.sha256(chunk).hexdigest() != digest:
+            raise BackupError(f"Chunk {digest[:12]} is corrupt")
+        return chunk
+
+    def list_snapshots(self):
+        """All manifests, newest first"""
+        manifests = []
+        for name in os.listdir(self.snapshots_dir):
+            if name.endswith('.json'):
+                with open(os.path.join(self.snapshots_dir, name)) as f:
+                    manifests.append(json.load(f))
+        manifests.sort(key=lambda m: m['id'], reverse=True)
+        return manifests
+
+    def get_snapshot(self, snapshot_id):
+        path = os.path.join(self.snapshots_dir, f"{snapshot_id}.json")
+        if not os.path.exists(path):
+            raise BackupError(f"Snapshot not found: {snapshot_id}")
+        with open(path) as f:
+            return json.load(f)
+
+    # ------------------------------------------------------------------
+    # Snapshot / restore
+    # ------------------------------------------------------------------
+
+    def snapshot(self, label="", source_path=None, created_at=None):
+        """Take a deduplicated snapshot, returning its manifest"""
+        source_path = source_path or self.db_path
+        if not os.path.exists(source_path):
+            raise BackupError(f"Database not found: {source_path}")
+
+        with self._locked():
+            fd, copy_path = tempfile.mkstemp(dir=self.root, prefix='.snapshot_', suffix='.db')
+            os.close(fd)
+            try:
+                # Online backup API gives a consistent copy even while the app writes
+                src = sqlite3.connect(source_path)
+                dst = sqlite3.connect(copy_path)
+                src.backup(dst)
+                page_size = dst.execute("PRAGMA page_size").fetchone()[0]
+                dst.close()
+                src.close()
+
+                chunk_size = page_size * Config.BACKUP_PAGES_PER_CHUNK
+                chunks = []
+                written = 0
+                whole = hashlib.sha256()
+                size = 0
+                with open(copy_path, 'rb') as f:
+                    while True:
+                        chunk = f.read(chunk_size)
+                        if not chunk:
+                            break
+                        whole.update(chunk)
+                        size += len(chunk)
+                        digest, stored = self._store_chunk(chunk)
+                        chunks.append(digest)
+                        written += stored
+            finally:
+                os.remove(copy_path)
+
+            latest = self.list_snapshots()[:1]
+            if latest and latest[0]['sha256'] == whole.hexdigest() and created_at is None:
+                print(f"💾 Backup unchanged since {latest[0]['id']} - skipped")
+                return latest[0]
+
+            created = created_at or datetime.now()
+            safe_label = re.sub(r'[^A-Za-z0-9_-]', '', label)[:40]
+            manifest = {
+                'id': created.strftime('%Y%m%dT%H%M%S_%f') + (f"_{safe_label}" if safe_label else ''),
+                'created_at': created.isoformat(timespec='seconds'),
+                'label': label,
+                'page_size': page_size,
+                'chunk_size': chunk_size,
+                'size': size,
+                'sha256': whole.hexdigest(),
+                'chunks': chunks,
+                'new_bytes': written
+            }
+            self._write_atomic(os.path.join(self.snapshots_dir, f"{manifest['id']}.json"),
+                               json.dumps(manifest).encode())
+
+        print(f"💾 Backup {manifest['id']}: {size} bytes, {len(chunks)} chunks, {written} new bytes stored")
+        self.prune()
+        return manifest
+
+    def restore(self, snapshot_id, target_path, verify=True):
+        """Rebuild a snapshot at target_path, checking hashes and PRAGMA integrity_check"""
+        with self._locked(shared=True):
+            return self._restore(snapshot_id, target_path, verify)
+
+    def _restore(self, snapshot_id, target_path, verify):
+        manifest = self.get_snapshot(snapshot_id)
+        target_dir = os.path.dirname(os.path.abspath(target_path))
+        os.makedirs(target_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=target_dir, prefix='.restore_', suffix='.db')
+
+        try:
+            whole = hashlib.sha256()
+            with os.fdopen(fd, 'wb') as f:
+                for digest in manifest['chunks']:
+                    chunk = self._read_chunk(digest)
+                    whole.update(chunk)
+                    f.write(chunk)
+
+            if whole.hexdigest() != manifest['sha256']:
+                raise BackupError(f"Snapshot {snapshot_id} does not match its checksum")
+
+            if verify:
+                conn = sqlite3.connect(tmp_path)
+                result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+                conn.close()
+                if result != 'ok':
+                    raise BackupError(f"Snapshot {snapshot_id} failed integrity_check: {result}")
+
+            os.replace(tmp_path, target_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        print(f"♻️ Restored {snapshot_id} to {target_path}")
+        return manifest
+
+    def verify(self, snapshot_id):
+        """Restore into a scratch file and run integrity_check"""
+        fd, scratch = tempfile.mkstemp(dir=self.root, prefix='.verify_', suffix='.db')
+        os.close(fd)
+        try:
+            self.restore(snapshot_id, scratch, verify=True)
+            return True
+        finally:
+            if os.path.exists(scratch):
+                os.remove(scratch)
+
+    # ------------------------------------------------------------------
+    # Retention
+    # ------------------------------------------------------------------
+
+    def _retained_ids(self, manifests):
+        keep = {m['id'] for m in manifests[:Config.BACKUP_KEEP_RECENT]}
+        schemes = [
+            ('%Y-%m-%d %H', Config.BACKUP_KEEP_HOURLY),
+            ('%Y-%m-%d', Config.BACKUP_KEEP_DAILY),
+            ('%G-W%V', Config.BACKUP_KEEP_WEEKLY),
+        ]
+        for bucket_format, count in schemes:
+            buckets = set()
+            for manifest in manifests:
+                bucket = datetime.fromisoformat(manifest['created_at']).strftime(bucket_format)
+                if bucket in buckets:
+                    continue
+                if len(buckets) >= count:
+                    break
+                # Newest snapshot of each bucket survives
+                buckets.add(bucket)
+                keep.add(manifest['id'])
+        return keep
+
+    def prune(self):
+        """Apply GFS retention, then delete chunks no snapshot references"""
+        with self._locked():
+            manifests = self.list_snapshots()
+            keep = self._retained_ids(manifests)
+            removed = 0
+            for manifest in manifests:
+                if manifest['id'] not in keep:
+                    os.remove(os.path.join(self.snapshots_dir, f"{manifest['id']}.json"))
+                    removed += 1
+
+            referenced = set()
+            for manifest in manifests:
+                if manifest['id'] in keep:
+                    referenced.update(manifest['chunks'])
+
+            freed = 0
+            for prefix in os.listdir(self.objects_dir):
+                prefix_dir = os.path.join(self.objects_dir, prefix)
+                for name in os.listdir(prefix_dir):
+                    if name not in referenced:
+                        path = os.path.join(prefix_dir, name)
+                        freed += os.path.getsize(path)
+                        os.remove(path)
+
+        if removed or freed:
+            print(f"🧹 Backup retention: removed {removed} snapshots, freed {freed} bytes")
+        return {'removed_snapshots': removed, 'freed_bytes': freed}
+
+    def stats(self):
+        manifests = self.list_snapshots()
+        stored = 0
+        objects = 0
+        for prefix in os.listdir(self.objects_dir):
+            prefix_dir = os.path.join(self.objects_dir, prefix)
+            for name in os.listdir(prefix_dir):
+                stored += os.path.getsize(os.path.join(prefix_dir, name))
+                objects += 1
+        return {
+            'snapshots': len(manifests),
+            'objects': objects,
+            'logical_bytes': sum(m['size'] for m in manifests),
+            'stored_bytes': stored,
+            'latest': manifests[0]['id'] if manifests else None
+        }
+
+    def import_legacy(self, backup_dir=None):
+        """Fold old full-copy auto_backup_*/table_tracker_*.db files into the store"""
+        backup_dir = backup_dir or Config.BACKUP_DIR
+        pattern = re.compile(r'^(?:auto_backup_(?P<label>.*)_|table_tracker_)(?P<ts>\d{8}_\d{6})\.db$')
+        imported = 0
+        for name in sorted(os.listdir(backup_dir)):
+            match = pattern.match(name)
+            if not match:
+                continue
+            created = datetime.strptime(match.group('ts'), '%Y%m%d_%H%M%S')
+            self.snapshot(match.group('label') or 'legacy', os.path.join(backup_dir, name), created)
+            os.remove(os.path.join(backup_dir, name))
+            imported += 1
+        print(f"📦 Imported {imported} legacy backups")
+        return imported
+
+
+def main(argv):
+    store = BackupStore()
+    command = argv[1] if len(argv) > 1 else 'backup'
+
+    if command == 'backup':
+        store.snapshot(argv[2] if len(argv) > 2 else 'manual')
+    elif command == 'list':
+        for manifest in store.list_snapshots():
+            print(f"{manifest['id']}  {manifest['size']:>10}  {len(manifest['chunks']):>5} chunks  {manifest['label']}")
+        print(json.dumps(store.stats()))
+    elif command == 'verify' and len(argv) > 2:
+        store.verify(argv[2])
+        print(f"✅ Snapshot {argv[2]} verified")
+    elif command == 'restore' and len(argv) > 3:
+        store.restore(argv[2], argv[3])
+    elif command == 'prune':
+        store.prune()
+    elif command == 'import-legacy':
+        store.import_legacy()
+    else:
+        print(__doc__)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Bulk customer import from CSV or JSON Lines
+
+Rows are parsed incrementally and upserted on phone number in batched
+transactions, so memory stays flat and a 100k-row loyalty list loads in
+seconds. Existing customers keep their balances; only the name is updated.
+
+Usage (from the project directory):
+    python3 -m database.bulk_import customers.csv
+    python3 -m database.bulk_import members.jsonl --format jsonl
+"""
+
+import csv
+import io
+import json
+import re
+import sqlite3
+import sys
+import time
+from datetime import date
+from config import Config
+from database.backup_store import BackupStore
+
+UPSERT_SQL = """INSERT INTO customers (name, phone, last_updated_date) VALUES (?, ?, ?)
+                ON CONFLICT(phone) DO UPDATE SET name = excluded.name"""
+
+# What errors='replace' puts in place of bytes that are not UTF-8
+INVALID_TEXT = '\ufffd'
+
+
+def normalize_phone(raw):
+    """Reduce a phone number to digits, stripping the country code or trunk 0"""
+    digits = re.sub(r'\D', '', str(raw or ''))
+    code = Config.PHONE_COUNTRY_CODE
+    if len(digits) == 10 + len(code) and digits.startswith(code):
+        digits = digits[len(code):]
+    elif len(digits) == 11 and digits.startswith('0'):
+        digits = digits[1:]
+    if not 7 <= len(digits) <= 15:
+        return None
+    return digits
+
+
+def iter_rows(stream, fmt):
+    """Yield (line number, dict) from a text stream without reading it all"""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        if reader.fieldnames:
+            reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == 'jsonl':
+        for line_no, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_no, e
+                continue
+            yield line_no, row if isinstance(row, dict) else ValueError('Row is not an object')
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+
+class BulkImporter:
+    def __init__(self, db_path=None, batch_size=None):
+        self.db_path = db_path or Config.DATABASE_PATH
+        self.batch_size = batch_size or Config.IMPORT_BATCH_SIZE
+
+    def run(self, stream, fmt='csv', backup=True):
+        started = time.perf_counter()
+        today = date.today().isoformat()
+        errors = []
+        error_count = 0
+        processed = 0
+        accepted = 0
+
+        conn = sqlite3.connect(self.db_path)
+        c = conn.cursor()
+        before = c.execute("SELECT COUNT(*) FROM customers").fetchone()[0]
+
+        batch = []
+        try:
+            for line_no, row in iter_rows(stream, fmt):
+                processed += 1
+                if isinstance(row, Exception):
+                    problem = f"Unreadable row: {row}"
+                elif any(INVALID_TEXT in str(value) for value in row.values()):
+                    # Undecodable bytes were replaced rather than aborting the import midway
+                    problem = "Row is not valid UTF-8"
+                else:
+                    name = str(row.get('name') or '').strip()
+                    phone = normalize_phone(row.get('phone'))
+                    if not name:
+                        problem = "Missing name"
+                    elif phone is None:
+                        problem = f"Invalid phone: {row.get('phone')!r}"
+                    else:
+                        problem = None
+                        batch.append((name[:100], phone, today))
+
+                if problem:
+                    error_count += 1
+                    if len(errors) < Config.IMPORT_MAX_ERRORS:
+                        errors.append({'line': line_no, 'error': problem})
+                    continue
+
+                if len(batch) >= self.batch_size:
+                    accepted += self._flush(conn, batch)
+                    batch = []
+
+            if batch:
+                accepted += self._flush(conn, batch)
+            after = c.execute("SELECT COUNT(*) FROM customers").fetchone()[0]
+        finally:
+            conn.close()
+
+        inserted = after - before
+        report = {
+            'processed': processed,
+            'inserted': inserted,
+            'updated': accepted - inserted,
+            'error_count': error_count,
+            'errors': errors,
+            'seconds': round(time.perf_counter() - started, 3)
+        }
+        print(f"📥 Bulk import: {processed} rows, {inserted} new, {accepted - inserted} updated, "
+              f"{error_count} errors in {report['seconds']}s")
+
+        if backup and accepted:
+            try:
+                BackupStore(db_path=self.db_path).snapshot('bulk_import')
+            except Exception as e:
+                print(f"⚠️ Post-import backup failed: {e}")
+        return report
+
+    def _flush(self, conn, batch):
+        with conn:
+            conn.executemany(UPSERT_SQL, batch)
+        return len(batch)
+
+
+def open_text_stream(binary_stream):
+    """Wrap an uploaded byte stream for incremental text parsing; bad bytes fail their row, not the import"""
+    return io.TextIOWrapper(binary_stream, encoding='utf-8-sig', errors='replace', newline='')
+
+
+def main(argv):
+    if len(argv) < 2:
+        print(__doc__)
+        return 1
+    path = argv[1]
+    fmt = argv[3] if len(argv) > 3 and argv[2] == '--format' else ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+
+    with open(path, encoding='utf-8-sig', errors='replace', newline='') as f:
+        report = BulkImporter().run(f, fmt)
+    for error in report['errors'][:20]:
+        print(f"   line {error['line']}: {error['error']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,160 @@
+import csv
+import io
+import json
+import sqlite3
+from datetime import date, datetime, timedelta
+from config import Config
+from utils.tracing import connect
+
+DATASETS = {
+    'customers': {
+        'columns': ['id', 'name', 'phone', 'total_amount', 'total_minutes', 'snooker_amount',
+                    'snooker_minutes', 'pool_amount', 'pool_minutes', 'today_amount',
+                    'today_minutes', 'last_session_time', 'created_date', 'deleted_date'],
+        'date_column': 'created_date',
+        'filter': 'deleted_date IS NULL',
+        'order_by': 'total_amount DESC, id',
+        'txt': [('ID', 'id', 5, False), ('NAME', 'name', 25, False), ('PHONE', 'phone', 15, False),
+                ('TOTAL', 'total_amount', 12, True), ('SNOOKER', 'snooker_amount', 12, True),
+                ('POOL', 'pool_amount', 12, True)]
+    },
+    'transactions': {
+        'columns': ['id', 'customer_id', 'amount', 'transaction_type', 'game_type',
+                    'description', 'staff_user', 'session_id', 'reverses_id', 'created_date'],
+        'date_column': 'created_date',
+        'order_by': 'created_date, id',
+        'txt': [('ID', 'id', 8, False), ('DATE', 'created_date', 20, False),
+                ('CUSTOMER', 'customer_id', 9, False), ('AMOUNT', 'amount', 12, True),
+                ('TYPE', 'transaction_type', 12, False), ('GAME', 'game_type', 9, False),
+                ('STAFF', 'staff_user', 12, False)]
+    },
+    'sessions': {
+        'columns': ['id', 'customer_id', 'table_id', 'game_type', 'start_epoch', 'end_epoch',
+                    'duration_seconds', 'amount_paise', 'rate_paise', 'staff_user'],
+        # Readable forms of the integer columns, computed per exported row
+        'derived': [('session_date', "date(start_epoch, 'unixepoch', 'localtime')"),
+                    ('start_time', "time(start_epoch, 'unixepoch', 'localtime')"),
+                    ('end_time', "time(end_epoch, 'unixepoch', 'localtime')"),
+                    ('duration_minutes', "round(duration_seconds / 60.0, 2)"),
+                    ('amount', "amount_paise / 100.0"),
+                    ('rate', "rate_paise / 100.0")],
+        'date_column': 'start_epoch',
+        'epoch_dates': True,
+        'order_by': 'start_epoch, id',
+        'txt': [('ID', 'id', 8, False), ('DATE', 'session_date', 12, False),
+                ('GAME', 'game_type', 9, False), ('TABLE', 'table_id', 6, False),
+                ('START', 'start_time', 10, False), ('END', 'end_time', 10, False),
+                ('MINUTES', 'duration_minutes', 9, False), ('AMOUNT', 'amount', 12, True)]
+    }
+}
+
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+    'txt': 'text/plain'
+}
+
+
+def parse_date_range(date_from, date_to):
+    """Validate optional YYYY-MM-DD bounds, raising ValueError if malformed"""
+    start = date.fromisoformat(date_from).isoformat() if date_from else None
+    end = date.fromisoformat(date_to).isoformat() if date_to else None
+    return start, end
+
+
+def output_columns(dataset):
+    """Column names of an exported row: stored columns, then derived ones"""
+    spec = DATASETS[dataset]
+    return spec['columns'] + [name for name, _ in spec.get('derived', [])]
+
+
+def _local_midnight(day):
+    """Epoch seconds of local midnight at the start of a date"""
+    return int(datetime.combine(day, datetime.min.time()).timestamp())
+
+
+def epoch_range(date_from, date_to):
+    """[start, end) epoch seconds covering YYYY-MM-DD days date_from..date_to inclusive (None if open)"""
+    start = _local_midnight(date.fromisoformat(date_from)) if date_from else None
+    end = _local_midnight(date.fromisoformat(date_to) + timedelta(days=1)) if date_to else None
+    return start, end
+
+
+def _build_query(dataset, date_from, date_to):
+    spec = DATASETS[dataset]
+    column = spec['date_column']
+    selected = spec['columns'] + [f"{expression} AS {name}" for name, expression in spec.get('derived', [])]
+    query = f"SELECT {', '.join(selected)} FROM {dataset}"
+    clauses = [spec['filter']] if 'filter' in spec else []
+    params = []
+    if spec.get('epoch_dates'):
+        date_from, date_to = epoch_range(date_from, date_to)
+    if date_from:
+        clauses.append(f"{column} >= ?")
+        params.append(date_from)
+    if date_to:
+        # Inclusive end date; comparing the raw column keeps the index usable
+        clauses.append(f"{column} < ?" if spec.get('epoch_dates') else f"{column} < date(?, '+1 day')")
+        params.append(date_to)
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    query += f" ORDER BY {spec['order_by']}"
+    return query, params
+
+
+def _format_txt_row(spec, row):
+    line = []
+    for _, column, width, money in spec['txt']:
+        value = row[column]
+        if money:
+            text = f"₹{value or 0:<{width - 1}.2f}"
+        elif isinstance(value, str):
+            text = value[:width - 1]
+        else:
+            text = '' if value is None else str(value)
+        line.append(f"{text:<{width}}")
+    return ' '.join(line).rstrip() + "\n"
+
+
+def iter_export(db_path, dataset, fmt, date_from=None, date_to=None):
+    """Yield an export as text chunks straight from a SQLite cursor.
+
+    Rows are fetched Config.EXPORT_FETCH_SIZE at a time, so memory use does
+    not depend on table size.
+    """
+    spec = DATASETS[dataset]
+    query, params = _build_query(dataset, date_from, date_to)
+
+    conn = connect(db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        c = conn.cursor()
+        c.execute(query, params)
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if fmt == 'csv':
+            writer.writerow(output_columns(dataset))
+        elif fmt == 'txt':
+            buffer.write(' '.join(f"{label:<{width}}" for label, _, width, _ in spec['txt']).rstrip() + "\n")
+            buffer.write("-" * sum(width + 1 for _, _, width, _ in spec['txt']) + "\n")
+
+        while True:
+            rows = c.fetchmany(Config.EXPORT_FETCH_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                if fmt == 'csv':
+                    writer.writerow(tuple(row))
+                elif fmt == 'jsonl':
+                    buffer.write(json.dumps(dict(row), ensure_ascii=False) + "\n")
+                else:
+                    buffer.write(_format_txt_row(spec, row))
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+        if buffer.tell():
+            yield buffer.getvalue()
+    finally:
+        conn.close()
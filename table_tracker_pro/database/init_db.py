@@ -1,18 +1,171 @@
 import sqlite3
 import os
+from datetime import datetime, timedelta
 from config import Config
+from models.game_types import DEFAULT_GAME_TYPES, LEGACY_COLUMNS
 
-def init_database():
-    """Initialize the database with required tables"""
+def _ensure_column(cursor, table, column, definition):
+    """Add a column to an existing table if an older database lacks it"""
+    cursor.execute(f"PRAGMA table_info({table})")
+    if column not in [row[1] for row in cursor.fetchall()]:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        print(f"🔧 Migrated: added {table}.{column}")
+
+REPLICATED_TABLES = ('customers', 'transactions', 'sessions')
+
+def _ensure_replication(cursor):
+    """Stamp every insert/update with a change counter and keep tombstones for deletes.
+    
+    database.replication ships rows whose repl_seq is above the last exported
+    watermark, so sync cost follows change volume rather than table size.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS replication_counter (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            seq INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('INSERT OR IGNORE INTO replication_counter (id, seq) VALUES (1, 0)')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS replication_tombstones (
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            repl_seq INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS replication_watermarks (
+            table_name TEXT PRIMARY KEY,
+            seq INTEGER NOT NULL DEFAULT 0,
+            updated_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tombstones_seq ON replication_tombstones (repl_seq)')
+    
+    for table in REPLICATED_TABLES:
+        _ensure_column(cursor, table, 'repl_seq', 'INTEGER')
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_repl_seq ON {table} (repl_seq)')
+        
+        # Number rows that predate the triggers (runs once per older database)
+        cursor.execute(f'SELECT COUNT(*), MAX(rowid) FROM {table} WHERE repl_seq IS NULL')
+        missing, max_rowid = cursor.fetchone()
+        if missing:
+            cursor.execute(f'UPDATE {table} SET repl_seq = (SELECT seq FROM replication_counter) + rowid WHERE repl_seq IS NULL')
+            cursor.execute('UPDATE replication_counter SET seq = seq + ?', (max_rowid,))
+            print(f"🔧 Migrated: numbered {missing} {table} rows for replication")
+        
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_repl_insert AFTER INSERT ON {table}
+            BEGIN
+                UPDATE replication_counter SET seq = seq + 1;
+                UPDATE {table} SET repl_seq = (SELECT seq FROM replication_counter) WHERE rowid = NEW.rowid;
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_repl_update AFTER UPDATE ON {table}
+            WHEN NEW.repl_seq IS OLD.repl_seq
+            BEGIN
+                UPDATE replication_counter SET seq = seq + 1;
+                UPDATE {table} SET repl_seq = (SELECT seq FROM replication_counter) WHERE rowid = NEW.rowid;
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_repl_delete AFTER DELETE ON {table}
+            BEGIN
+                UPDATE replication_counter SET seq = seq + 1;
+                INSERT INTO replication_tombstones (table_name, row_id, repl_seq)
+                VALUES ('{table}', OLD.rowid, (SELECT seq FROM replication_counter));
+            END
+        ''')
+
+SESSIONS_TABLE = '''
+    CREATE TABLE IF NOT EXISTS sessions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        customer_id INTEGER,
+        table_id INTEGER NOT NULL,
+        game_type TEXT NOT NULL,
+        start_epoch INTEGER NOT NULL,
+        end_epoch INTEGER NOT NULL,
+        duration_seconds INTEGER NOT NULL,
+        amount_paise INTEGER NOT NULL,
+        rate_paise INTEGER NOT NULL,
+        staff_user TEXT,
+        created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (customer_id) REFERENCES customers (id)
+    )
+'''
+
+def _legacy_session_epochs(session_date, start_time, end_time, duration_minutes, created_date):
+    """(start_epoch, end_epoch) of a legacy row: local 'HH:MM:SS' times with the end date in session_date"""
+    try:
+        end = datetime.fromisoformat(f"{session_date} {end_time}")
+        start = datetime.fromisoformat(f"{session_date} {start_time}")
+        if start > end:
+            # Ran past midnight: session_date is the day it ended
+            start -= timedelta(days=1)
+    except (TypeError, ValueError):
+        # Unparseable times: fall back to the insert time (UTC) and the played duration
+        end = (datetime.fromisoformat(f"{created_date}+00:00").astimezone().replace(tzinfo=None)
+               if created_date else datetime.now())
+        start = end - timedelta(minutes=duration_minutes or 0)
+    return int(start.timestamp()), int(end.timestamp())
+
+def _compact_sessions(cursor):
+    """Rebuild a legacy sessions table (text times, REAL money) with integer epoch and paise columns.
+    
+    Rows keep their ids; repl_seq is dropped so replication renumbers and
+    re-ships them in the new shape.
+    """
+    cursor.execute("PRAGMA table_info(sessions)")
+    if 'start_time' not in [row[1] for row in cursor.fetchall()]:
+        return
+    
+    cursor.execute(SESSIONS_TABLE.replace('IF NOT EXISTS sessions', 'sessions_compact'))
+    cursor.execute('''
+        SELECT id, customer_id, table_id, game_type, start_time, end_time, duration_minutes, amount, rate,
+               staff_user, session_date, created_date
+        FROM sessions ORDER BY id
+    ''')
+    migrated = 0
+    while True:
+        rows = cursor.fetchmany(Config.IMPORT_BATCH_SIZE)
+        if not rows:
+            break
+        compact = []
+        for (session_id, customer_id, table_id, game_type, start_time, end_time, duration_minutes, amount, rate,
+             staff_user, session_date, created_date) in rows:
+            start_epoch, end_epoch = _legacy_session_epochs(session_date, start_time, end_time,
+                                                            duration_minutes, created_date)
+            compact.append((session_id, customer_id, table_id, game_type, start_epoch, end_epoch,
+                            int(round((duration_minutes or 0) * 60)), int(round((amount or 0) * 100)),
+                            int(round((rate or 0) * 100)), staff_user, created_date))
+        cursor.connection.executemany('''
+            INSERT INTO sessions_compact (id, customer_id, table_id, game_type, start_epoch, end_epoch,
+                                          duration_seconds, amount_paise, rate_paise, staff_user, created_date)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', compact)
+        migrated += len(compact)
+    
+    cursor.execute('DROP TABLE sessions')
+    cursor.execute('ALTER TABLE sessions_compact RENAME TO sessions')
+    print(f"🔧 Migrated: {migrated} sessions to epoch/paise columns")
+
+def init_database(db_path=None):
+    """Initialize the database with required tables (one file per venue)"""
+    db_path = db_path or Config.DATABASE_PATH
     
     # Ensure data directory exists
-    os.makedirs(os.path.dirname(Config.DATABASE_PATH), exist_ok=True)
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
     
-    print(f"🗄️ Initializing database at: {Config.DATABASE_PATH}")
+    print(f"🗄️ Initializing database at: {db_path}")
     
-    conn = sqlite3.connect(Config.DATABASE_PATH)
+    conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
     
+    # Lets close-out maintenance return free pages in small steps; only takes
+    # effect on a new database (older ones: python3 -m database.maintenance convert)
+    cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    
     # Create customers table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS customers (
@@ -50,32 +203,183 @@ def init_database():
         )
     ''')
     
-    # Create sessions table (for completed sessions)
+    # Create sessions table (for completed sessions; local times as epoch seconds, money in paise)
+    cursor.execute(SESSIONS_TABLE)
+    _compact_sessions(cursor)
+    
+    # Create table configuration (hot-reloaded by TableManager.reload_config)
     cursor.execute('''
-        CREATE TABLE IF NOT EXISTS sessions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            customer_id INTEGER,
-            table_id INTEGER NOT NULL,
+        CREATE TABLE IF NOT EXISTS table_config (
             game_type TEXT NOT NULL,
-            start_time TEXT NOT NULL,
-            end_time TEXT NOT NULL,
-            duration_minutes REAL NOT NULL,
-            amount REAL NOT NULL,
+            table_id INTEGER NOT NULL,
             rate REAL NOT NULL,
+            active INTEGER NOT NULL DEFAULT 1,
+            updated_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (game_type, table_id)
+        )
+    ''')
+    
+    # Create rate options, stored as integer paise per minute
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS rate_options (
+            rate_paise INTEGER PRIMARY KEY
+        )
+    ''')
+    
+    # Create game type registry (snooker, pool, carrom, ...)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS game_types (
+            key TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            active INTEGER NOT NULL DEFAULT 1,
+            sort_order INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    
+    # Create per-customer, per-game aggregates (replaces widening customers per game)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS customer_game_stats (
+            customer_id INTEGER NOT NULL,
+            game_type TEXT NOT NULL,
+            amount REAL NOT NULL DEFAULT 0.0,
+            minutes REAL NOT NULL DEFAULT 0.0,
+            sessions INTEGER NOT NULL DEFAULT 0,
+            last_played TIMESTAMP,
+            PRIMARY KEY (customer_id, game_type),
+            FOREIGN KEY (customer_id) REFERENCES customers (id)
+        ) WITHOUT ROWID
+    ''')
+    
+    # Create table reservations (indexed per table in memory by models.reservations)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS reservations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            game_type TEXT NOT NULL,
+            table_id INTEGER NOT NULL,
+            customer_id INTEGER,
+            name TEXT NOT NULL,
+            phone TEXT,
+            party_size INTEGER,
+            start_epoch INTEGER NOT NULL,
+            end_epoch INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'booked',
+            notes TEXT,
             staff_user TEXT,
-            session_date TEXT NOT NULL,
             created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (customer_id) REFERENCES customers (id)
         )
     ''')
     
+    # Create table clocks: running/paused tables saved at shutdown (state is JSON), restored at startup
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS table_clocks (
+            game_type TEXT NOT NULL,
+            table_id INTEGER NOT NULL,
+            state TEXT NOT NULL,
+            saved_epoch INTEGER NOT NULL,
+            PRIMARY KEY (game_type, table_id)
+        )
+    ''')
+    
+    # Link transactions to the session that produced them
+    _ensure_column(cursor, 'transactions', 'session_id', 'INTEGER REFERENCES sessions (id)')
+    
+    # Minutes played per session transaction, so aggregates can be rebuilt from the ledger
+    _ensure_column(cursor, 'transactions', 'minutes', 'REAL')
+    
+    # Compensating entries point at the transaction they reverse; customers are soft-deleted
+    _ensure_column(cursor, 'transactions', 'reverses_id', 'INTEGER REFERENCES transactions (id)')
+    _ensure_column(cursor, 'customers', 'deleted_date', 'TIMESTAMP')
+    
+    # Create balance snapshots: customers' aggregate columns include every entry up to ledger_id
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ledger_snapshots (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ledger_id INTEGER NOT NULL,
+            entries INTEGER NOT NULL DEFAULT 0,
+            customers INTEGER NOT NULL DEFAULT 0,
+            created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Existing totals already include the whole ledger, so they become the first snapshot
+    cursor.execute('SELECT COUNT(*) FROM ledger_snapshots')
+    if cursor.fetchone()[0] == 0:
+        cursor.execute('INSERT INTO ledger_snapshots (ledger_id) SELECT COALESCE(MAX(id), 0) FROM transactions')
+    
+    # The ledger is append-only: corrections are reversal entries, never edits or deletes
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_no_delete BEFORE DELETE ON transactions
+        BEGIN
+            SELECT RAISE(ABORT, 'transactions are append-only - post a reversal instead');
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_no_update
+        BEFORE UPDATE OF customer_id, amount, minutes, transaction_type, game_type, description,
+                         staff_user, created_date, session_id, reverses_id ON transactions
+        BEGIN
+            SELECT RAISE(ABORT, 'transactions are append-only - post a reversal instead');
+        END
+    ''')
+    
     # Create indexes for better performance
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_customers_phone ON customers (phone)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_customers_name ON customers (name)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_customer ON transactions (customer_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_customers_total_amount ON customers (total_amount DESC)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_customers_created ON customers (created_date)')
+    # Covers per-customer ledger sums (database.reconcile) and every customer_id lookup
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_ledger ON transactions (customer_id, transaction_type, game_type, amount, minutes)')
+    cursor.execute('DROP INDEX IF EXISTS idx_transactions_customer')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions (created_date)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_sessions_date ON sessions (session_date)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_customer_history ON transactions (customer_id, created_date, id)')
+    # Covers per-table range reports (TableManager.session_report) without touching the table
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_sessions_table_start ON sessions (game_type, table_id, start_epoch, duration_seconds, amount_paise)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_sessions_start ON sessions (start_epoch)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_sessions_customer ON sessions (customer_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_game_stats_game_amount ON customer_game_stats (game_type, amount DESC)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_reservations_table_start ON reservations (game_type, table_id, start_epoch)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_reservations_start ON reservations (start_epoch)')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_transactions_reverses ON transactions (reverses_id) WHERE reverses_id IS NOT NULL')
+    
+    # Change counters for incremental replication to head office
+    _ensure_replication(cursor)
+    
+    # Seed game types and backfill per-game aggregates from the legacy snooker_*/pool_* columns
+    cursor.execute('SELECT COUNT(*) FROM game_types')
+    if cursor.fetchone()[0] == 0:
+        cursor.executemany('INSERT INTO game_types (key, name, sort_order) VALUES (?, ?, ?)',
+                           [(key, name, order) for order, (key, name) in enumerate(DEFAULT_GAME_TYPES)])
+    
+    cursor.execute('SELECT COUNT(*) FROM customer_game_stats')
+    if cursor.fetchone()[0] == 0:
+        backfilled = 0
+        for game_type, (amount_column, minutes_column) in LEGACY_COLUMNS.items():
+            cursor.execute(f'''
+                INSERT INTO customer_game_stats (customer_id, game_type, amount, minutes, sessions, last_played)
+                SELECT c.id, ?, COALESCE(c.{amount_column}, 0), COALESCE(c.{minutes_column}, 0),
+                       (SELECT COUNT(*) FROM transactions t WHERE t.customer_id = c.id AND t.game_type = ?),
+                       (SELECT MAX(created_date) FROM transactions t WHERE t.customer_id = c.id AND t.game_type = ?)
+                FROM customers c
+                WHERE COALESCE(c.{amount_column}, 0) != 0 OR COALESCE(c.{minutes_column}, 0) != 0
+            ''', (game_type, game_type, game_type))
+            backfilled += cursor.rowcount
+        if backfilled:
+            print(f"🔧 Migrated: backfilled {backfilled} rows into customer_game_stats")
+    
+    # Seed table configuration from Config on first run
+    cursor.execute('SELECT COUNT(*) FROM table_config')
+    if cursor.fetchone()[0] == 0:
+        seed = [('snooker', table_id, config['rate']) for table_id, config in Config.SNOOKER_TABLES.items()]
+        seed += [('pool', table_id, config['rate']) for table_id, config in Config.POOL_TABLES.items()]
+        cursor.executemany('INSERT INTO table_config (game_type, table_id, rate) VALUES (?, ?, ?)', seed)
+        print(f"✅ Seeded {len(seed)} tables into table_config")
+    
+    cursor.execute('SELECT COUNT(*) FROM rate_options')
+    if cursor.fetchone()[0] == 0:
+        cursor.executemany('INSERT INTO rate_options (rate_paise) VALUES (?)',
+                           [(int(round(rate * 100)),) for rate in Config.AVAILABLE_RATES])
     
     # Insert sample data if database is empty
     cursor.execute('SELECT COUNT(*) FROM customers')
@@ -100,15 +404,15 @@ def init_database():
     conn.close()
     
     print("✅ Database initialization completed successfully!")
-    print(f"📁 Database location: {Config.DATABASE_PATH}")
+    print(f"📁 Database location: {db_path}")
     
     # Verify database was created
-    if os.path.exists(Config.DATABASE_PATH):
-        size = os.path.getsize(Config.DATABASE_PATH)
+    if os.path.exists(db_path):
+        size = os.path.getsize(db_path)
         print(f"📊 Database size: {size} bytes")
         
         # Quick verification
-        conn = sqlite3.connect(Config.DATABASE_PATH)
+        conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
         cursor.execute("SELECT COUNT(*) FROM customers")
         customer_count = cursor.fetchone()[0]
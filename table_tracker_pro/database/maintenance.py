@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+End-of-day close-out maintenance for each venue database
+
+Every day at Config.MAINTENANCE_CLOSEOUT_TIME, or on demand, each venue
+database gets:
+  1. optimize          - ANALYZE the first time, PRAGMA optimize afterwards
+  2. incremental_vacuum - free pages returned MAINTENANCE_VACUUM_PAGES at a
+                          time in short write transactions, so a checkout
+                          never waits more than one step
+  3. wal_checkpoint     - fold the WAL back into the database and truncate it
+  4. snapshot           - a compact VACUUM INTO copy, one per day, the last
+                          MAINTENANCE_KEEP_SNAPSHOTS kept
+Each step is timed; the last report per venue is on GET /api/system/status.
+
+Incremental vacuum needs auto_vacuum=INCREMENTAL. New databases get it from
+init_database; older ones are converted once, offline, by `convert`.
+
+Usage (from the project directory):
+    python3 -m database.maintenance run [venue]
+    python3 -m database.maintenance convert [venue]
+"""
+
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from config import Config
+from database.venues import venue_db_path
+
+AUTO_VACUUM_MODES = {0: 'none', 1: 'full', 2: 'incremental'}
+
+
+def _connect(db_path):
+    # Autocommit, so every PRAGMA or incremental vacuum step is its own short transaction
+    return sqlite3.connect(db_path, timeout=30, isolation_level=None)
+
+
+def step_optimize(conn):
+    has_stats = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone()
+    conn.execute(f"PRAGMA analysis_limit = {int(Config.MAINTENANCE_ANALYSIS_LIMIT)}")
+    if has_stats:
+        conn.execute("PRAGMA optimize").fetchall()
+        return {'mode': 'optimize'}
+    conn.execute("ANALYZE")
+    return {'mode': 'analyze'}
+
+
+def step_incremental_vacuum(conn):
+    mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+    free_before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    if mode != 2:
+        return {'skipped': f"auto_vacuum is {AUTO_VACUUM_MODES.get(mode, mode)} - run `convert` once",
+                'free_pages': free_before}
+
+    deadline = time.monotonic() + Config.MAINTENANCE_VACUUM_BUDGET_SECONDS
+    steps = 0
+    free = free_before
+    while free and time.monotonic() < deadline:
+        # executescript steps the pragma to completion; execute() would free a single page
+        conn.executescript(f"PRAGMA incremental_vacuum({int(Config.MAINTENANCE_VACUUM_PAGES)});")
+        steps += 1
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        time.sleep(Config.MAINTENANCE_VACUUM_PAUSE)
+    return {'freed_pages': free_before - free, 'free_pages': free, 'steps': steps}
+
+
+def step_wal_checkpoint(conn):
+    busy, log_pages, moved = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+    if log_pages < 0:
+        return {'skipped': 'not in WAL mode'}
+    return {'busy': bool(busy), 'log_pages': log_pages, 'checkpointed': moved}
+
+
+def step_snapshot(conn, venue):
+    """VACUUM INTO today's snapshot file (once per day), then prune old ones"""
+    os.makedirs(Config.DAILY_SNAPSHOT_DIR, exist_ok=True)
+    path = os.path.join(Config.DAILY_SNAPSHOT_DIR, f"{venue}_{datetime.now():%Y-%m-%d}.db")
+    if os.path.exists(path):
+        return {'skipped': 'already taken today', 'file': os.path.basename(path)}
+
+    tmp_path = path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn.execute("VACUUM INTO ?", (tmp_path,))
+    os.replace(tmp_path, path)
+
+    prefix = f"{venue}_"
+    snapshots = sorted(name for name in os.listdir(Config.DAILY_SNAPSHOT_DIR)
+                       if name.startswith(prefix) and name.endswith('.db'))
+    removed = snapshots[:-Config.MAINTENANCE_KEEP_SNAPSHOTS] if Config.MAINTENANCE_KEEP_SNAPSHOTS else []
+    for name in removed:
+        os.remove(os.path.join(Config.DAILY_SNAPSHOT_DIR, name))
+    return {'file': os.path.basename(path), 'bytes': os.path.getsize(path), 'pruned': len(removed)}
+
+
+def run_closeout(venue, db_path=None):
+    """Run every maintenance step on one venue database, returning a timed report"""
+    db_path = db_path or venue_db_path(venue)
+    report = {'venue': venue, 'started': datetime.now().isoformat(timespec='seconds'),
+              'bytes_before': os.path.getsize(db_path), 'steps': []}
+    started = time.perf_counter()
+    conn = _connect(db_path)
+    try:
+        for name, step in (('optimize', step_optimize),
+                           ('incremental_vacuum', step_incremental_vacuum),
+                           ('wal_checkpoint', step_wal_checkpoint),
+                           ('snapshot', lambda c: step_snapshot(c, venue))):
+            step_started = time.perf_counter()
+            try:
+                result = {'name': name, 'ok': True, **step(conn)}
+            except sqlite3.Error as e:
+                # One failing step (e.g. a busy database) does not stop the rest
+                result = {'name': name, 'ok': False, 'error': str(e)}
+            result['seconds'] = round(time.perf_counter() - step_started, 3)
+            report['steps'].append(result)
+            print(f"🧹 {venue} {name}: {result}")
+    finally:
+        conn.close()
+
+    report['bytes_after'] = os.path.getsize(db_path)
+    report['seconds'] = round(time.perf_counter() - started, 3)
+    report['ok'] = all(step['ok'] for step in report['steps'])
+    print(f"🧹 Close-out for {venue} finished in {report['seconds']}s")
+    return report
+
+
+def convert_to_incremental(db_path):
+    """One-off: switch an existing database to auto_vacuum=INCREMENTAL (full VACUUM - run while closed)"""
+    conn = _connect(db_path)
+    try:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        return AUTO_VACUUM_MODES.get(conn.execute("PRAGMA auto_vacuum").fetchone()[0])
+    finally:
+        conn.close()
+
+
+class MaintenanceScheduler:
+    """Runs the close-out daily in a daemon thread and keeps the last report per venue"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.condition = threading.Condition()
+        self.reports = {}
+        self.running = False
+        self.thread = None
+        self.next_run = None
+
+    def _next_run(self, now):
+        hour, minute = (int(part) for part in Config.MAINTENANCE_CLOSEOUT_TIME.split(':'))
+        run_at = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        return run_at if run_at > now else run_at + timedelta(days=1)
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name='maintenance', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                self.next_run = self._next_run(datetime.now())
+                print(f"🧹 Next close-out maintenance at {self.next_run:%Y-%m-%d %H:%M}")
+                while self.running and datetime.now() < self.next_run:
+                    self.condition.wait(min(60.0, (self.next_run - datetime.now()).total_seconds()))
+                if not self.running:
+                    return
+            for venue in Config.VENUES:
+                if os.path.exists(venue_db_path(venue)):
+                    self.run(venue)
+
+    def run(self, venue):
+        """Run the close-out for a venue now (one run per venue at a time)"""
+        with self.lock:
+            try:
+                report = run_closeout(venue)
+            except Exception as e:
+                print(f"❌ Close-out maintenance failed for {venue}: {e}")
+                report = {'venue': venue, 'started': datetime.now().isoformat(timespec='seconds'),
+                          'ok': False, 'error': str(e), 'steps': []}
+            self.reports[venue] = report
+            return report
+
+    def status(self, venue):
+        return {
+            'next_run': self.next_run.isoformat(timespec='minutes') if self.next_run else None,
+            'last_run': self.reports.get(venue)
+        }
+
+
+maintenance_scheduler = MaintenanceScheduler()
+
+
+def main(argv):
+    command = argv[1] if len(argv) > 1 else ''
+    venue = argv[2] if len(argv) > 2 else Config.DEFAULT_VENUE
+    if command == 'run':
+        return 0 if run_closeout(venue)['ok'] else 1
+    if command == 'convert':
+        print(f"🧹 {venue}: auto_vacuum is now {convert_to_incremental(venue_db_path(venue))}")
+        return 0
+    print(__doc__)
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
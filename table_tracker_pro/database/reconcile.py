@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Ledger reconciliation: rebuild customer aggregates from transactions
+
+Customers are split into id ranges and each range is scanned by a worker
+process on its own read-only connection (one read transaction, so the
+customer row, its per-game stats and its transactions are a consistent
+snapshot). Stored totals are the last ledger snapshot, so only entries up to
+that snapshot's ledger_id are summed, using the same rule as models.ledger.
+Workers report every stored total that disagrees with the sum of the ledger;
+with --fix the parent rewrites them in batched transactions.
+
+A rewrite only applies if the customer row's repl_seq is unchanged since the
+scan, so a session recorded mid-run is never overwritten with stale totals.
+Minutes are only checked for customers whose session transactions all
+carry minutes (rows written before transactions.minutes existed do not).
+
+Usage (from the project directory):
+    python3 -m database.reconcile [--fix] [--workers N] [--venue NAME]
+"""
+
+import argparse
+import math
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from config import Config
+from database.venues import venue_db_path
+from models.game_types import LEGACY_COLUMNS
+from models.ledger import GAME_ENTRY_TYPES, Delta, accumulate
+
+TOLERANCE = 0.005
+
+
+def _differs(stored, expected):
+    return abs((stored or 0.0) - (expected or 0.0)) > TOLERANCE
+
+
+def scan_range(db_path, low, high):
+    """Compare stored aggregates with the ledger for customer ids low..high"""
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, isolation_level=None)
+    try:
+        c = conn.cursor()
+        c.execute("BEGIN")
+
+        c.execute("SELECT ledger_id FROM ledger_snapshots ORDER BY id DESC LIMIT 1")
+        row = c.fetchone()
+        ledger_id = row[0] if row else 0
+
+        ledger = {}
+        unknown_minutes = {}
+        scanned = 0
+        # Grouped in idx_transactions_ledger order: a covering index scan, no temp b-tree
+        c.execute("""SELECT customer_id, transaction_type, game_type,
+                            SUM(amount), SUM(COALESCE(minutes, 0)), COUNT(*), COUNT(*) - COUNT(minutes)
+                     FROM transactions WHERE customer_id BETWEEN ? AND ? AND id <= ?
+                     GROUP BY customer_id, transaction_type, game_type""", (low, high, ledger_id))
+        for customer_id, transaction_type, game_type, amount, minutes, count, unknown in c:
+            scanned += count
+            accumulate(ledger, customer_id, transaction_type, game_type, amount, minutes, count)
+            if transaction_type in GAME_ENTRY_TYPES and unknown:
+                unknown_minutes[customer_id] = unknown_minutes.get(customer_id, 0) + unknown
+
+        stored_games = {}
+        c.execute("""SELECT customer_id, game_type, amount, minutes, sessions FROM customer_game_stats
+                     WHERE customer_id BETWEEN ? AND ?""", (low, high))
+        for customer_id, game_type, amount, minutes, sessions in c:
+            stored_games.setdefault(customer_id, {})[game_type] = (amount, minutes, sessions)
+
+        c.execute("""SELECT id, repl_seq, total_amount, total_minutes, snooker_amount, snooker_minutes,
+                            pool_amount, pool_minutes
+                     FROM customers WHERE id BETWEEN ? AND ?""", (low, high))
+        customers = c.fetchall()
+        c.execute("COMMIT")
+    finally:
+        conn.close()
+
+    fixes = []
+    unverifiable = 0
+    for row in customers:
+        customer_id = row[0]
+        stored = dict(zip(('total_amount', 'total_minutes', 'snooker_amount', 'snooker_minutes',
+                           'pool_amount', 'pool_minutes'), row[2:]))
+        entry = ledger.pop(customer_id, None) or Delta()
+        minutes_known = customer_id not in unknown_minutes
+        unverifiable += not minutes_known
+
+        expected = {'total_amount': round(entry.amount, 2),
+                    'total_minutes': entry.minutes if minutes_known else stored['total_minutes']}
+        for game_type, (amount_column, minutes_column) in LEGACY_COLUMNS.items():
+            game = entry.games.get(game_type, [0.0, 0.0, 0])
+            expected[amount_column] = round(game[0], 2)
+            expected[minutes_column] = game[1] if minutes_known else stored[minutes_column]
+
+        games_stored = stored_games.get(customer_id, {})
+        games_expected = {}
+        for game_type in set(entry.games) | set(games_stored):
+            amount, minutes, sessions = entry.games.get(game_type, [0.0, 0.0, 0])
+            old = games_stored.get(game_type, (0.0, 0.0, 0))
+            games_expected[game_type] = (round(amount, 2), minutes if minutes_known else old[1], sessions)
+
+        fields = [{'field': field, 'stored': stored[field], 'ledger': value}
+                  for field, value in expected.items() if _differs(stored[field], value)]
+        for game_type, (amount, minutes, sessions) in games_expected.items():
+            old = games_stored.get(game_type, (0.0, 0.0, 0))
+            if _differs(old[0], amount) or _differs(old[1], minutes) or old[2] != sessions:
+                fields.append({'field': f'game_stats.{game_type}', 'stored': list(old),
+                               'ledger': [amount, minutes, sessions]})
+
+        if fields:
+            fixes.append({'customer_id': customer_id, 'repl_seq': row[1], 'fields': fields,
+                          'expected': expected, 'games': games_expected})
+
+    return {
+        'ledger_id': ledger_id,
+        'customers': len(customers),
+        'transactions': scanned,
+        'unverifiable_minutes': unverifiable,
+        'orphan_transactions': sum(1 for _ in ledger),
+        'fixes': fixes
+    }
+
+
+def partition(db_path, parts):
+    conn = sqlite3.connect(db_path)
+    low, high = conn.execute("SELECT MIN(id), MAX(id) FROM customers").fetchone()
+    conn.close()
+    if low is None:
+        return []
+    step = max(1, math.ceil((high - low + 1) / parts))
+    return [(start, min(start + step - 1, high)) for start in range(low, high + 1, step)]
+
+
+def apply_fixes(db_path, fixes, batch_size=None):
+    """Rewrite mismatched aggregates, skipping customers that changed since the scan"""
+    batch_size = batch_size or Config.RECONCILE_BATCH_SIZE
+    columns = ['total_amount', 'total_minutes'] + [column for pair in LEGACY_COLUMNS.values() for column in pair]
+    update_sql = (f"UPDATE customers SET {', '.join(f'{column} = ?' for column in columns)} "
+                  f"WHERE id = ? AND repl_seq IS ?")
+
+    fixed = 0
+    skipped = []
+    conn = sqlite3.connect(db_path)
+    try:
+        for start in range(0, len(fixes), batch_size):
+            with conn:
+                for fix in fixes[start:start + batch_size]:
+                    cursor = conn.execute(update_sql, [fix['expected'][column] for column in columns] +
+                                          [fix['customer_id'], fix['repl_seq']])
+                    if cursor.rowcount == 0:
+                        skipped.append(fix['customer_id'])
+                        continue
+                    conn.execute("DELETE FROM customer_game_stats WHERE customer_id = ?", (fix['customer_id'],))
+                    conn.executemany("""INSERT INTO customer_game_stats (customer_id, game_type, amount, minutes, sessions)
+                                        VALUES (?, ?, ?, ?, ?)""",
+                                     [(fix['customer_id'], game_type, *values)
+                                      for game_type, values in fix['games'].items() if values[2] or values[0]])
+                    fixed += 1
+    finally:
+        conn.close()
+    return fixed, skipped
+
+
+def reconcile(db_path=None, fix=False, workers=None):
+    db_path = db_path or Config.DATABASE_PATH
+    workers = workers or Config.RECONCILE_WORKERS
+    started = time.perf_counter()
+
+    ranges = partition(db_path, workers * Config.RECONCILE_PARTITIONS_PER_WORKER)
+    report = {'customers': 0, 'transactions': 0, 'unverifiable_minutes': 0, 'orphan_transactions': 0}
+    fixes = []
+    ledger_id = 0
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        lows = [low for low, _ in ranges]
+        highs = [high for _, high in ranges]
+        for result in pool.map(scan_range, [db_path] * len(ranges), lows, highs):
+            for key in report:
+                report[key] += result[key]
+            ledger_id = max(ledger_id, result['ledger_id'])
+            fixes.extend(result['fixes'])
+
+    report['ledger_id'] = ledger_id
+    report['ranges'] = len(ranges)
+    report['workers'] = workers
+    report['mismatched_customers'] = len(fixes)
+    report['scan_seconds'] = round(time.perf_counter() - started, 3)
+
+    if fix and fixes:
+        fixed, skipped = apply_fixes(db_path, fixes)
+        report['fixed'] = fixed
+        report['skipped_changed'] = skipped
+    report['seconds'] = round(time.perf_counter() - started, 3)
+    report['mismatches'] = [{'customer_id': f['customer_id'], 'fields': f['fields']} for f in fixes]
+
+    print(f"🧮 Reconciled {report['customers']} customers / {report['transactions']} transactions "
+          f"in {report['seconds']}s ({workers} workers): {len(fixes)} mismatched"
+          + (f", {report.get('fixed', 0)} fixed" if fix else ""))
+    return report
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='python3 -m database.reconcile', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--fix', action='store_true', help='rewrite mismatched aggregates')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--venue', default=Config.DEFAULT_VENUE)
+    parser.add_argument('--show', type=int, default=20, help='mismatches to print')
+    args = parser.parse_args(argv[1:])
+
+    report = reconcile(venue_db_path(args.venue), args.fix, args.workers)
+    for mismatch in report['mismatches'][:args.show]:
+        for field in mismatch['fields']:
+            print(f"   customer {mismatch['customer_id']}: {field['field']} stored={field['stored']} ledger={field['ledger']}")
+    if report['unverifiable_minutes']:
+        print(f"ℹ️ {report['unverifiable_minutes']} customers have sessions without minutes - minutes not checked")
+    if report['orphan_transactions']:
+        print(f"⚠️ {report['orphan_transactions']} customer ids have transactions but no customer row")
+    if report.get('skipped_changed'):
+        print(f"⏭️ {len(report['skipped_changed'])} customers changed during the run - re-run to check them")
+    return 1 if report['mismatches'] and not args.fix else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
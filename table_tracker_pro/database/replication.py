@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Incremental replication from venue databases to a central reporting database
+
+Every customers/transactions/sessions row carries repl_seq, a change counter
+bumped by triggers on insert and update (deletes leave tombstones). The
+exporter ships rows above the venue's last exported watermark as a gzipped
+JSON Lines batch; the aggregator merges batches into the central database
+with upserts that ignore anything older than what it already holds, so
+batches can be re-applied or arrive out of order. Everything runs offline
+against local files - batches can be moved by USB stick, rsync or e-mail.
+
+Usage (from the project directory):
+    python3 -m database.replication export [venue]
+    python3 -m database.replication apply [batch_dir]
+    python3 -m database.replication report [from] [to]
+"""
+
+import gzip
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+from config import Config
+from database.export import DATASETS
+from database.init_db import REPLICATED_TABLES
+from database.venues import venue_db_path
+from utils.serialization import dumps_bytes, loads
+
+
+class ReplicationError(Exception):
+    pass
+
+
+def _columns(table):
+    return DATASETS[table]['columns']
+
+
+class ReplicationExporter:
+    """Writes batches of rows changed since the venue's watermarks"""
+
+    def __init__(self, venue=None, db_path=None, outbox_dir=None, batch_rows=None):
+        self.venue = venue or Config.DEFAULT_VENUE
+        self.db_path = db_path or venue_db_path(self.venue)
+        self.outbox_dir = outbox_dir or Config.REPLICATION_OUTBOX_DIR
+        self.batch_rows = batch_rows or Config.REPLICATION_BATCH_ROWS
+
+    def _watermarks(self, c):
+        c.execute("SELECT table_name, seq FROM replication_watermarks")
+        return dict(c.fetchall())
+
+    def export(self):
+        """Write one batch file, returning its path (None when nothing changed)"""
+        started = time.perf_counter()
+        conn = sqlite3.connect(self.db_path)
+        try:
+            c = conn.cursor()
+            watermarks = self._watermarks(c)
+            ranges = {}
+            records = []
+
+            for table in REPLICATED_TABLES:
+                since = watermarks.get(table, 0)
+                c.execute(f"SELECT {', '.join(_columns(table))}, repl_seq FROM {table} "
+                          f"WHERE repl_seq > ? ORDER BY repl_seq LIMIT ?", (since, self.batch_rows))
+                rows = c.fetchall()
+                if rows:
+                    ranges[table] = {'from': since, 'to': rows[-1][-1], 'rows': len(rows)}
+                    records.extend({'t': table, 'seq': row[-1], 'row': row[:-1]} for row in rows)
+
+            since = watermarks.get('tombstones', 0)
+            c.execute("SELECT table_name, row_id, repl_seq FROM replication_tombstones "
+                      "WHERE repl_seq > ? ORDER BY repl_seq LIMIT ?", (since, self.batch_rows))
+            tombstones = c.fetchall()
+            if tombstones:
+                ranges['tombstones'] = {'from': since, 'to': tombstones[-1][2], 'rows': len(tombstones)}
+                records.extend({'t': table, 'seq': seq, 'delete': row_id} for table, row_id, seq in tombstones)
+
+            if not records:
+                print(f"📡 Replication: no changes at {self.venue} since last export")
+                return None
+
+            batch_id = f"{self.venue}_{datetime.now().strftime('%Y%m%dT%H%M%S_%f')}"
+            header = {
+                'batch_id': batch_id,
+                'venue': self.venue,
+                'created_at': datetime.now().isoformat(timespec='seconds'),
+                'columns': {table: _columns(table) for table in REPLICATED_TABLES},
+                'ranges': ranges
+            }
+            path = self._write_batch(batch_id, header, records)
+
+            # Advance watermarks only once the batch file is safely on disk
+            with conn:
+                conn.executemany("""INSERT INTO replication_watermarks (table_name, seq) VALUES (?, ?)
+                                    ON CONFLICT(table_name) DO UPDATE SET seq = excluded.seq,
+                                        updated_date = CURRENT_TIMESTAMP""",
+                                 [(table, info['to']) for table, info in ranges.items()])
+        finally:
+            conn.close()
+
+        counts = ', '.join(f"{table}={info['rows']}" for table, info in ranges.items())
+        print(f"📡 Replication batch {batch_id}: {len(records)} changes ({counts}) "
+              f"in {time.perf_counter() - started:.3f}s")
+        return path
+
+    def export_all(self):
+        """Export until the venue is caught up (large backlogs span several files)"""
+        paths = []
+        while True:
+            path = self.export()
+            if path is None:
+                return paths
+            paths.append(path)
+
+    def _write_batch(self, batch_id, header, records):
+        os.makedirs(self.outbox_dir, exist_ok=True)
+        path = os.path.join(self.outbox_dir, f"{batch_id}.jsonl.gz")
+        fd, tmp_path = tempfile.mkstemp(dir=self.outbox_dir, prefix='.tmp_')
+        try:
+            with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6) as f:
+                f.write(dumps_bytes(header) + b"\n")
+                for record in records:
+                    f.write(dumps_bytes(record) + b"\n")
+                raw.flush()
+                os.fsync(raw.fileno())
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return path
+
+
+class CentralAggregator:
+    """Merges venue batches into the central reporting database"""
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or Config.CENTRAL_DB_PATH
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._init_schema()
+
+    def _init_schema(self):
+        conn = sqlite3.connect(self.db_path)
+        with conn:
+            for table in REPLICATED_TABLES:
+                columns = ', '.join(_columns(table))
+                conn.execute(f"""CREATE TABLE IF NOT EXISTS {table} (
+                                     venue TEXT NOT NULL, {columns}, repl_seq INTEGER NOT NULL,
+                                     PRIMARY KEY (venue, id))""")
+                # Columns added to DATASETS after the central database was created
+                existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+                for column in _columns(table):
+                    if column not in existing:
+                        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column}")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_central_transactions_date ON transactions (created_date, venue)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_central_sessions_start ON sessions (start_epoch, venue)")
+            conn.execute("""CREATE TABLE IF NOT EXISTS replication_batches (
+                                batch_id TEXT PRIMARY KEY,
+                                venue TEXT NOT NULL,
+                                changes INTEGER NOT NULL,
+                                applied_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP)""")
+            conn.execute("""CREATE TABLE IF NOT EXISTS replication_watermarks (
+                                venue TEXT NOT NULL,
+                                table_name TEXT NOT NULL,
+                                seq INTEGER NOT NULL,
+                                PRIMARY KEY (venue, table_name))""")
+            # Kept after the delete, so an older batch applied later cannot bring the row back
+            conn.execute("""CREATE TABLE IF NOT EXISTS replication_tombstones (
+                                venue TEXT NOT NULL,
+                                table_name TEXT NOT NULL,
+                                row_id INTEGER NOT NULL,
+                                repl_seq INTEGER NOT NULL,
+                                PRIMARY KEY (venue, table_name, row_id))""")
+        conn.close()
+
+    def _upsert_sql(self, table):
+        columns = _columns(table)
+        updates = ', '.join(f"{column} = excluded.{column}" for column in columns if column != 'id')
+        # Numbered parameters: ?1 is the venue, then the row, then its repl_seq
+        values = ', '.join(f"?{number}" for number in range(1, len(columns) + 3))
+        row_id, seq = f"?{columns.index('id') + 2}", f"?{len(columns) + 2}"
+        return (f"INSERT INTO {table} (venue, {', '.join(columns)}, repl_seq) "
+                f"SELECT {values} WHERE NOT EXISTS (SELECT 1 FROM replication_tombstones "
+                f"WHERE venue = ?1 AND table_name = '{table}' AND row_id = {row_id} AND repl_seq > {seq}) "
+                f"ON CONFLICT(venue, id) DO UPDATE SET {updates}, repl_seq = excluded.repl_seq "
+                f"WHERE excluded.repl_seq > {table}.repl_seq")
+
+    def apply_file(self, path):
+        """Apply one batch file; returns the number of changes (0 if already applied)"""
+        with gzip.open(path, 'rb') as f:
+            header = loads(f.readline())
+            venue = header['venue']
+
+            for table, columns in header['columns'].items():
+                if table in REPLICATED_TABLES and columns != _columns(table):
+                    raise ReplicationError(f"{path}: {table} columns differ from this build")
+
+            conn = sqlite3.connect(self.db_path)
+            try:
+                c = conn.cursor()
+                c.execute("SELECT 1 FROM replication_batches WHERE batch_id = ?", (header['batch_id'],))
+                if c.fetchone():
+                    print(f"⏭️ Batch {header['batch_id']} already applied")
+                    return 0
+
+                upserts = {table: [] for table in REPLICATED_TABLES}
+                deletes = []
+                for line in f:
+                    record = loads(line)
+                    if 'delete' in record:
+                        deletes.append((record['t'], record['delete'], record['seq']))
+                    else:
+                        upserts[record['t']].append((venue, *record['row'], record['seq']))
+
+                with conn:
+                    for table, rows in upserts.items():
+                        if rows:
+                            c.executemany(self._upsert_sql(table), rows)
+                    for table, row_id, seq in deletes:
+                        if table in REPLICATED_TABLES:
+                            c.execute(f"DELETE FROM {table} WHERE venue = ? AND id = ? AND repl_seq < ?",
+                                      (venue, row_id, seq))
+                            c.execute("""INSERT INTO replication_tombstones (venue, table_name, row_id, repl_seq)
+                                         VALUES (?, ?, ?, ?) ON CONFLICT(venue, table_name, row_id)
+                                         DO UPDATE SET repl_seq = MAX(repl_seq, excluded.repl_seq)""",
+                                      (venue, table, row_id, seq))
+                    changes = sum(len(rows) for rows in upserts.values()) + len(deletes)
+                    c.execute("INSERT INTO replication_batches (batch_id, venue, changes) VALUES (?, ?, ?)",
+                              (header['batch_id'], venue, changes))
+                    c.executemany("""INSERT INTO replication_watermarks (venue, table_name, seq) VALUES (?, ?, ?)
+                                     ON CONFLICT(venue, table_name) DO UPDATE SET seq = MAX(seq, excluded.seq)""",
+                                  [(venue, table, info['to']) for table, info in header['ranges'].items()])
+            finally:
+                conn.close()
+
+        print(f"🏢 Applied batch {header['batch_id']}: {changes} changes from {venue}")
+        return changes
+
+    def apply_dir(self, batch_dir=None):
+        """Apply every batch in a directory in file-name (i.e. creation) order"""
+        batch_dir = batch_dir or Config.REPLICATION_OUTBOX_DIR
+        applied = 0
+        for name in sorted(os.listdir(batch_dir)):
+            if name.endswith('.jsonl.gz'):
+                applied += self.apply_file(os.path.join(batch_dir, name))
+        return applied
+
+    def revenue_report(self, date_from=None, date_to=None):
+        """Consolidated revenue per venue and day from replicated transactions"""
+        query = """SELECT venue, substr(created_date, 1, 10) AS day, COUNT(*), SUM(amount)
+                   FROM transactions WHERE 1 = 1"""
+        params = []
+        if date_from:
+            query += " AND created_date >= ?"
+            params.append(date_from)
+        if date_to:
+            query += " AND created_date < date(?, '+1 day')"
+            params.append(date_to)
+        query += " GROUP BY venue, day ORDER BY day, venue"
+
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute(query, params).fetchall()
+        conn.close()
+        return [{'venue': r[0], 'date': r[1], 'transactions': r[2], 'amount': round(r[3] or 0, 2)} for r in rows]
+
+
+def main(argv):
+    command = argv[1] if len(argv) > 1 else ''
+
+    if command == 'export':
+        venues = [argv[2]] if len(argv) > 2 else Config.VENUES
+        for venue in venues:
+            ReplicationExporter(venue).export_all()
+    elif command == 'apply':
+        CentralAggregator().apply_dir(argv[2] if len(argv) > 2 else None)
+    elif command == 'report':
+        for row in CentralAggregator().revenue_report(argv[2] if len(argv) > 2 else None,
+                                                      argv[3] if len(argv) > 3 else None):
+            print(f"{row['date']}  {row['venue']:<15} {row['transactions']:>6}  ₹{row['amount']:.2f}")
+    else:
+        print(__doc__)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -15,10 +15,11 @@ CREATE TABLE IF NOT EXISTS customers (
     last_session_minutes REAL DEFAULT 0.0,
     last_session_time DATETIME,
     last_updated_date DATE,
-    created_date DATETIME DEFAULT CURRENT_TIMESTAMP
+    created_date DATETIME DEFAULT CURRENT_TIMESTAMP,
+    deleted_date DATETIME
 );
 
--- Transactions Table
+-- Transactions Table (append-only ledger: corrections are 'reversal' entries)
 CREATE TABLE IF NOT EXISTS transactions (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     customer_id INTEGER,
@@ -28,12 +29,90 @@ CREATE TABLE IF NOT EXISTS transactions (
     description TEXT,
     staff_user TEXT,
     created_date DATETIME DEFAULT CURRENT_TIMESTAMP,
+    session_id INTEGER,
+    minutes REAL,
+    reverses_id INTEGER REFERENCES transactions(id),
     FOREIGN KEY(customer_id) REFERENCES customers(id)
 );
 
+CREATE TRIGGER IF NOT EXISTS trg_transactions_no_delete BEFORE DELETE ON transactions
+BEGIN
+    SELECT RAISE(ABORT, 'transactions are append-only - post a reversal instead');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_transactions_no_update
+BEFORE UPDATE OF customer_id, amount, minutes, transaction_type, game_type, description,
+                 staff_user, created_date, session_id, reverses_id ON transactions
+BEGIN
+    SELECT RAISE(ABORT, 'transactions are append-only - post a reversal instead');
+END;
+
+-- Customer totals include every transaction up to ledger_id
+CREATE TABLE IF NOT EXISTS ledger_snapshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ledger_id INTEGER NOT NULL,
+    entries INTEGER NOT NULL DEFAULT 0,
+    customers INTEGER NOT NULL DEFAULT 0,
+    created_date DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
 -- Create indexes for better performance
 CREATE INDEX IF NOT EXISTS idx_customers_phone ON customers(phone);
 CREATE INDEX IF NOT EXISTS idx_customers_total_amount ON customers(total_amount DESC);
-CREATE INDEX IF NOT EXISTS idx_transactions_customer_id ON transactions(customer_id);
+CREATE INDEX IF NOT EXISTS idx_transactions_ledger ON transactions(customer_id, transaction_type, game_type, amount, minutes);
 CREATE INDEX IF NOT EXISTS idx_transactions_created_date ON transactions(created_date);
+CREATE INDEX IF NOT EXISTS idx_transactions_customer_history ON transactions(customer_id, created_date, id);
 CREATE INDEX IF NOT EXISTS idx_transactions_game_type ON transactions(game_type);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_transactions_reverses ON transactions(reverses_id) WHERE reverses_id IS NOT NULL;
+
+-- Game type registry and per-customer, per-game aggregates
+CREATE TABLE IF NOT EXISTS game_types (
+    key TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    active INTEGER NOT NULL DEFAULT 1,
+    sort_order INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS customer_game_stats (
+    customer_id INTEGER NOT NULL,
+    game_type TEXT NOT NULL,
+    amount REAL NOT NULL DEFAULT 0.0,
+    minutes REAL NOT NULL DEFAULT 0.0,
+    sessions INTEGER NOT NULL DEFAULT 0,
+    last_played DATETIME,
+    PRIMARY KEY (customer_id, game_type),
+    FOREIGN KEY(customer_id) REFERENCES customers(id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_game_stats_game_amount ON customer_game_stats(game_type, amount DESC);
+
+-- Table reservations (start/end as epoch seconds; status booked, seated, cancelled or no_show)
+CREATE TABLE IF NOT EXISTS reservations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    game_type TEXT NOT NULL,
+    table_id INTEGER NOT NULL,
+    customer_id INTEGER,
+    name TEXT NOT NULL,
+    phone TEXT,
+    party_size INTEGER,
+    start_epoch INTEGER NOT NULL,
+    end_epoch INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'booked',
+    notes TEXT,
+    staff_user TEXT,
+    created_date DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_date DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY(customer_id) REFERENCES customers(id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_reservations_table_start ON reservations(game_type, table_id, start_epoch);
+CREATE INDEX IF NOT EXISTS idx_reservations_start ON reservations(start_epoch);
+
+-- Clocks of tables that were running or paused at shutdown (state is JSON), restored at the next start
+CREATE TABLE IF NOT EXISTS table_clocks (
+    game_type TEXT NOT NULL,
+    table_id INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    saved_epoch INTEGER NOT NULL,
+    PRIMARY KEY (game_type, table_id)
+);
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Venue shards: one SQLite database per venue behind a router
+
+The default venue keeps using Config.DATABASE_PATH; every other venue in
+Config.VENUES gets data/venues/<venue>.db with its own customers, tables,
+backups and change feed. Shards are opened lazily on first request.
+
+Usage (from the project directory):
+    python3 -m database.venues list
+    python3 -m database.venues init <venue>
+"""
+
+import os
+import re
+import sqlite3
+import sys
+import threading
+from config import Config
+from database.init_db import init_database
+from models.sync import ChangeFeed, IdempotencyIndex, change_feed, operation_index
+
+VENUE_PATTERN = re.compile(r'^[a-z0-9][a-z0-9_-]{0,40}$')
+
+
+def venue_db_path(venue):
+    if venue == Config.DEFAULT_VENUE:
+        return Config.DATABASE_PATH
+    return os.path.join(Config.VENUE_DB_DIR, f"{venue}.db")
+
+
+def venue_backup_root(venue):
+    if venue == Config.DEFAULT_VENUE:
+        return Config.BACKUP_STORE_DIR
+    return os.path.join(Config.BACKUP_STORE_DIR, 'venues', venue)
+
+
+def venue_export_path(venue):
+    if venue == Config.DEFAULT_VENUE:
+        return Config.EXPORT_PATH
+    return os.path.join(Config.VENUE_DB_DIR, f"{venue}_customer_export.txt")
+
+
+class VenueRouter:
+    """Maps a venue name to its CustomerModel and TableManager"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.customers = {}
+        self.table_managers = {}
+        self.feeds = {Config.DEFAULT_VENUE: change_feed}
+        self.operation_indexes = {Config.DEFAULT_VENUE: operation_index}
+
+    def is_known(self, venue):
+        return venue in Config.VENUES and bool(VENUE_PATTERN.match(venue))
+
+    def may_access(self, role, venue):
+        """Whether a role may use a venue (Config.VENUE_ACCESS; unlisted roles get the default venue only)"""
+        allowed = Config.VENUE_ACCESS.get(role, [Config.DEFAULT_VENUE])
+        return '*' in allowed or venue in allowed
+
+    def register(self, venue, customer_model=None, table_manager=None):
+        """Adopt instances created at startup (the default venue's app-wide ones)"""
+        with self.lock:
+            if customer_model is not None:
+                self.customers[venue] = customer_model
+            if table_manager is not None:
+                self.table_managers[venue] = table_manager
+
+    def _feed(self, venue):
+        if venue not in self.feeds:
+            self.feeds[venue] = ChangeFeed()
+        return self.feeds[venue]
+
+    def get_operations(self, venue):
+        """The venue's sync idempotency index, so an op_id replayed at another venue is not skipped"""
+        with self.lock:
+            if venue not in self.operation_indexes:
+                self.operation_indexes[venue] = IdempotencyIndex()
+            return self.operation_indexes[venue]
+
+    def _prepare(self, venue):
+        if not self.is_known(venue):
+            raise KeyError(f"Unknown venue: {venue}")
+        path = venue_db_path(venue)
+        if not os.path.exists(path):
+            init_database(path)
+        return path
+
+    def get_customers(self, venue):
+        with self.lock:
+            model = self.customers.get(venue)
+            if model is None:
+                from models.customer import CustomerModel
+                model = CustomerModel(db_path=self._prepare(venue), export_path=venue_export_path(venue),
+                                      backup_root=venue_backup_root(venue), feed=self._feed(venue))
+                self.customers[venue] = model
+                print(f"🏢 Venue shard opened: {venue} (customers)")
+            return model
+
+    def get_tables(self, venue):
+        with self.lock:
+            manager = self.table_managers.get(venue)
+            if manager is None:
+                from models.table import TableManager
+                manager = TableManager(db_path=self._prepare(venue), feed=self._feed(venue))
+                self.table_managers[venue] = manager
+                print(f"🏢 Venue shard opened: {venue} (tables)")
+            return manager
+
+    def stop(self):
+        with self.lock:
+            for manager in self.table_managers.values():
+                manager.stop()
+            for model in self.customers.values():
+                model.ledger.stop()
+    
+    def shutdown(self):
+        """Flush every open shard before exit: table clocks, ledger tail, then a WAL checkpoint"""
+        self.stop()
+        with self.lock:
+            managers = dict(self.table_managers)
+            models = dict(self.customers)
+        
+        for venue, manager in managers.items():
+            try:
+                manager.persist_clocks()
+            except Exception as e:
+                print(f"❌ Could not save table clocks for {venue}: {e}")
+        for venue, model in models.items():
+            try:
+                model.ledger.snapshot()
+            except Exception as e:
+                print(f"❌ Could not fold the ledger for {venue}: {e}")
+        
+        for venue in set(managers) | set(models):
+            try:
+                conn = sqlite3.connect(venue_db_path(venue), timeout=30)
+                busy, log_pages, moved = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+                conn.close()
+                if log_pages >= 0:
+                    print(f"💾 WAL checkpoint ({venue}): {moved}/{log_pages} pages" + (" - busy" if busy else ""))
+            except sqlite3.Error as e:
+                print(f"❌ WAL checkpoint failed for {venue}: {e}")
+
+    def status(self):
+        with self.lock:
+            return [{
+                'venue': venue,
+                'database': venue_db_path(venue),
+                'exists': os.path.exists(venue_db_path(venue)),
+                'open': venue in self.customers or venue in self.table_managers
+            } for venue in Config.VENUES]
+
+
+venue_router = VenueRouter()
+
+
+def main(argv):
+    command = argv[1] if len(argv) > 1 else 'list'
+    if command == 'list':
+        for venue in venue_router.status():
+            print(f"{venue['venue']:<20} {'✅' if venue['exists'] else '❌'} {venue['database']}")
+    elif command == 'init' and len(argv) > 2:
+        if not VENUE_PATTERN.match(argv[2]):
+            print(f"❌ Invalid venue name: {argv[2]}")
+            return 1
+        init_database(venue_db_path(argv[2]))
+    else:
+        print(__doc__)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -1,41 +1,41 @@
 import sqlite3
-import shutil
 import os
 from datetime import datetime, date
 from config import Config
+from database.backup_store import BackupStore
+from database.export import iter_export
+from models.leaderboard import CustomerLeaderboards
+from models.ledger import CUSTOMER_SELECT, Ledger
+from models.sync import change_feed
+from utils.tracing import connect, traced
 
 class CustomerModel:
-    def __init__(self):
-        self.db_path = Config.DATABASE_PATH
-        self.export_path = Config.EXPORT_PATH
-        self.backup_dir = "/home/h21s/table_tracker_pro/backups"
+    def __init__(self, db_path=None, export_path=None, backup_root=None, feed=None):
+        self.db_path = db_path or Config.DATABASE_PATH
+        self.export_path = export_path or Config.EXPORT_PATH
+        self.change_feed = feed or change_feed
         
         # Ensure directories exist
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
-        os.makedirs(self.backup_dir, exist_ok=True)
+        self.backup_store = BackupStore(root=backup_root, db_path=self.db_path)
         
         self._reset_daily_amounts()
+        
+        # Transactions are the source of truth; customer totals are periodic snapshots of them
+        self.ledger = Ledger(self.get_connection, os.path.splitext(os.path.basename(self.db_path))[0])
+        self._fold_ledger()
+        self.ledger.start()
+        
+        self.leaderboard = CustomerLeaderboards()
+        self._load_leaderboard()
         print(f"✅ Customer Model initialized - DB: {self.db_path}")
     
+    @traced('CustomerModel._create_backup')
     def _create_backup(self, operation=""):
-        """Create automatic backup of database"""
+        """Create automatic backup of database (only changed chunks are stored)"""
         try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_filename = f"auto_backup_{operation}_{timestamp}.db"
-            backup_path = os.path.join(self.backup_dir, backup_filename)
-            
             if os.path.exists(self.db_path):
-                shutil.copy2(self.db_path, backup_path)
-                print(f"💾 Auto-backup created: {backup_filename}")
-                
-                # Clean old auto-backups (keep last 5)
-                auto_backups = [f for f in os.listdir(self.backup_dir) if f.startswith("auto_backup_")]
-                auto_backups.sort(reverse=True)
-                
-                for old_backup in auto_backups[5:]:
-                    old_path = os.path.join(self.backup_dir, old_backup)
-                    os.remove(old_path)
-                    
+                self.backup_store.snapshot(operation)
         except Exception as e:
             print(f"⚠️ Auto-backup failed: {e}")
     
@@ -46,11 +46,13 @@ class CustomerModel:
             c = conn.cursor()
             today = date.today().isoformat()
             
+            # Only rows with something to clear: every update bumps repl_seq and is replicated
             c.execute("""UPDATE customers SET 
                          today_amount = 0.0, 
                          today_minutes = 0.0,
                          last_updated_date = ?
-                         WHERE last_updated_date != ? OR last_updated_date IS NULL""", 
+                         WHERE (last_updated_date != ? OR last_updated_date IS NULL)
+                         AND (COALESCE(today_amount, 0) != 0 OR COALESCE(today_minutes, 0) != 0)""", 
                       (today, today))
             conn.commit()
             conn.close()
@@ -58,9 +60,41 @@ class CustomerModel:
         except Exception as e:
             print(f"⚠️ Failed to reset daily amounts: {e}")
     
+    def _fold_ledger(self):
+        """Bring the customer totals up to date with the ledger"""
+        try:
+            return self.ledger.snapshot()
+        except Exception as e:
+            print(f"⚠️ Ledger snapshot failed: {e}")
+            return None
+    
+    def _read(self, query, params=()):
+        """Customer rows with the ledger tail applied, read in one transaction"""
+        conn = self.get_connection()
+        conn.isolation_level = None
+        try:
+            c = conn.cursor()
+            c.execute("BEGIN")
+            c.execute(query, params)
+            rows = self.ledger.overlay(c, c.fetchall())
+            c.execute("COMMIT")
+            return rows
+        finally:
+            conn.close()
+    
+    def _load_leaderboard(self):
+        """Build the in-process leaderboards from the customers table"""
+        try:
+            conn = self.get_connection()
+            self.leaderboard.load(conn)
+            conn.close()
+        except Exception as e:
+            print(f"⚠️ Failed to load leaderboards: {e}")
+    
     def get_connection(self):
-        return sqlite3.connect(self.db_path)
+        return connect(self.db_path)
     
+    @traced('CustomerModel.add_customer')
     def add_customer(self, name, phone):
         try:
             conn = self.get_connection()
@@ -72,84 +106,157 @@ class CustomerModel:
             conn.commit()
             conn.close()
             
+            self.leaderboard.set_name(customer_id, name)
+            self.change_feed.record('customer_added', {'customer_id': customer_id, 'name': name, 'phone': phone})
+            
             # Auto-backup on new customer
             self._create_backup("add_customer")
             return customer_id
         except sqlite3.IntegrityError:
             return None
     
+    @traced('CustomerModel.search_customers')
     def search_customers(self, search_term):
-        conn = self.get_connection()
-        c = conn.cursor()
-        c.execute("SELECT * FROM customers WHERE name LIKE ? OR phone LIKE ? ORDER BY name", 
-                  (f'%{search_term}%', f'%{search_term}%'))
-        customers = c.fetchall()
-        conn.close()
-        return customers
+        return self._read(f"""SELECT {CUSTOMER_SELECT} FROM customers WHERE deleted_date IS NULL AND (name LIKE ? OR phone LIKE ?)
+                             ORDER BY name""", (f'%{search_term}%', f'%{search_term}%'))
     
+    @traced('CustomerModel.get_all_customers')
     def get_all_customers(self):
-        conn = self.get_connection()
-        c = conn.cursor()
-        c.execute("SELECT * FROM customers ORDER BY total_amount DESC")
-        customers = c.fetchall()
-        conn.close()
+        customers = self._read(f"SELECT {CUSTOMER_SELECT} FROM customers WHERE deleted_date IS NULL ORDER BY total_amount DESC")
+        # The tail can reorder customers whose snapshot totals were close
+        customers.sort(key=lambda row: row[3] or 0, reverse=True)
         return customers
     
-    def add_amount_to_customer(self, customer_id, amount, minutes, description, staff_user, game_type):
+    @traced('CustomerModel.get_balance')
+    def get_balance(self, customer_id):
+        """One customer's totals: the last snapshot plus their entries since"""
+        rows = self._read(f"SELECT {CUSTOMER_SELECT} FROM customers WHERE id = ? AND deleted_date IS NULL", (customer_id,))
+        return rows[0] if rows else None
+    
+    @traced('CustomerModel.add_amount_to_customer')
+    def add_amount_to_customer(self, customer_id, amount, minutes, description, staff_user, game_type, session_id=None):
         conn = self.get_connection()
         c = conn.cursor()
-        today = date.today().isoformat()
         
-        if game_type == 'snooker':
-            c.execute("""UPDATE customers SET 
-                         total_amount = total_amount + ?,
-                         total_minutes = total_minutes + ?,
-                         snooker_amount = COALESCE(snooker_amount, 0) + ?,
-                         snooker_minutes = COALESCE(snooker_minutes, 0) + ?,
-                         today_amount = COALESCE(today_amount, 0) + ?,
-                         today_minutes = COALESCE(today_minutes, 0) + ?,
-                         last_session_amount = ?,
-                         last_session_minutes = ?,
-                         last_session_time = CURRENT_TIMESTAMP,
-                         last_updated_date = ?
-                         WHERE id = ?""", 
-                      (amount, minutes, amount, minutes, amount, minutes, 
-                       amount, minutes, today, customer_id))
-        else:  # pool
-            c.execute("""UPDATE customers SET 
-                         total_amount = total_amount + ?,
-                         total_minutes = total_minutes + ?,
-                         pool_amount = COALESCE(pool_amount, 0) + ?,
-                         pool_minutes = COALESCE(pool_minutes, 0) + ?,
-                         today_amount = COALESCE(today_amount, 0) + ?,
-                         today_minutes = COALESCE(today_minutes, 0) + ?,
-                         last_session_amount = ?,
-                         last_session_minutes = ?,
-                         last_session_time = CURRENT_TIMESTAMP,
-                         last_updated_date = ?
-                         WHERE id = ?""", 
-                      (amount, minutes, amount, minutes, amount, minutes,
-                       amount, minutes, today, customer_id))
+        # Append-only: the snapshot job folds this entry into the customer's totals
+        c.execute("INSERT INTO transactions (customer_id, amount, minutes, transaction_type, game_type, description, staff_user, session_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                  (customer_id, amount, minutes, 'session', game_type, description, staff_user, session_id))
         
-        c.execute("INSERT INTO transactions (customer_id, amount, transaction_type, game_type, description, staff_user) VALUES (?, ?, ?, ?, ?, ?)",
-                  (customer_id, amount, 'session', game_type, description, staff_user))
+        if session_id:
+            # First payer owns the session row; split payers are linked via transactions
+            c.execute("UPDATE sessions SET customer_id = ? WHERE id = ? AND customer_id IS NULL",
+                      (customer_id, session_id))
         
         conn.commit()
         conn.close()
+        self.ledger.note_write()
+        
+        self.leaderboard.record_session(customer_id, amount, game_type)
+        self.change_feed.record('customer_amount', {
+            'customer_id': customer_id, 'amount': amount, 'minutes': minutes,
+            'game_type': game_type, 'session_id': session_id
+        })
         
         # Auto-backup on session completion (important data)
         self._create_backup("session_complete")
     
-    def adjust_customer_balance(self, customer_id, amount, transaction_type, staff_user):
+    @traced('CustomerModel.split_amount_to_customers')
+    def split_amount_to_customers(self, players, per_player_amount, minutes, description, staff_user, game_type, session_id=None):
+        """Charge every player the same amount in one transaction - all of them or none"""
         conn = self.get_connection()
+        try:
+            c = conn.cursor()
+            c.executemany("""INSERT INTO transactions (customer_id, amount, minutes, transaction_type, game_type,
+                                                       description, staff_user, session_id)
+                             VALUES (?, ?, ?, 'session', ?, ?, ?, ?)""",
+                          [(player.get('customer_id'), per_player_amount, minutes, game_type,
+                            description, staff_user, session_id) for player in players])
+            if session_id:
+                c.execute("UPDATE sessions SET customer_id = ? WHERE id = ? AND customer_id IS NULL",
+                          (players[0].get('customer_id'), session_id))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        
+        self.after_charges({
+            'session_id': session_id, 'game_type': game_type, 'minutes': minutes,
+            'players': [{'customer_id': player.get('customer_id'), 'amount': per_player_amount} for player in players]
+        })
+    
+    def lookup_customers(self, customer_ids):
+        """{id: name} for the given ids that exist and are not deleted"""
+        if not customer_ids:
+            return {}
+        conn = self.get_connection()
+        rows = conn.execute(f"""SELECT id, name FROM customers
+                                WHERE deleted_date IS NULL AND id IN ({', '.join('?' for _ in customer_ids)})""",
+                            list(customer_ids)).fetchall()
+        conn.close()
+        return dict(rows)
+    
+    def charge_session(self, conn, table_id, session, players, staff_user):
+        """Post a finished session's charges for its bound players inside the caller's transaction.
+        
+        The amount is split by each player's share (default 1) in whole
+        paise, with leftover paise going to the first players; every player
+        is credited the full session minutes. Returns the bill; call
+        after_charges() once the transaction has committed.
+        """
+        game_type = session['game_type']
+        total_paise = int(round(session['amount'] * 100))
+        weights = [max(float(player.get('share') or 1), 0.0) for player in players]
+        weight_total = sum(weights) or len(players)
+        shares = [int(total_paise * weight // weight_total) for weight in weights]
+        for index in range(total_paise - sum(shares)):
+            shares[index % len(shares)] += 1
+        
+        description = f"{game_type.title()} Table {table_id} session"
+        if len(players) > 1:
+            description += f" (split {len(players)} ways)"
+        
         c = conn.cursor()
-        today = date.today().isoformat()
+        c.executemany("""INSERT INTO transactions (customer_id, amount, minutes, transaction_type, game_type,
+                                                   description, staff_user, session_id)
+                         VALUES (?, ?, ?, 'session', ?, ?, ?, ?)""",
+                      [(player['customer_id'], paise / 100, session['duration'], game_type,
+                        description, staff_user, session['id']) for player, paise in zip(players, shares)])
         
-        c.execute("""UPDATE customers SET 
-                     total_amount = total_amount + ?,
-                     today_amount = COALESCE(today_amount, 0) + ?,
-                     last_updated_date = ?
-                     WHERE id = ?""", (amount, amount, today, customer_id))
+        return {
+            'session_id': session['id'],
+            'game_type': game_type,
+            'table_id': table_id,
+            'date': session['date'],
+            'start_time': session['start_time'],
+            'end_time': session['end_time'],
+            'minutes': session['duration'],
+            'rate': session['rate'],
+            'total': round(total_paise / 100, 2),
+            'players': [{'customer_id': player['customer_id'], 'name': player.get('name'), 'amount': paise / 100}
+                        for player, paise in zip(players, shares)]
+        }
+    
+    def after_charges(self, bill):
+        """Leaderboards, change feed and one backup for a committed bill"""
+        try:
+            for player in bill['players']:
+                self.ledger.note_write()
+                self.leaderboard.record_session(player['customer_id'], player['amount'], bill['game_type'])
+                self.change_feed.record('customer_amount', {
+                    'customer_id': player['customer_id'], 'amount': player['amount'], 'minutes': bill['minutes'],
+                    'game_type': bill['game_type'], 'session_id': bill['session_id']
+                })
+        except Exception as e:
+            # The charges are committed; a bookkeeping failure must not make them look failed (and retried)
+            print(f"⚠️ Post-charge bookkeeping failed for session {bill['session_id']}: {e}")
+        self._create_backup("session_complete")
+    
+    @traced('CustomerModel.adjust_customer_balance')
+    def adjust_customer_balance(self, customer_id, amount, transaction_type, staff_user):
+        conn = self.get_connection()
+        c = conn.cursor()
         
         description = f"Manual {'addition' if amount > 0 else 'subtraction'} by {staff_user}"
         c.execute("INSERT INTO transactions (customer_id, amount, transaction_type, description, staff_user) VALUES (?, ?, ?, ?, ?)",
@@ -157,48 +264,221 @@ class CustomerModel:
         
         conn.commit()
         conn.close()
+        self.ledger.note_write()
+        
+        self.leaderboard.record_adjustment(customer_id, amount)
+        self.change_feed.record('customer_adjustment', {
+            'customer_id': customer_id, 'amount': amount, 'transaction_type': transaction_type
+        })
         
         # Auto-backup on balance adjustment
         self._create_backup("balance_adjust")
     
+    @traced('CustomerModel.reverse_transaction')
+    def reverse_transaction(self, transaction_id, staff_user, reason, corrected_amount=None):
+        """Cancel a ledger entry with a compensating one, optionally re-posting the right amount"""
+        conn = self.get_connection()
+        conn.isolation_level = None
+        try:
+            c = conn.cursor()
+            # Write lock before the check, so two reversals of one entry cannot both pass it
+            c.execute("BEGIN IMMEDIATE")
+            c.execute("""SELECT t.customer_id, t.amount, t.minutes, t.transaction_type, t.game_type, t.session_id,
+                                EXISTS (SELECT 1 FROM transactions r WHERE r.reverses_id = t.id)
+                         FROM transactions t WHERE t.id = ?""", (transaction_id,))
+            row = c.fetchone()
+            if row is None:
+                return {"success": False, "error": "Transaction not found"}
+            
+            customer_id, amount, minutes, transaction_type, game_type, session_id, already_reversed = row
+            if transaction_type == 'reversal':
+                return {"success": False, "error": "A reversal cannot be reversed - post a correction instead"}
+            if already_reversed:
+                return {"success": False, "error": "Transaction already reversed"}
+            
+            # Only session entries count towards a game, so only their reversals carry the game type
+            game_type = game_type if transaction_type == 'session' else None
+            c.execute("""INSERT INTO transactions (customer_id, amount, minutes, transaction_type, game_type,
+                                                   description, staff_user, session_id, reverses_id)
+                         VALUES (?, ?, ?, 'reversal', ?, ?, ?, ?, ?)""",
+                      (customer_id, -(amount or 0), -minutes if minutes else minutes, game_type,
+                       f"Reversal of #{transaction_id}: {reason}", staff_user, session_id, transaction_id))
+            reversal_id = c.lastrowid
+            
+            correction_id = None
+            if corrected_amount is not None:
+                c.execute("""INSERT INTO transactions (customer_id, amount, minutes, transaction_type, game_type,
+                                                       description, staff_user, session_id)
+                             VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                          (customer_id, corrected_amount, minutes, transaction_type, game_type,
+                           f"Correction of #{transaction_id}: {reason}", staff_user, session_id))
+                correction_id = c.lastrowid
+            
+            c.execute("COMMIT")
+        except sqlite3.IntegrityError:
+            # idx_transactions_reverses: a reversal from another process got there first
+            return {"success": False, "error": "Transaction already reversed"}
+        finally:
+            # Closing with the transaction still open (early return, error) rolls it back
+            conn.close()
+        self.ledger.note_write()
+        
+        change = (corrected_amount or 0) - (amount or 0)
+        if game_type:
+            self.leaderboard.record_session(customer_id, change, game_type)
+        else:
+            self.leaderboard.record_adjustment(customer_id, change)
+        self.change_feed.record('customer_reversal', {
+            'customer_id': customer_id, 'transaction_id': transaction_id,
+            'reversal_id': reversal_id, 'correction_id': correction_id, 'amount': change
+        })
+        
+        self._create_backup("transaction_reversal")
+        return {"success": True, "customer_id": customer_id, "reversal_id": reversal_id,
+                "correction_id": correction_id, "amount_change": round(change, 2)}
+    
+    @traced('CustomerModel.soft_delete_customer')
+    def soft_delete_customer(self, customer_id):
+        """Hide a customer but keep their ledger; the phone number becomes free for reuse"""
+        conn = self.get_connection()
+        c = conn.cursor()
+        c.execute("""UPDATE customers SET deleted_date = CURRENT_TIMESTAMP,
+                         phone = phone || ':deleted:' || id
+                     WHERE id = ? AND deleted_date IS NULL""", (customer_id,))
+        deleted = c.rowcount
+        conn.commit()
+        conn.close()
+        
+        if deleted:
+            self.leaderboard.remove(customer_id)
+            self.change_feed.record('customer_deleted', {'customer_id': customer_id})
+        return bool(deleted)
+    
+    def iter_customer_history(self, customer_id, limit=50, before=None):
+        """Yield a customer's transactions newest first, joined to their sessions.
+        
+        Keyset pagination: `before` is the (created_date, id) of the last row
+        already seen, so each page is an index range scan on
+        idx_transactions_customer_history regardless of how deep it is.
+        """
+        conn = self.get_connection()
+        try:
+            c = conn.cursor()
+            query = """SELECT t.id, t.created_date, t.amount, t.transaction_type, t.game_type,
+                              t.description, t.staff_user, t.reverses_id, s.id, s.table_id,
+                              time(s.start_epoch, 'unixepoch', 'localtime'), time(s.end_epoch, 'unixepoch', 'localtime'),
+                              round(s.duration_seconds / 60.0, 1), s.rate_paise / 100.0,
+                              date(s.end_epoch, 'unixepoch', 'localtime')
+                       FROM transactions t
+                       LEFT JOIN sessions s ON s.id = t.session_id
+                       WHERE t.customer_id = ?"""
+            params = [customer_id]
+            if before:
+                query += " AND (t.created_date, t.id) < (?, ?)"
+                params.extend(before)
+            query += " ORDER BY t.created_date DESC, t.id DESC LIMIT ?"
+            params.append(limit)
+            
+            c.execute(query, params)
+            for row in c:
+                yield {
+                    'id': row[0], 'created_date': row[1], 'amount': row[2],
+                    'transaction_type': row[3], 'game_type': row[4],
+                    'description': row[5], 'staff_user': row[6], 'reverses_id': row[7],
+                    'session': {
+                        'id': row[8], 'table_id': row[9], 'start_time': row[10],
+                        'end_time': row[11], 'duration': row[12], 'rate': row[13],
+                        'date': row[14]
+                    } if row[8] is not None else None
+                }
+        finally:
+            conn.close()
+    
+    @traced('CustomerModel.get_today_stats')
     def get_today_stats(self):
         conn = self.get_connection()
+        conn.isolation_level = None
         c = conn.cursor()
         today = date.today().isoformat()
+        c.execute("BEGIN")
         
-        c.execute("SELECT COUNT(*) FROM customers")
+        c.execute("SELECT COUNT(*) FROM customers WHERE deleted_date IS NULL")
         total_customers = c.fetchone()[0]
         
         c.execute("SELECT SUM(COALESCE(today_amount, 0)), SUM(COALESCE(today_minutes, 0)) FROM customers WHERE last_updated_date = ?", (today,))
-        today_total = c.fetchone()
+        today_total = list(c.fetchone())
+        for delta in self.ledger.tail(c, self.ledger.latest(c)).values():
+            today_total[0] = (today_total[0] or 0) + delta.amount
+            today_total[1] = (today_total[1] or 0) + delta.minutes
         
-        c.execute("SELECT SUM(amount) FROM transactions WHERE DATE(created_date) = ? AND game_type = 'snooker'", (today,))
-        snooker_today = c.fetchone()[0] or 0
-        
-        c.execute("SELECT SUM(amount) FROM transactions WHERE DATE(created_date) = ? AND game_type = 'pool'", (today,))
-        pool_today = c.fetchone()[0] or 0
+        # One range scan on idx_transactions_date for every game type
+        c.execute("""SELECT game_type, SUM(amount) FROM transactions
+                     WHERE created_date >= ? AND created_date < date(?, '+1 day') AND game_type IS NOT NULL
+                     GROUP BY game_type""", (today, today))
+        by_game = {game_type: amount or 0 for game_type, amount in c.fetchall()}
         
+        c.execute("COMMIT")
         conn.close()
         
         return {
             'total_customers': total_customers,
             'today_total_amount': today_total[0] or 0,
             'today_total_minutes': today_total[1] or 0,
-            'today_snooker_amount': snooker_today,
-            'today_pool_amount': pool_today
+            'today_snooker_amount': by_game.get('snooker', 0),
+            'today_pool_amount': by_game.get('pool', 0),
+            'today_by_game': by_game
         }
     
-    def get_top_customers(self, limit=5):
+    @traced('CustomerModel.get_game_stats')
+    def get_game_stats(self, customer_id=None):
+        """Per-game totals as {customer_id: {game_type: {...}}}"""
         conn = self.get_connection()
+        conn.isolation_level = None
         c = conn.cursor()
-        c.execute("SELECT name, total_amount FROM customers ORDER BY total_amount DESC LIMIT ?", (limit,))
-        top_customers = c.fetchall()
+        c.execute("BEGIN")
+        query = "SELECT customer_id, game_type, amount, minutes, sessions, last_played FROM customer_game_stats"
+        params = ()
+        if customer_id is not None:
+            query += " WHERE customer_id = ?"
+            params = (customer_id,)
+        c.execute(query, params)
+        stats = {}
+        for row in c.fetchall():
+            stats.setdefault(row[0], {})[row[1]] = {
+                'amount': row[2], 'minutes': row[3], 'sessions': row[4], 'last_played': row[5]
+            }
+        
+        for cid, delta in self.ledger.tail(c, self.ledger.latest(c), customer_id).items():
+            for game_type, (amount, minutes, sessions) in delta.games.items():
+                game = stats.setdefault(cid, {}).setdefault(
+                    game_type, {'amount': 0.0, 'minutes': 0.0, 'sessions': 0, 'last_played': None})
+                game['amount'] += amount
+                game['minutes'] += minutes
+                game['sessions'] += sessions
+                if delta.last_session:
+                    game['last_played'] = delta.last_session[2]
+        c.execute("COMMIT")
         conn.close()
-        return top_customers
+        return stats
     
+    @traced('CustomerModel.get_top_customers')
+    def get_top_customers(self, limit=5):
+        """Top customers from the in-process leaderboard, falling back to SQL"""
+        ranked = self.leaderboard.top('total', limit)
+        if ranked is not None:
+            return [(name, score) for _, name, score in ranked if name is not None]
+        
+        customers = self.get_all_customers()[:limit]
+        return [(row[1], row[3]) for row in customers]
+    
+    @traced('CustomerModel.export_to_txt')
     def export_to_txt(self):
         try:
-            customers = self.get_all_customers()
+            # The export reads customers directly, so fold the ledger tail in first
+            self._fold_ledger()
+            conn = self.get_connection()
+            total_customers = conn.execute("SELECT COUNT(*) FROM customers WHERE deleted_date IS NULL").fetchone()[0]
+            conn.close()
             os.makedirs(os.path.dirname(self.export_path), exist_ok=True)
             
             with open(self.export_path, 'w') as f:
@@ -206,17 +486,14 @@ class CustomerModel:
                 f.write("TABLE TRACKER PRO - CUSTOMER DATA EXPORT\n")
                 f.write(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
                 f.write("="*80 + "\n\n")
-                f.write(f"TOTAL CUSTOMERS: {len(customers)}\n")
+                f.write(f"TOTAL CUSTOMERS: {total_customers}\n")
                 f.write(f"EXPORT FILE: {self.export_path}\n")
                 f.write(f"DATABASE: {self.db_path}\n\n")
                 
-                if customers:
-                    f.write(f"{'ID':<5} {'NAME':<25} {'PHONE':<15} {'TOTAL':<12} {'SNOOKER':<12} {'POOL':<12}\n")
-                    f.write("-" * 83 + "\n")
-                    
-                    for customer in customers:
-                        f.write(f"{customer[0]:<5} {customer[1][:24]:<25} {customer[2]:<15} "
-                               f"₹{customer[3]:<11.2f} ₹{customer[5] or 0:<11.2f} ₹{customer[7] or 0:<11.2f}\n")
+                if total_customers:
+                    # Streamed from the cursor rather than fetchall()
+                    for chunk in iter_export(self.db_path, 'customers', 'txt'):
+                        f.write(chunk)
                 else:
                     f.write("No customers found.\n")
             
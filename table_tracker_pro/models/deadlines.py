@@ -0,0 +1,203 @@
+import abc
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from config import Config
+
+
+class Notifier(abc.ABC):
+    """Delivers an alert dict somewhere; subclasses implement notify()"""
+
+    def __init__(self, manager):
+        self.manager = manager
+
+    @abc.abstractmethod
+    def notify(self, alert):
+        """Deliver one alert; called from the deadline thread, so it should not block for long"""
+
+
+class FeedNotifier(Notifier):
+    """Publishes alerts on the venue's change feed (picked up by /api/sync clients)"""
+
+    def notify(self, alert):
+        self.manager.change_feed.record('alert', alert)
+
+
+class LogNotifier(Notifier):
+    def notify(self, alert):
+        print(f"🔔 {alert['message']}")
+
+
+NOTIFIERS = {
+    'feed': FeedNotifier,
+    'log': LogNotifier
+}
+
+
+def register_notifier(name, notifier_class):
+    """Make a Notifier subclass selectable through Config.ALERT_NOTIFIERS"""
+    if not issubclass(notifier_class, Notifier):
+        raise TypeError(f"{notifier_class.__name__} is not a Notifier")
+    NOTIFIERS[name] = notifier_class
+
+
+def played_seconds(table, now):
+    """Seconds played so far, including the part the timer thread has not counted yet"""
+    played = table['elapsed_seconds']
+    if table['status'] == 'running' and table['last_update']:
+        played += (now - table['last_update']).total_seconds()
+    return played
+
+
+class DeadlineScheduler:
+    """Prepaid-time deadlines for a TableManager's tables on one sleeping thread.
+
+    Deadlines sit in a min-heap keyed on time.monotonic(); the thread
+    sleeps until the earliest one (or until a new, earlier one arrives).
+    A table's deadlines are computed from its played time whenever its
+    state changes, so pausing and resuming just reschedules them. Older
+    heap entries are invalidated by bumping the table's generation and
+    skipped when they surface, so nothing ever scans all tables.
+    """
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.condition = threading.Condition()
+        self.heap = []
+        self.generations = {}
+        self.sequence = itertools.count()
+        self.alerts = deque(maxlen=Config.ALERT_HISTORY)
+        self.alert_ids = itertools.count(1)
+        self.notifiers = [NOTIFIERS[name](manager) for name in Config.ALERT_NOTIFIERS if name in NOTIFIERS]
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name='deadline_scheduler', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+
+    def pending(self):
+        with self.condition:
+            return sum(1 for entry in self.heap if self.generations.get(entry[2]) == entry[4])
+
+    def sync(self, game_type, table_id, table):
+        """Reschedule one table's deadlines from its current state (caller holds the manager lock)"""
+        key = (game_type, table_id)
+        with self.condition:
+            generation = self.generations.get(key, 0) + 1
+            self.generations[key] = generation
+            if (table is None or table['status'] != 'running' or not table.get('prepaid_minutes')
+                    or table.get('prepaid_expired')):
+                if table is None:
+                    del self.generations[key]
+                return
+
+            played = played_seconds(table, datetime.now())
+            limit = table['prepaid_minutes'] * 60
+            warning_at = limit - Config.PREPAID_WARNING_MINUTES * 60
+            now = time.monotonic()
+            if not table.get('prepaid_warned') and warning_at > 0:
+                heapq.heappush(self.heap, (now + max(0.0, warning_at - played), next(self.sequence),
+                                           key, 'warning', generation))
+            heapq.heappush(self.heap, (now + max(0.0, limit - played), next(self.sequence), key, 'expired', generation))
+            self._compact()
+            self.condition.notify()
+
+    def _compact(self):
+        """Drop superseded entries once they outnumber live ones (frequent pause/resume)"""
+        if len(self.heap) > 64 and len(self.heap) > 4 * len(self.generations):
+            self.heap = [entry for entry in self.heap if self.generations.get(entry[2]) == entry[4]]
+            heapq.heapify(self.heap)
+
+    def _run(self):
+        print("⏳ Deadline scheduler started")
+        while True:
+            with self.condition:
+                while self.running and (not self.heap or self.heap[0][0] > time.monotonic()):
+                    self.condition.wait(self.heap[0][0] - time.monotonic() if self.heap else None)
+                if not self.running:
+                    break
+                _, _, key, kind, generation = heapq.heappop(self.heap)
+                if self.generations.get(key) != generation:
+                    continue
+            try:
+                self._fire(key, kind)
+            except Exception as e:
+                print(f"⚠️ Deadline error for {key}: {e}")
+        print("⏳ Deadline scheduler stopped")
+
+    def _fire(self, key, kind):
+        game_type, table_id = key
+        manager = self.manager
+        alerts = []
+        with manager.lock:
+            table = manager.get_tables(game_type).get(table_id)
+            if table is None or table['status'] != 'running' or not table.get('prepaid_minutes'):
+                return
+            played = played_seconds(table, datetime.now())
+            limit = table['prepaid_minutes'] * 60
+            label = f"{manager.game_types.name(game_type)} Table {table_id}"
+            action = 'prepaid'
+
+            if kind == 'warning':
+                if played < limit - Config.PREPAID_WARNING_MINUTES * 60 - 1:
+                    # Woke early (clock adjustment) - try again from the current state
+                    self.sync(game_type, table_id, table)
+                    return
+                table['prepaid_warned'] = True
+                remaining = max(0, round((limit - played) / 60))
+                alerts.append(('prepaid_warning', f"{label}: {remaining} prepaid minutes left"))
+            else:
+                if played < limit - 1:
+                    self.sync(game_type, table_id, table)
+                    return
+                table['prepaid_expired'] = True
+                alerts.append(('prepaid_expired', f"{label}: prepaid {table['prepaid_minutes']:g} minutes used up"))
+                if table.get('prepaid_auto_pause'):
+                    if manager._apply_table_action(game_type, table_id, 'pause', 'system')['success']:
+                        action = 'pause'
+                        alerts.append(('auto_paused', f"{label} paused automatically"))
+            manager._record_change(game_type, table_id, action)
+
+        for alert_kind, message in alerts:
+            self.alert(game_type, table_id, alert_kind, message)
+
+    def alert(self, game_type, table_id, kind, message):
+        alert = {
+            'id': next(self.alert_ids),
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'game_type': game_type,
+            'table_id': table_id,
+            'kind': kind,
+            'message': message,
+            'acknowledged': False
+        }
+        self.alerts.append(alert)
+        for notifier in self.notifiers:
+            try:
+                notifier.notify(alert)
+            except Exception as e:
+                print(f"⚠️ {type(notifier).__name__} failed: {e}")
+        return alert
+
+    def list_alerts(self, since=0, unacknowledged=False):
+        return [dict(alert) for alert in list(self.alerts)
+                if alert['id'] > since and not (unacknowledged and alert['acknowledged'])]
+
+    def acknowledge(self, alert_id):
+        for alert in self.alerts:
+            if alert['id'] == alert_id:
+                alert['acknowledged'] = True
+                return True
+        return False
@@ -0,0 +1,62 @@
+import re
+import sqlite3
+import threading
+
+# Game types that still have dedicated snooker_*/pool_* columns on customers
+LEGACY_COLUMNS = {
+    'snooker': ('snooker_amount', 'snooker_minutes'),
+    'pool': ('pool_amount', 'pool_minutes')
+}
+
+DEFAULT_GAME_TYPES = [('snooker', 'Snooker'), ('pool', 'Pool')]
+
+KEY_PATTERN = re.compile(r'^[a-z][a-z0-9_]{1,30}$')
+
+# Names already taken by the leaderboard's fixed boards
+RESERVED_KEYS = {'total', 'today'}
+
+
+class GameTypeRegistry:
+    """Game types known to one venue database (snooker, pool, carrom, ...)"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.types = dict(DEFAULT_GAME_TYPES)
+        self.load()
+
+    def load(self):
+        try:
+            conn = sqlite3.connect(self.db_path)
+            rows = conn.execute("SELECT key, name FROM game_types WHERE active = 1 ORDER BY sort_order, key").fetchall()
+            conn.close()
+        except sqlite3.Error:
+            # Table not created yet - init_database seeds it
+            rows = []
+        with self.lock:
+            self.types = dict(rows) if rows else dict(DEFAULT_GAME_TYPES)
+        return self.types
+
+    def keys(self):
+        with self.lock:
+            return list(self.types)
+
+    def is_valid(self, key):
+        return key in self.types
+
+    def name(self, key):
+        return self.types.get(key, key.replace('_', ' ').title())
+
+    def add(self, key, name):
+        """Register (or re-activate) a game type, returning False for a malformed key"""
+        if not KEY_PATTERN.match(key or '') or key in RESERVED_KEYS:
+            return False
+        conn = sqlite3.connect(self.db_path)
+        with conn:
+            conn.execute("""INSERT INTO game_types (key, name, active, sort_order)
+                            VALUES (?, ?, 1, (SELECT COALESCE(MAX(sort_order), 0) + 1 FROM game_types))
+                            ON CONFLICT(key) DO UPDATE SET name = excluded.name, active = 1""", (key, name))
+        conn.close()
+        self.load()
+        print(f"🎲 Game type registered: {key} ({name})")
+        return True
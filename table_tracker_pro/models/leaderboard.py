@@ -0,0 +1,209 @@
+import heapq
+import threading
+from datetime import date
+from config import Config
+
+
+class Leaderboard:
+    """Bounded top-K min-heap kept alongside a full id -> score map.
+
+    outside_best is an upper bound on the (score, id) of every customer not
+    in the heap. A member that drops below it may have been overtaken, so
+    the heap is marked stale and rebuilt on the next read instead of on
+    every decrease.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.scores = {}
+        self.heap = []
+        self.members = set()
+        self.outside_best = None
+        self.stale = False
+
+    def load(self, rows):
+        """Replace all scores from (id, score) rows"""
+        self.scores = {customer_id: score or 0.0 for customer_id, score in rows}
+        self._rebuild()
+
+    def _rebuild(self):
+        ranked = heapq.nlargest(self.capacity + 1, ((score, customer_id) for customer_id, score in self.scores.items()))
+        self.outside_best = ranked[self.capacity] if len(ranked) > self.capacity else None
+        self.heap = ranked[:self.capacity]
+        heapq.heapify(self.heap)
+        self.members = {customer_id for _, customer_id in self.heap}
+        self.stale = False
+
+    def _outside(self, entry):
+        if self.outside_best is None or entry > self.outside_best:
+            self.outside_best = entry
+
+    def add(self, customer_id, delta):
+        """Apply a score delta for one customer"""
+        self.set(customer_id, self.scores.get(customer_id, 0.0) + delta)
+
+    def set(self, customer_id, score):
+        self.scores[customer_id] = score
+        if self.stale:
+            # The next read rebuilds from scores anyway
+            return
+
+        entry = (score, customer_id)
+        if customer_id in self.members:
+            for i, (_, member_id) in enumerate(self.heap):
+                if member_id == customer_id:
+                    self.heap[i] = entry
+                    break
+            heapq.heapify(self.heap)
+            if self.outside_best is not None and entry < self.outside_best:
+                # Someone outside the heap may now outrank it
+                self.stale = True
+        elif len(self.heap) < self.capacity:
+            heapq.heappush(self.heap, entry)
+            self.members.add(customer_id)
+        elif entry > self.heap[0]:
+            evicted = heapq.heapreplace(self.heap, entry)
+            self.members.discard(evicted[1])
+            self.members.add(customer_id)
+            self._outside(evicted)
+        else:
+            self._outside(entry)
+
+    def remove(self, customer_id):
+        if self.scores.pop(customer_id, None) is not None and customer_id in self.members:
+            self.stale = True
+
+    def clear(self):
+        self.scores = {}
+        self.heap = []
+        self.members = set()
+        self.outside_best = None
+        self.stale = False
+
+    def top(self, limit):
+        """Return [(id, score)] best first, or None if limit exceeds the heap capacity"""
+        if limit > self.capacity:
+            return None
+        if limit <= 0:
+            return []
+        if self.stale:
+            self._rebuild()
+        ranked = sorted(self.heap, reverse=True)[:limit]
+        return [(customer_id, score) for score, customer_id in ranked]
+
+
+class CustomerLeaderboards:
+    """In-process leaderboards for total, today's spend and each game type"""
+
+    FIXED_BOARDS = ('total', 'today')
+
+    def __init__(self, capacity=None):
+        self.capacity = capacity or Config.LEADERBOARD_SIZE
+        self.lock = threading.Lock()
+        self.names = {}
+        self.today = date.today().isoformat()
+        self.boards = {board: Leaderboard(self.capacity) for board in self.FIXED_BOARDS}
+
+    def load(self, conn):
+        """Build every board from customers plus customer_game_stats"""
+        c = conn.cursor()
+        c.execute("SELECT id, name, total_amount, today_amount, last_updated_date FROM customers WHERE deleted_date IS NULL")
+        rows = c.fetchall()
+        c.execute("SELECT key FROM game_types WHERE active = 1")
+        game_types = [row[0] for row in c.fetchall()]
+        c.execute("""SELECT g.game_type, g.customer_id, g.amount FROM customer_game_stats g
+                     JOIN customers c ON c.id = g.customer_id WHERE c.deleted_date IS NULL""")
+        per_game = {game_type: [] for game_type in game_types}
+        for game_type, customer_id, amount in c.fetchall():
+            per_game.setdefault(game_type, []).append((customer_id, amount))
+        today = date.today().isoformat()
+
+        with self.lock:
+            self.today = today
+            self.names = {row[0]: row[1] for row in rows}
+            self.boards = {board: Leaderboard(self.capacity) for board in self.FIXED_BOARDS}
+            self.boards['total'].load((row[0], row[2]) for row in rows)
+            self.boards['today'].load((row[0], row[3]) for row in rows if row[4] == today)
+            for game_type, scores in per_game.items():
+                self.boards[game_type] = Leaderboard(self.capacity)
+                self.boards[game_type].load(scores)
+
+        print(f"🏆 Leaderboards loaded for {len(rows)} customers (top {self.capacity})")
+
+    def _roll_day(self):
+        today = date.today().isoformat()
+        if today != self.today:
+            self.today = today
+            self.boards['today'].clear()
+
+    def set_name(self, customer_id, name):
+        with self.lock:
+            self.names[customer_id] = name
+
+    def record_session(self, customer_id, amount, game_type):
+        with self.lock:
+            self._roll_day()
+            self.boards['total'].add(customer_id, amount)
+            self.boards['today'].add(customer_id, amount)
+            if game_type not in self.FIXED_BOARDS:
+                self.boards.setdefault(game_type, Leaderboard(self.capacity)).add(customer_id, amount)
+
+    def record_adjustment(self, customer_id, amount):
+        with self.lock:
+            self._roll_day()
+            self.boards['total'].add(customer_id, amount)
+            self.boards['today'].add(customer_id, amount)
+
+    def remove(self, customer_id):
+        with self.lock:
+            self.names.pop(customer_id, None)
+            for board in self.boards.values():
+                board.remove(customer_id)
+
+    def top(self, board='total', limit=5):
+        """Return [(id, name, score)] for a board, or None if it cannot answer"""
+        with self.lock:
+            self._roll_day()
+            if board not in self.boards:
+                return None
+            ranked = self.boards[board].top(limit)
+            if ranked is None:
+                return None
+            return [(customer_id, self.names.get(customer_id), score) for customer_id, score in ranked]
+
+    def check_consistency(self, conn, limit=None):
+        """Compare each board's top entries with the same ORDER BY in SQL"""
+        limit = limit or self.capacity
+        today = date.today().isoformat()
+        queries = {
+            'total': ("SELECT id, total_amount FROM customers WHERE deleted_date IS NULL", ()),
+            'today': ("SELECT id, COALESCE(today_amount, 0) FROM customers WHERE last_updated_date = ? AND deleted_date IS NULL",
+                      (today,)),
+        }
+        with self.lock:
+            game_boards = [board for board in self.boards if board not in self.FIXED_BOARDS]
+        for game_type in game_boards:
+            queries[game_type] = ("""SELECT g.customer_id, g.amount FROM customer_game_stats g
+                                      JOIN customers c ON c.id = g.customer_id
+                                      WHERE g.game_type = ? AND c.deleted_date IS NULL""", (game_type,))
+
+        report = {}
+        c = conn.cursor()
+        for board, (query, params) in queries.items():
+            c.execute(f"SELECT * FROM ({query}) ORDER BY 2 DESC, 1 DESC LIMIT ?", params + (limit,))
+            expected = [(row[0], row[1] or 0.0) for row in c.fetchall()]
+            actual = [(customer_id, score) for customer_id, _, score in (self.top(board, limit) or [])]
+
+            # Ignore zero-score tails: SQL includes idle customers the heap may skip
+            expected = [row for row in expected if row[1]]
+            actual = [row for row in actual if row[1]]
+
+            mismatches = []
+            for position in range(max(len(expected), len(actual))):
+                want = expected[position] if position < len(expected) else None
+                got = actual[position] if position < len(actual) else None
+                if want is None or got is None or abs(want[1] - got[1]) > 0.005:
+                    mismatches.append({'position': position + 1, 'sql': want, 'leaderboard': got})
+
+            report[board] = {'consistent': not mismatches, 'checked': len(expected), 'mismatches': mismatches}
+        return report
@@ -0,0 +1,235 @@
+import threading
+import time
+from datetime import date
+from config import Config
+from models.game_types import LEGACY_COLUMNS
+
+# Entry types that carry minutes and count towards a game's totals
+GAME_ENTRY_TYPES = ('session', 'reversal')
+
+
+class Delta:
+    """Change to one customer's aggregates from a run of ledger entries"""
+
+    __slots__ = ('amount', 'minutes', 'games', 'last_session')
+
+    def __init__(self):
+        self.amount = 0.0
+        self.minutes = 0.0
+        self.games = {}
+        self.last_session = None
+
+
+def accumulate(deltas, customer_id, transaction_type, game_type, amount, minutes, count=1):
+    """Apply ledger entries (or a GROUP BY of them) to a {customer_id: Delta} map.
+
+    This is the single rule for turning the ledger into balances; snapshots,
+    tail reads and database.reconcile all go through it.
+    """
+    delta = deltas.get(customer_id)
+    if delta is None:
+        delta = deltas[customer_id] = Delta()
+    delta.amount += amount or 0.0
+    if transaction_type in GAME_ENTRY_TYPES:
+        delta.minutes += minutes or 0.0
+        if game_type:
+            game = delta.games.setdefault(game_type, [0.0, 0.0, 0])
+            game[0] += amount or 0.0
+            game[1] += minutes or 0.0
+            game[2] += count if transaction_type == 'session' else -count
+    return delta
+
+
+class Ledger:
+    """Append-only transactions folded periodically into balance snapshots.
+
+    Writers only INSERT into transactions. snapshot() folds every entry
+    above the last snapshot's ledger_id into the customers aggregate
+    columns and customer_game_stats in one transaction and records a
+    ledger_snapshots row; readers add the (short) tail of entries above
+    that ledger_id to the snapshot values.
+    """
+
+    def __init__(self, get_connection, name='ledger'):
+        self.get_connection = get_connection
+        self.name = name
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.running = False
+        self.thread = None
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def latest(self, c):
+        c.execute("SELECT ledger_id FROM ledger_snapshots ORDER BY id DESC LIMIT 1")
+        row = c.fetchone()
+        return row[0] if row else 0
+
+    def tail(self, c, since, customer_id=None):
+        """{customer_id: Delta} for entries above `since` (a primary key range scan)"""
+        query = """SELECT customer_id, transaction_type, game_type, amount, minutes, created_date
+                   FROM transactions WHERE id > ?"""
+        params = [since]
+        if customer_id is not None:
+            query += " AND customer_id = ?"
+            params.append(customer_id)
+        c.execute(query + " ORDER BY id", params)
+
+        deltas = {}
+        for cid, transaction_type, game_type, amount, minutes, created in c.fetchall():
+            delta = accumulate(deltas, cid, transaction_type, game_type, amount, minutes)
+            if transaction_type == 'session':
+                delta.last_session = (amount, minutes, created)
+        return deltas
+
+    def overlay(self, c, rows):
+        """Add the ledger tail to SELECT {CUSTOMER_SELECT} FROM customers rows (read inside one transaction)"""
+        deltas = self.tail(c, self.latest(c))
+        if not deltas:
+            return rows
+        return [self.apply(row, deltas.get(row[0])) for row in rows]
+
+    def apply(self, row, delta):
+        if delta is None:
+            return row
+        columns = CUSTOMER_COLUMNS
+        row = list(row)
+        today = date.today().isoformat()
+        is_today = row[columns['last_updated_date']] == today
+
+        row[columns['total_amount']] = (row[columns['total_amount']] or 0) + delta.amount
+        row[columns['total_minutes']] = (row[columns['total_minutes']] or 0) + delta.minutes
+        for game_type, (amount_column, minutes_column) in LEGACY_COLUMNS.items():
+            game = delta.games.get(game_type)
+            if game:
+                row[columns[amount_column]] = (row[columns[amount_column]] or 0) + game[0]
+                row[columns[minutes_column]] = (row[columns[minutes_column]] or 0) + game[1]
+        row[columns['today_amount']] = ((row[columns['today_amount']] or 0) if is_today else 0) + delta.amount
+        row[columns['today_minutes']] = ((row[columns['today_minutes']] or 0) if is_today else 0) + delta.minutes
+        if delta.last_session:
+            amount, minutes, created = delta.last_session
+            row[columns['last_session_amount']] = amount
+            row[columns['last_session_minutes']] = minutes
+            row[columns['last_session_time']] = created
+        return tuple(row)
+
+    # ------------------------------------------------------------------
+    # Snapshots
+    # ------------------------------------------------------------------
+
+    def note_write(self):
+        """Count an appended entry; fold early once the tail gets long"""
+        with self.lock:
+            self.pending += 1
+            due = self.pending >= Config.LEDGER_SNAPSHOT_MAX_TAIL
+        if due:
+            self.snapshot()
+
+    def snapshot(self):
+        """Fold the ledger tail into the customer aggregates, returning a summary"""
+        started = time.perf_counter()
+        today = date.today().isoformat()
+        conn = self.get_connection()
+        conn.isolation_level = None
+        try:
+            c = conn.cursor()
+            # IMMEDIATE: no entry can be appended between reading the tail and recording ledger_id
+            c.execute("BEGIN IMMEDIATE")
+            since = self.latest(c)
+            c.execute("SELECT COALESCE(MAX(id), 0) FROM transactions")
+            high = c.fetchone()[0]
+            if high <= since:
+                c.execute("COMMIT")
+                with self.lock:
+                    self.pending = 0
+                return {'ledger_id': since, 'entries': 0, 'customers': 0}
+
+            c.execute("SELECT COUNT(*) FROM transactions WHERE id > ?", (since,))
+            entries = c.fetchone()[0]
+            deltas = self.tail(c, since)
+
+            legacy_sql = ''.join(f"{amount_column} = COALESCE({amount_column}, 0) + ?, "
+                                 f"{minutes_column} = COALESCE({minutes_column}, 0) + ?, "
+                                 for amount_column, minutes_column in LEGACY_COLUMNS.values())
+            updates = []
+            for customer_id, delta in deltas.items():
+                legacy = []
+                for game_type in LEGACY_COLUMNS:
+                    game = delta.games.get(game_type, (0.0, 0.0, 0))
+                    legacy.extend((game[0], game[1]))
+                updates.append((delta.amount, delta.minutes, *legacy, today, delta.amount,
+                                today, delta.minutes, today, customer_id))
+            c.executemany(f"""UPDATE customers SET
+                                  total_amount = COALESCE(total_amount, 0) + ?,
+                                  total_minutes = COALESCE(total_minutes, 0) + ?,
+                                  {legacy_sql}
+                                  today_amount = CASE WHEN last_updated_date = ? THEN COALESCE(today_amount, 0) ELSE 0 END + ?,
+                                  today_minutes = CASE WHEN last_updated_date = ? THEN COALESCE(today_minutes, 0) ELSE 0 END + ?,
+                                  last_updated_date = ?
+                              WHERE id = ?""", updates)
+
+            c.executemany("""UPDATE customers SET last_session_amount = ?, last_session_minutes = ?,
+                                 last_session_time = ? WHERE id = ?""",
+                          [(*delta.last_session, customer_id) for customer_id, delta in deltas.items() if delta.last_session])
+
+            c.executemany("""INSERT INTO customer_game_stats (customer_id, game_type, amount, minutes, sessions, last_played)
+                             VALUES (?, ?, ?, ?, ?, ?)
+                             ON CONFLICT(customer_id, game_type) DO UPDATE SET
+                                 amount = amount + excluded.amount,
+                                 minutes = minutes + excluded.minutes,
+                                 sessions = sessions + excluded.sessions,
+                                 last_played = COALESCE(excluded.last_played, last_played)""",
+                          [(customer_id, game_type, game[0], game[1], game[2],
+                            delta.last_session[2] if delta.last_session else None)
+                           for customer_id, delta in deltas.items() for game_type, game in delta.games.items()])
+
+            c.execute("INSERT INTO ledger_snapshots (ledger_id, entries, customers) VALUES (?, ?, ?)",
+                      (high, entries, len(deltas)))
+            c.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        with self.lock:
+            self.pending = 0
+        summary = {'ledger_id': high, 'entries': entries, 'customers': len(deltas),
+                   'seconds': round(time.perf_counter() - started, 4)}
+        print(f"📒 Ledger snapshot ({self.name}): folded {entries} entries for {len(deltas)} customers "
+              f"up to #{high} in {summary['seconds']}s")
+        return summary
+
+    def start(self):
+        """Fold the tail every Config.LEDGER_SNAPSHOT_INTERVAL seconds in a daemon thread"""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name=f'ledger_snapshots_{self.name}', daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while self.running:
+            time.sleep(Config.LEDGER_SNAPSHOT_INTERVAL)
+            try:
+                if self.pending:
+                    self.snapshot()
+            except Exception as e:
+                print(f"⚠️ Ledger snapshot failed: {e}")
+
+    def stop(self):
+        self.running = False
+
+
+# Customer rows are always read as SELECT {CUSTOMER_SELECT} FROM customers: listing the
+# columns by name keeps these positions fixed whatever order ALTERs added columns in
+CUSTOMER_FIELDS = [
+    'id', 'name', 'phone', 'total_amount', 'total_minutes', 'snooker_amount', 'snooker_minutes',
+    'pool_amount', 'pool_minutes', 'today_amount', 'today_minutes', 'last_session_amount',
+    'last_session_minutes', 'last_session_time', 'last_updated_date', 'created_date'
+]
+CUSTOMER_SELECT = ', '.join(CUSTOMER_FIELDS)
+CUSTOMER_COLUMNS = {name: index for index, name in enumerate(CUSTOMER_FIELDS)}
@@ -0,0 +1,294 @@
+import threading
+import time
+from bisect import bisect_right
+from datetime import datetime
+from config import Config
+from utils.tracing import connect, traced
+
+# Bookings in these states hold their slot on the table
+ACTIVE_STATUSES = ('booked', 'seated')
+
+
+def parse_when(value, now=None):
+    """Epoch seconds for an ISO datetime, 'HH:MM' (today) or epoch number; ValueError if malformed"""
+    if isinstance(value, (int, float)):
+        return int(value)
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError(f"Invalid time: {value!r}")
+    value = value.strip()
+    if len(value) <= 5 and ':' in value:
+        hour, minute = (int(part) for part in value.split(':'))
+        now = now or datetime.now()
+        return int(now.replace(hour=hour, minute=minute, second=0, microsecond=0).timestamp())
+    return int(datetime.fromisoformat(value).timestamp())
+
+
+def format_epoch(epoch):
+    return datetime.fromtimestamp(epoch).isoformat(timespec='minutes')
+
+
+class TableSchedule:
+    """One table's bookings as sorted, pairwise-disjoint [start, end) intervals.
+
+    Bookings on a table never overlap, so ends are sorted too and every
+    lookup is a bisect: the first booking that could touch a window is the
+    first whose end lies after the window's start.
+    """
+
+    __slots__ = ('starts', 'ends', 'ids')
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.ids = []
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _first_ending_after(self, moment):
+        return bisect_right(self.ends, moment)
+
+    def conflict(self, start, end, ignore_id=None):
+        """Id of a booking overlapping [start, end), or None"""
+        index = self._first_ending_after(start)
+        while index < len(self.ids) and self.starts[index] < end:
+            if self.ids[index] != ignore_id:
+                return self.ids[index]
+            index += 1
+        return None
+
+    def add(self, reservation_id, start, end):
+        index = bisect_right(self.starts, start)
+        self.starts.insert(index, start)
+        self.ends.insert(index, end)
+        self.ids.insert(index, reservation_id)
+
+    def remove(self, reservation_id):
+        if reservation_id in self.ids:
+            index = self.ids.index(reservation_id)
+            del self.starts[index], self.ends[index], self.ids[index]
+
+    def next_free(self, after, duration):
+        """Earliest start >= after with `duration` seconds free"""
+        candidate = after
+        index = self._first_ending_after(after)
+        while index < len(self.ids) and self.starts[index] < candidate + duration:
+            candidate = max(candidate, self.ends[index])
+            index += 1
+        return candidate
+
+    def between(self, start, end):
+        """Ids of bookings overlapping [start, end) in start order"""
+        index = self._first_ending_after(start)
+        found = []
+        while index < len(self.ids) and self.starts[index] < end:
+            found.append(self.ids[index])
+            index += 1
+        return found
+
+    def prune(self, before):
+        """Drop bookings that ended at or before `before`"""
+        index = bisect_right(self.ends, before)
+        if index:
+            del self.starts[:index], self.ends[:index], self.ids[:index]
+
+
+class ReservationBook:
+    """Persisted reservations with an in-memory availability index per table"""
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or Config.DATABASE_PATH
+        self.lock = threading.Lock()
+        # {(game_type, table_id): TableSchedule} and {reservation_id: row dict}
+        self.schedules = {}
+        self.reservations = {}
+
+    def get_connection(self):
+        return connect(self.db_path)
+
+    def _row(self, row):
+        return {
+            'id': row[0], 'game_type': row[1], 'table_id': row[2], 'customer_id': row[3],
+            'name': row[4], 'phone': row[5], 'party_size': row[6], 'start_epoch': row[7],
+            'end_epoch': row[8], 'status': row[9], 'notes': row[10], 'staff_user': row[11],
+            'start': format_epoch(row[7]), 'end': format_epoch(row[8])
+        }
+
+    def _index(self, reservation):
+        key = (reservation['game_type'], reservation['table_id'])
+        self.schedules.setdefault(key, TableSchedule()).add(
+            reservation['id'], reservation['start_epoch'], reservation['end_epoch'])
+        self.reservations[reservation['id']] = reservation
+
+    def _unindex(self, reservation_id):
+        reservation = self.reservations.pop(reservation_id, None)
+        if reservation:
+            schedule = self.schedules.get((reservation['game_type'], reservation['table_id']))
+            if schedule:
+                schedule.remove(reservation_id)
+        return reservation
+
+    def load(self):
+        """Index every booking that has not ended yet"""
+        try:
+            conn = self.get_connection()
+            rows = conn.execute(f"""SELECT id, game_type, table_id, customer_id, name, phone, party_size,
+                                           start_epoch, end_epoch, status, notes, staff_user
+                                    FROM reservations
+                                    WHERE end_epoch > ? AND status IN ({', '.join('?' for _ in ACTIVE_STATUSES)})
+                                    ORDER BY start_epoch""", (int(time.time()), *ACTIVE_STATUSES)).fetchall()
+            conn.close()
+        except Exception as e:
+            print(f"⚠️ Could not load reservations: {e}")
+            rows = []
+
+        with self.lock:
+            self.schedules = {}
+            self.reservations = {}
+            for row in rows:
+                self._index(self._row(row))
+        print(f"📅 Loaded {len(rows)} upcoming reservations")
+        return len(rows)
+
+    def _prune(self, now):
+        for schedule in self.schedules.values():
+            for reservation_id in schedule.between(0, now):
+                if self.reservations[reservation_id]['end_epoch'] <= now:
+                    self.reservations.pop(reservation_id, None)
+            schedule.prune(now)
+
+    @traced('ReservationBook.book')
+    def book(self, game_type, table_id, start, end, name, phone=None, customer_id=None,
+             party_size=None, notes=None, staff_user=None):
+        """Reserve a table for [start, end) epoch seconds, refusing overlaps"""
+        if end <= start:
+            return {"success": False, "message": "Reservation must end after it starts"}
+        if end - start > Config.RESERVATION_MAX_MINUTES * 60:
+            return {"success": False, "message": f"Reservations are limited to {Config.RESERVATION_MAX_MINUTES} minutes"}
+        if end <= time.time():
+            return {"success": False, "message": "Reservation is in the past"}
+
+        with self.lock:
+            schedule = self.schedules.get((game_type, table_id))
+            conflict_id = schedule.conflict(start, end) if schedule else None
+            if conflict_id is not None:
+                return {"success": False, "message": f"{game_type.title()} Table {table_id} is already booked",
+                        "conflict": self.reservations[conflict_id]}
+
+            conn = self.get_connection()
+            try:
+                cursor = conn.cursor()
+                cursor.execute("""INSERT INTO reservations (game_type, table_id, customer_id, name, phone, party_size,
+                                                            start_epoch, end_epoch, status, notes, staff_user)
+                                  VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'booked', ?, ?)""",
+                               (game_type, table_id, customer_id, name, phone, party_size, start, end, notes, staff_user))
+                reservation_id = cursor.lastrowid
+                conn.commit()
+            finally:
+                conn.close()
+
+            reservation = self._row((reservation_id, game_type, table_id, customer_id, name, phone, party_size,
+                                     start, end, 'booked', notes, staff_user))
+            self._index(reservation)
+
+        print(f"📅 Booked {game_type} Table {table_id} for {name}: {reservation['start']} - {reservation['end']}")
+        return {"success": True, "message": "Reservation booked", "reservation": reservation}
+
+    def _set_status(self, reservation_id, status, from_statuses):
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"""UPDATE reservations SET status = ?, updated_date = CURRENT_TIMESTAMP
+                               WHERE id = ? AND status IN ({', '.join('?' for _ in from_statuses)})""",
+                           (status, reservation_id, *from_statuses))
+            conn.commit()
+            return cursor.rowcount > 0
+        finally:
+            conn.close()
+
+    @traced('ReservationBook.cancel')
+    def cancel(self, reservation_id, status='cancelled'):
+        """Cancel (or mark as no-show) a booking and free its slot"""
+        with self.lock:
+            if not self._set_status(reservation_id, status, ('booked',)):
+                return {"success": False, "message": "Reservation not found or already seated"}
+            self._unindex(reservation_id)
+        return {"success": True, "message": f"Reservation {status.replace('_', ' ')}"}
+
+    def seat(self, reservation_id, game_type, table_id, now=None):
+        """Mark a booking for this table as seated; its slot stays held until it ends.
+        
+        A booking can be seated from RESERVATION_WALKIN_BUFFER_MINUTES before
+        its start until its end.
+        """
+        now = int(time.time()) if now is None else now
+        with self.lock:
+            reservation = self.reservations.get(reservation_id)
+            if not reservation or (reservation['game_type'], reservation['table_id']) != (game_type, table_id):
+                return {"success": False, "message": f"Reservation {reservation_id} is not booked for this table"}
+            if now >= reservation['end_epoch']:
+                return {"success": False, "message": f"Reservation {reservation_id} ended at {reservation['end']}"}
+            if reservation['status'] == 'booked':
+                if now < reservation['start_epoch'] - Config.RESERVATION_WALKIN_BUFFER_MINUTES * 60:
+                    return {"success": False, "message": f"Reservation {reservation_id} is not until {reservation['start']}"}
+                if not self._set_status(reservation_id, 'seated', ('booked',)):
+                    return {"success": False, "message": f"Reservation {reservation_id} is no longer booked"}
+                reservation['status'] = 'seated'
+            return {"success": True, "message": "Reservation seated", "reservation": dict(reservation)}
+
+    def conflict(self, game_type, table_id, start, end, ignore_id=None):
+        """The booking overlapping [start, end) on a table, or None"""
+        with self.lock:
+            schedule = self.schedules.get((game_type, table_id))
+            conflict_id = schedule.conflict(start, end, ignore_id) if schedule else None
+            return dict(self.reservations[conflict_id]) if conflict_id is not None else None
+
+    def free_tables(self, tables, start, end):
+        """{game_type: [table_id]} with no booking overlapping [start, end)"""
+        with self.lock:
+            self._prune(int(time.time()))
+            free = {}
+            for game_type, table_ids in tables.items():
+                free[game_type] = []
+                for table_id in table_ids:
+                    schedule = self.schedules.get((game_type, table_id))
+                    if not schedule or schedule.conflict(start, end) is None:
+                        free[game_type].append(table_id)
+            return free
+
+    def next_free_slot(self, game_type, table_ids, after, duration):
+        """(table_id, start) of the earliest slot of `duration` seconds on any of the tables"""
+        best = None
+        with self.lock:
+            for table_id in table_ids:
+                schedule = self.schedules.get((game_type, table_id))
+                start = schedule.next_free(after, duration) if schedule else after
+                if best is None or start < best[1]:
+                    best = (table_id, start)
+        return best
+
+    def list(self, start, end, game_type=None):
+        """Bookings overlapping [start, end) from the database, including past and cancelled ones"""
+        query = """SELECT id, game_type, table_id, customer_id, name, phone, party_size,
+                          start_epoch, end_epoch, status, notes, staff_user
+                   FROM reservations WHERE start_epoch < ? AND end_epoch > ?"""
+        params = [end, start]
+        if game_type:
+            query += " AND game_type = ?"
+            params.append(game_type)
+        conn = self.get_connection()
+        rows = conn.execute(query + " ORDER BY start_epoch", params).fetchall()
+        conn.close()
+        return [self._row(row) for row in rows]
+
+    def upcoming(self, game_type, table_ids, now, within):
+        """{table_id: next booking starting within `within` seconds} for the given tables"""
+        with self.lock:
+            upcoming = {}
+            for table_id in table_ids:
+                schedule = self.schedules.get((game_type, table_id))
+                if schedule:
+                    ids = schedule.between(now, now + within)
+                    if ids:
+                        upcoming[table_id] = dict(self.reservations[ids[0]])
+            return upcoming
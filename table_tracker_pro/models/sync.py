@@ -0,0 +1,81 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from config import Config
+
+
+class ChangeFeed:
+    """Bounded, sequence-numbered stream of server-side state changes"""
+
+    def __init__(self, max_size=None):
+        self.lock = threading.Lock()
+        self.seq = 0
+        self.changes = deque(maxlen=max_size or Config.SYNC_FEED_SIZE)
+
+    def record(self, kind, data):
+        with self.lock:
+            self.seq += 1
+            self.changes.append({'seq': self.seq, 'ts': time.time(), 'kind': kind, 'data': data})
+            return self.seq
+
+    def since(self, cursor):
+        """Return (changes after cursor, new cursor, resync needed)"""
+        with self.lock:
+            if cursor is None or cursor > self.seq:
+                # Unknown cursor (e.g. server restarted) - client must reload full state
+                return [], self.seq, True
+
+            oldest = self.changes[0]['seq'] if self.changes else self.seq + 1
+            if cursor < oldest - 1:
+                return [], self.seq, True
+
+            return [change for change in self.changes if change['seq'] > cursor], self.seq, False
+
+
+class IdempotencyIndex:
+    """TTL-evicted map of client operation ids to the result they produced"""
+
+    PENDING = object()
+
+    def __init__(self, ttl_seconds=None, max_entries=None):
+        self.ttl = ttl_seconds or Config.SYNC_DEDUPE_TTL_SECONDS
+        self.max_entries = max_entries or Config.SYNC_DEDUPE_MAX
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def _evict(self, now):
+        # Entries share one TTL, so insertion order is expiry order
+        while self.entries:
+            op_id, (expires_at, _) = next(iter(self.entries.items()))
+            if expires_at > now and len(self.entries) <= self.max_entries:
+                break
+            self.entries.popitem(last=False)
+
+    def reserve(self, op_id):
+        """Claim an operation id. Returns (True, None) if new, else (False, stored result)"""
+        now = time.monotonic()
+        with self.lock:
+            self._evict(now)
+            if op_id in self.entries:
+                return False, self.entries[op_id][1]
+            self.entries[op_id] = (now + self.ttl, self.PENDING)
+            return True, None
+
+    def complete(self, op_id, result):
+        with self.lock:
+            if op_id in self.entries:
+                expires_at, _ = self.entries[op_id]
+                self.entries[op_id] = (expires_at, result)
+
+    def release(self, op_id):
+        """Forget a failed operation so the client can retry it"""
+        with self.lock:
+            self.entries.pop(op_id, None)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+# Shared by TableManager, CustomerModel and the /api/sync endpoint
+change_feed = ChangeFeed()
+operation_index = IdempotencyIndex()
@@ -1,92 +1,235 @@
+import copy
+import itertools
+import json
 from datetime import datetime
 from config import Config
 import threading
 import time
 import sqlite3
 import os
+from models.deadlines import DeadlineScheduler, played_seconds
+from models.game_types import GameTypeRegistry
+from models.reservations import ReservationBook, format_epoch
+from models.table_snapshot import TableSnapshot
+from models.waitlist import Waitlist
+from models.sync import change_feed
+from utils.tracing import connect, traced
+
+# Table fields saved by persist_clocks besides the start time
+CLOCK_FIELDS = ('status', 'rate', 'elapsed_seconds', 'session_start_time', 'prepaid_minutes', 'prepaid_auto_pause',
+                'prepaid_warned', 'prepaid_expired', 'players')
+
+def rate_to_paise(rate):
+    """Integer paise for a ₹/min rate, so rate lookups are exact set membership"""
+    return int(round(float(rate) * 100))
 
 class TableManager:
-    def __init__(self):
-        self.snooker_tables = {}
-        self.pool_tables = {}
-        self.available_rates = Config.AVAILABLE_RATES
+    def __init__(self, db_path=None, feed=None):
+        self.db_path = db_path or Config.DATABASE_PATH
+        self.change_feed = feed or change_feed
+        self.game_types = GameTypeRegistry(self.db_path)
+        # {game_type: {table_id: table}} for every registered game type
+        self.tables = {game_type: {} for game_type in self.game_types.keys()}
+        self.available_rates = list(Config.AVAILABLE_RATES)
+        self.rate_paise = {rate_to_paise(rate) for rate in self.available_rates}
         self.running = True
+        # Guards table state shared between request threads and the timer thread
+        self.lock = threading.RLock()
+        self.reservations = ReservationBook(self.db_path)
+        self.waitlist = Waitlist(self.change_feed)
+        self.deadlines = DeadlineScheduler(self)
+        # {game_type: TableSnapshot}, replaced (never mutated) on every publish
+        self.published = {}
+        self.versions = itertools.count(1)
         
         print("🎯 Initializing Table Manager with session persistence...")
         
-        # Initialize snooker tables
-        for table_id, config in Config.SNOOKER_TABLES.items():
-            self.snooker_tables[table_id] = {
-                "status": "idle",
-                "time": "00:00",
-                "rate": config["rate"],
-                "amount": 0.0,
-                "start_time": None,
-                "elapsed_seconds": 0,
-                "sessions": [],
-                "session_start_time": None,
-                "last_update": None
-            }
-        
-        # Initialize pool tables
-        for table_id, config in Config.POOL_TABLES.items():
-            self.pool_tables[table_id] = {
-                "status": "idle",
-                "time": "00:00", 
-                "rate": config["rate"],
-                "amount": 0.0,
-                "start_time": None,
-                "elapsed_seconds": 0,
-                "sessions": [],
-                "session_start_time": None,
-                "last_update": None
-            }
+        # Initialize tables from the table_config table (Config defaults before first init_database)
+        table_config, rates = self._load_table_config()
+        self._set_rates(rates)
+        for game_type, tables in table_config.items():
+            for table_id, rate in tables.items():
+                self.tables.setdefault(game_type, {})[table_id] = self._new_table(rate)
         
-        # Load recent sessions from database
+        # Load recent sessions and upcoming bookings from database
         self.load_recent_sessions()
+        self.reservations.load()
+        
+        # Resume clocks that were running or paused at the last shutdown
+        self.restore_clocks()
+        self._publish_all()
         
-        print(f"✅ Initialized {len(self.snooker_tables)} Snooker tables: {list(self.snooker_tables.keys())}")
-        print(f"✅ Initialized {len(self.pool_tables)} Pool tables: {list(self.pool_tables.keys())}")
+        for game_type, tables in self.tables.items():
+            print(f"✅ Initialized {len(tables)} {self.game_types.name(game_type)} tables: {list(tables.keys())}")
         
         # Start timer thread with precise timing
-        self.timer_thread = threading.Thread(target=self.update_timers, daemon=True)
+        self.timer_thread = threading.Thread(target=self.update_timers, name='update_timers', daemon=True)
         self.timer_thread.start()
         print("⏰ Precise timer system started with session persistence")
+        
+        # Prepaid deadlines sleep on their own heap instead of riding the per-second timer
+        self.deadlines.start()
+    
+    @property
+    def snooker_tables(self):
+        return self.get_tables('snooker')
+    
+    @property
+    def pool_tables(self):
+        return self.get_tables('pool')
     
     def get_db_connection(self):
         """Get database connection"""
-        return sqlite3.connect(Config.DATABASE_PATH)
+        return connect(self.db_path)
+    
+    def _new_table(self, rate):
+        return {
+            "status": "idle",
+            "time": "00:00",
+            "rate": rate,
+            "amount": 0.0,
+            "start_time": None,
+            "elapsed_seconds": 0,
+            "sessions": [],
+            "session_start_time": None,
+            "last_update": None,
+            "prepaid_minutes": None,
+            "prepaid_auto_pause": False,
+            "prepaid_warned": False,
+            "prepaid_expired": False,
+            "players": []
+        }
     
-    def save_session_to_db(self, table_id, game_type, session_data):
-        """Save completed session to database"""
+    def _set_rates(self, rates):
+        self.available_rates = sorted(rates)
+        self.rate_paise = {rate_to_paise(rate) for rate in rates}
+    
+    def _load_table_config(self):
+        """Read active tables and rate options, returning ({game_type: {id: rate}}, [rates])"""
         try:
             conn = self.get_db_connection()
             cursor = conn.cursor()
+            cursor.execute("SELECT game_type, table_id, rate FROM table_config WHERE active = 1 ORDER BY game_type, table_id")
+            rows = cursor.fetchall()
+            cursor.execute("SELECT EXISTS (SELECT 1 FROM table_config)")
+            seeded = bool(cursor.fetchone()[0])
+            cursor.execute("SELECT rate_paise FROM rate_options ORDER BY rate_paise")
+            rates = [row[0] / 100 for row in cursor.fetchall()]
+            conn.close()
+        except sqlite3.Error as e:
+            print(f"⚠️ Table config unavailable ({e}) - using Config defaults")
+            rows, rates, seeded = [], [], False
+        
+        # Defaults only for a never-seeded config; every table deactivated means no tables
+        if not seeded:
+            rows = [('snooker', table_id, config["rate"]) for table_id, config in Config.SNOOKER_TABLES.items()]
+            rows += [('pool', table_id, config["rate"]) for table_id, config in Config.POOL_TABLES.items()]
+        
+        table_config = {game_type: {} for game_type in self.game_types.keys()}
+        for game_type, table_id, rate in rows:
+            if game_type in table_config:
+                table_config[game_type][table_id] = rate
+        return table_config, rates or list(Config.AVAILABLE_RATES)
+    
+    def reload_config(self):
+        """Apply table_config changes in place without touching running clocks.
+        
+        New tables appear idle; removed or re-rated tables that are busy are
+        flagged and finish their current session first.
+        """
+        self.game_types.load()
+        table_config, rates = self._load_table_config()
+        summary = {"added": [], "removed": [], "retiring": [], "rate_changed": [], "rate_pending": []}
+        
+        with self.lock:
+            self._set_rates(rates)
+            # Game types that were deactivated lose all their tables
+            for game_type in self.tables:
+                table_config.setdefault(game_type, {})
+            
+            for game_type, wanted in table_config.items():
+                tables = self.tables.setdefault(game_type, {})
+                
+                for table_id, rate in wanted.items():
+                    key = f"{game_type}:{table_id}"
+                    table = tables.get(table_id)
+                    if table is None:
+                        tables[table_id] = self._new_table(rate)
+                        summary["added"].append(key)
+                        continue
+                    table.pop('retiring', None)
+                    if rate_to_paise(table['rate']) == rate_to_paise(rate):
+                        table.pop('pending_rate', None)
+                    elif table['status'] == 'idle':
+                        table['rate'] = rate
+                        summary["rate_changed"].append(key)
+                    else:
+                        table['pending_rate'] = rate
+                        summary["rate_pending"].append(key)
+                
+                for table_id in [table_id for table_id in tables if table_id not in wanted]:
+                    key = f"{game_type}:{table_id}"
+                    if tables[table_id]['status'] == 'idle':
+                        del tables[table_id]
+                        summary["removed"].append(key)
+                    else:
+                        tables[table_id]['retiring'] = True
+                        summary["retiring"].append(key)
+            
+            for game_type in table_config:
+                self.change_feed.record('table_config', {
+                    "game_type": game_type,
+                    "tables": {table_id: table['rate'] for table_id, table in self.get_tables(game_type).items()},
+                    "available_rates": self.available_rates
+                })
+            self._publish_all()
+        
+        self.reservations.load()
+        print(f"🔧 Table config reloaded: {summary}")
+        return summary
+    
+    @traced('TableManager.save_session_to_db')
+    def save_session_to_db(self, table_id, game_type, session_data, conn=None):
+        """Save completed session to database, returning its row id.
+        
+        When `conn` is given the insert joins the caller's transaction, the
+        caller is responsible for committing and errors propagate so the
+        caller can roll back.
+        """
+        own_conn = conn is None
+        try:
+            if own_conn:
+                conn = self.get_db_connection()
+            cursor = conn.cursor()
             
             cursor.execute('''
                 INSERT INTO sessions 
-                (table_id, game_type, start_time, end_time, duration_minutes, amount, rate, staff_user, session_date)
+                (customer_id, table_id, game_type, start_epoch, end_epoch, duration_seconds, amount_paise, rate_paise, staff_user)
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (
+                session_data.get('customer_id'),
                 table_id,
                 game_type,
-                session_data['start_time'],
-                session_data['end_time'],
-                session_data['duration'],
-                session_data['amount'],
-                session_data.get('rate', 0),
-                session_data.get('user', 'system'),
-                session_data['date']
+                session_data['start_epoch'],
+                session_data['end_epoch'],
+                session_data['duration_seconds'],
+                int(round(session_data['amount'] * 100)),
+                rate_to_paise(session_data.get('rate', 0)),
+                session_data.get('user', 'system')
             ))
             
-            conn.commit()
-            conn.close()
+            session_id = cursor.lastrowid
+            if own_conn:
+                conn.commit()
+                conn.close()
             print(f"💾 Session saved to database: {game_type} Table {table_id}")
-            return True
+            return session_id
             
         except Exception as e:
             print(f"❌ Failed to save session to database: {e}")
-            return False
+            if not own_conn:
+                raise
+            return None
     
     def load_recent_sessions(self):
         """Load recent sessions from database (last 3 per table)"""
@@ -95,53 +238,293 @@ class TableManager:
             cursor = conn.cursor()
             
             # Load recent sessions for each table
-            for game_type in ['snooker', 'pool']:
-                tables = self.get_tables(game_type)
-                
+            for game_type, tables in self.tables.items():
                 for table_id in tables.keys():
+                    # Newest first straight off idx_sessions_table_start
                     cursor.execute('''
-                        SELECT start_time, end_time, duration_minutes, amount, session_date
+                        SELECT start_epoch, end_epoch, duration_seconds, amount_paise
                         FROM sessions 
-                        WHERE table_id = ? AND game_type = ?
-                        ORDER BY created_date DESC 
+                        WHERE game_type = ? AND table_id = ?
+                        ORDER BY start_epoch DESC 
                         LIMIT 3
-                    ''', (table_id, game_type))
+                    ''', (game_type, table_id))
                     
                     sessions = cursor.fetchall()
                     tables[table_id]['sessions'] = []
                     
-                    for session in sessions:
+                    for start_epoch, end_epoch, duration_seconds, amount_paise in sessions:
+                        start, end = datetime.fromtimestamp(start_epoch), datetime.fromtimestamp(end_epoch)
                         tables[table_id]['sessions'].append({
-                            'start_time': session[0],
-                            'end_time': session[1],
-                            'duration': session[2],
-                            'amount': session[3],
-                            'date': session[4]
+                            'start_time': start.strftime("%H:%M:%S"),
+                            'end_time': end.strftime("%H:%M:%S"),
+                            'duration': round(duration_seconds / 60, 1),
+                            'amount': amount_paise / 100,
+                            'date': end.strftime("%Y-%m-%d")
                         })
                     
                     if sessions:
                         print(f"📊 Loaded {len(sessions)} recent sessions for {game_type} Table {table_id}")
             
+            # Seed the waitlist's rolling session lengths
+            self.waitlist.load_stats(conn, list(self.tables))
             conn.close()
             
         except Exception as e:
             print(f"⚠️ Could not load recent sessions: {e}")
     
+    def reload_history(self):
+        """Reload recent sessions and waitlist stats (after init_database has migrated the sessions table)"""
+        with self.lock:
+            self.load_recent_sessions()
+            self._publish_all()
+    
     def get_tables(self, game_type):
         """Get tables for specific game type"""
-        if game_type == 'snooker':
-            result = self.snooker_tables
-        elif game_type == 'pool':
-            result = self.pool_tables
-        else:
-            result = {}
+        return self.tables.get(game_type, {})
+    
+    def snapshot_tables(self):
+        """Every game type's tables from the published snapshots (read-only, no lock taken)"""
+        return {game_type: snapshot.tables for game_type, snapshot in self.published.items()}
+    
+    def snapshot(self, game_type):
+        """The current TableSnapshot of a game type; readers never lock"""
+        snapshot = self.published.get(game_type)
+        if snapshot is None:
+            with self.lock:
+                snapshot = self._publish(game_type)
+        return snapshot
+    
+    def _publish(self, game_type):
+        """Freeze a game type's tables into a new snapshot and swap it in (caller holds the lock)"""
+        snapshot = TableSnapshot(next(self.versions), game_type, self.get_tables(game_type), self.available_rates)
+        # Copy-on-write: a reader holding the old dict or snapshot is unaffected
+        self.published = {**self.published, game_type: snapshot}
+        return snapshot
+    
+    def _publish_all(self):
+        with self.lock:
+            published = {game_type: TableSnapshot(next(self.versions), game_type, tables, self.available_rates)
+                         for game_type, tables in self.tables.items()}
+            self.published = published
+    
+    @traced('TableManager.handle_table_action')
+    def handle_table_action(self, game_type, table_id, action, username, conn=None, reservation_id=None, force=False,
+                            billing=None):
+        """Handle table actions (start, pause, end).
+        
+        Ending a table with players bound bills them through `billing` (the
+        venue's CustomerModel): the session row and every player's charge
+        are written in one transaction and the result carries the bill.
+        """
+        print(f"🎮 Table action: {game_type} Table {table_id} - {action} by {username}")
+        
+        with self.lock:
+            table = self.get_tables(game_type).get(table_id)
+            if (action == 'end' and billing is not None and conn is None and table
+                    and table['status'] != 'idle' and table['players']):
+                return self._end_and_bill(game_type, table_id, username, billing)
+            
+            result = self._apply_table_action(game_type, table_id, action, username, conn, reservation_id, force)
+            if result["success"]:
+                self._record_change(game_type, table_id, action)
+                self.deadlines.sync(game_type, table_id, self.get_tables(game_type).get(table_id))
+            return result
+    
+    def _end_and_bill(self, game_type, table_id, username, billing):
+        """End a table and charge its players atomically (caller holds the lock)"""
+        tables = self.get_tables(game_type)
+        saved = copy.deepcopy(tables[table_id])
+        after_commit = []
+        conn = self.get_db_connection()
+        try:
+            result = self._apply_table_action(game_type, table_id, 'end', username, conn, billing=billing,
+                                              after_commit=after_commit)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            # Nothing was written, so put the clock back as it was
+            tables[table_id] = saved
+            print(f"❌ Billing failed for {game_type} Table {table_id}: {e}")
+            return {"success": False, "message": f"Billing failed, table still running: {e}"}
+        finally:
+            conn.close()
         
+        # The waitlist only hears about the freed table once the bill is committed
+        for finish in after_commit:
+            finish()
+        self._record_change(game_type, table_id, 'end')
+        self.deadlines.sync(game_type, table_id, tables.get(table_id))
+        billing.after_charges(result['bill'])
         return result
     
-    def handle_table_action(self, game_type, table_id, action, username):
-        """Handle table actions (start, pause, end)"""
-        print(f"🎮 Table action: {game_type} Table {table_id} - {action} by {username}")
+    def check_players(self, players, billing):
+        """({customer_id: name}, None) for a bindable [{customer_id, share}] list, else (None, message)"""
+        customer_ids = [player['customer_id'] for player in players]
+        if len(set(customer_ids)) != len(customer_ids):
+            return None, "A customer can only be bound once"
+        names = billing.lookup_customers(customer_ids)
+        missing = [customer_id for customer_id in customer_ids if customer_id not in names]
+        if missing:
+            return None, f"Unknown customers: {missing}"
+        return names, None
+    
+    @traced('TableManager.set_players')
+    def set_players(self, game_type, table_id, players, billing):
+        """Bind customers to a running or paused table: [{customer_id, share}], replacing any bound before"""
+        names, error = self.check_players(players, billing)
+        if error:
+            return {"success": False, "message": error}
+        
+        with self.lock:
+            table = self.get_tables(game_type).get(table_id)
+            if table is None:
+                return {"success": False, "message": "Invalid table ID"}
+            if table['status'] == 'idle':
+                return {"success": False, "message": "Start the table before binding players"}
+            table['players'] = [{"customer_id": player['customer_id'], "name": names[player['customer_id']],
+                                 "share": player.get('share') or 1} for player in players]
+            self._record_change(game_type, table_id, 'players')
+        
+        return {"success": True, "message": f"{len(players)} players bound", "players": table['players']}
+    
+    def _record_change(self, game_type, table_id, action):
+        """Publish a table's new state as a snapshot and on the sync change feed (caller holds the lock)"""
+        self._publish(game_type)
+        table = self.get_tables(game_type).get(table_id)
+        if table is None:
+            self.change_feed.record('table', {"game_type": game_type, "table_id": table_id, "action": action, "status": "removed"})
+            return
+        self.change_feed.record('table', {
+            "game_type": game_type,
+            "table_id": table_id,
+            "action": action,
+            "status": table['status'],
+            "rate": table['rate'],
+            "elapsed_seconds": table['elapsed_seconds'],
+            "session_start_time": table['session_start_time']
+        })
+    
+    @traced('TableManager.handle_batch_actions')
+    def handle_batch_actions(self, actions, username, billing=None):
+        """Apply an ordered list of table actions under one lock and one DB transaction.
+        
+        Tables are changed in memory as the batch goes, but published, fed
+        to the waitlist and deadlines only once the transaction commits; on
+        a failed commit every touched table is put back as it was.
+        """
+        results = []
+        bills = []
+        saved = {}
+        changed = []
+        after_commit = []
+        with self.lock:
+            conn = self.get_db_connection()
+            try:
+                for index, item in enumerate(actions):
+                    game_type = item.get('game_type')
+                    table_id = item.get('table_id')
+                    action = item.get('action')
+                    
+                    if not self.game_types.is_valid(game_type):
+                        result = {"success": False, "message": f"Invalid game type: {game_type}"}
+                    elif action not in ('start', 'pause', 'end'):
+                        result = {"success": False, "message": f"Invalid action: {action}"}
+                    elif not isinstance(table_id, int):
+                        result = {"success": False, "message": f"Invalid table ID: {table_id}"}
+                    else:
+                        if (game_type, table_id) not in saved:
+                            saved[(game_type, table_id)] = copy.deepcopy(self.get_tables(game_type).get(table_id))
+                        result = self._apply_table_action(game_type, table_id, action, username, conn,
+                                                          item.get('reservation_id'), bool(item.get('force')), billing,
+                                                          after_commit)
+                        if result.get("bill"):
+                            bills.append(result["bill"])
+                        if result["success"]:
+                            changed.append((game_type, table_id, action))
+                    
+                    result.update({"index": index, "game_type": game_type, "table": table_id, "action": action})
+                    results.append(result)
+                
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                for (game_type, table_id), table in saved.items():
+                    if table is None:
+                        self.get_tables(game_type).pop(table_id, None)
+                    else:
+                        self.get_tables(game_type)[table_id] = table
+                print(f"❌ Batch actions failed to commit, tables restored: {e}")
+                raise
+            finally:
+                conn.close()
+            
+            for finish in after_commit:
+                finish()
+            for game_type, table_id, action in changed:
+                self._record_change(game_type, table_id, action)
+                self.deadlines.sync(game_type, table_id, self.get_tables(game_type).get(table_id))
         
+        for bill in bills:
+            billing.after_charges(bill)
+        print(f"📦 Batch of {len(actions)} table actions applied by {username}")
+        return results
+    
+    def _check_reservation(self, game_type, table_id, current_time, reservation_id, force):
+        """Refuse a walk-in start on a table that is booked now or within the buffer"""
+        now = int(current_time.timestamp())
+        window_end = now + Config.RESERVATION_WALKIN_BUFFER_MINUTES * 60
+        booking = self.reservations.conflict(game_type, table_id, now, window_end, ignore_id=reservation_id)
+        if booking is None or force:
+            if reservation_id is None:
+                return None
+            # Seated only once nothing else stops the start
+            seated = self.reservations.seat(reservation_id, game_type, table_id, now)
+            return None if seated["success"] else seated
+        return {
+            "success": False,
+            "message": f"{game_type.title()} Table {table_id} is reserved for {booking['name']} "
+                       f"at {format_epoch(booking['start_epoch'])[11:]}",
+            "reservation": booking
+        }
+    
+    def _call_waitlist(self, game_type, table_id, current_time):
+        """Hand a freed table to the next waiting party unless it is about to be reserved"""
+        now = int(current_time.timestamp())
+        if self.reservations.conflict(game_type, table_id, now, now + Config.RESERVATION_WALKIN_BUFFER_MINUTES * 60):
+            return None
+        entry = self.waitlist.table_freed(game_type, table_id)
+        return self.waitlist.describe(entry) if entry else None
+    
+    def offer_tables(self, game_type, table_ids=None):
+        """Call waiting parties to the idle tables of a game type (all of them, or just table_ids)"""
+        current_time = datetime.now()
+        called = []
+        with self.lock:
+            tables = self.tables.get(game_type, {})
+            for table_id in list(tables) if table_ids is None else table_ids:
+                table = tables.get(table_id)
+                if table is None or table['status'] != 'idle':
+                    continue
+                entry = self._call_waitlist(game_type, table_id, current_time)
+                if entry:
+                    called.append(entry)
+        return called
+    
+    def offer_released(self):
+        """Offer tables again whose called party timed out or cancelled"""
+        called = []
+        for game_type, table_id in self.waitlist.take_released():
+            called.extend(self.offer_tables(game_type, [table_id]))
+        return called
+    
+    def _apply_table_action(self, game_type, table_id, action, username, conn=None, reservation_id=None, force=False,
+                            billing=None, after_commit=None):
+        """Apply one action to the in-memory table (caller holds the lock).
+        
+        Waitlist bookkeeping for an ended session is appended to
+        `after_commit` when given, for the caller to run once its
+        transaction has committed; otherwise it runs straight away.
+        """
         tables = self.get_tables(game_type)
         
         if table_id not in tables:
@@ -152,6 +535,9 @@ class TableManager:
         
         if action == 'start':
             if table['status'] == 'idle':
+                refused = self._check_reservation(game_type, table_id, current_time, reservation_id, force)
+                if refused:
+                    return refused
                 table['status'] = 'running'
                 table['start_time'] = current_time
                 table['last_update'] = current_time
@@ -200,6 +586,9 @@ class TableManager:
                 session = {
                     "start_time": table.get('session_start_time', '00:00:00'),
                     "end_time": end_time,
+                    "start_epoch": int((table['start_time'] or current_time).timestamp()),
+                    "end_epoch": int(current_time.timestamp()),
+                    "duration_seconds": table['elapsed_seconds'],
                     "duration": round(duration_minutes, 1),
                     "amount": round(amount, 2),
                     "date": current_time.strftime("%Y-%m-%d"),
@@ -207,9 +596,17 @@ class TableManager:
                     "game_type": game_type,
                     "rate": table['rate']
                 }
+                players = table['players']
+                if players:
+                    session['customer_id'] = players[0]['customer_id']
                 
                 # Save session to database for persistence
-                self.save_session_to_db(table_id, game_type, session)
+                session['id'] = self.save_session_to_db(table_id, game_type, session, conn)
+                
+                # Bound players are charged in the same transaction as the session row
+                bill = None
+                if players and billing is not None and conn is not None:
+                    bill = billing.charge_session(conn, table_id, session, players, username)
                 
                 # Add to table's recent sessions (keep last 3)
                 table['sessions'].append(session)
@@ -224,48 +621,276 @@ class TableManager:
                 table['elapsed_seconds'] = 0
                 table['session_start_time'] = None
                 table['last_update'] = None
+                table['prepaid_minutes'] = None
+                table['prepaid_auto_pause'] = False
+                table['prepaid_warned'] = False
+                table['prepaid_expired'] = False
+                table['players'] = []
+                
+                # Apply config changes that waited for the session to finish
+                if 'pending_rate' in table:
+                    table['rate'] = table.pop('pending_rate')
+                retired = table.pop('retiring', False)
+                if retired:
+                    del tables[table_id]
+                    print(f"🔧 Retired {game_type} Table {table_id}")
                 
                 print(f"✅ Ended {game_type} Table {table_id} - ₹{amount:.2f} for {duration_minutes:.1f}min - SAVED TO DB")
                 
-                return {
+                result = {
                     "success": True,
                     "message": f"{game_type.title()} Table {table_id} ended - ₹{amount:.2f} for {duration_minutes:.1f} minutes",
-                    "show_customer_popup": True,
-                    "session_data": session
+                    "show_customer_popup": bill is None,
+                    "session_data": session,
+                    "bill": bill,
+                    "waitlist_called": None
                 }
+                
+                def finish_end():
+                    # Only a session that was really recorded counts and frees the table
+                    self.waitlist.record_session(game_type, duration_minutes)
+                    if not retired:
+                        result["waitlist_called"] = self._call_waitlist(game_type, table_id, current_time)
+                
+                if after_commit is None:
+                    finish_end()
+                else:
+                    after_commit.append(finish_end)
+                return result
         
         return {"success": False, "message": "No action taken"}
     
+    @traced('TableManager.update_table_rate')
     def update_table_rate(self, game_type, table_id, new_rate):
         """Update table rate"""
-        tables = self.get_tables(game_type)
-        
-        if table_id not in tables:
-            return {"success": False, "message": "Invalid table ID"}
-        
-        if new_rate not in self.available_rates:
+        if rate_to_paise(new_rate) not in self.rate_paise:
             return {"success": False, "message": "Invalid rate"}
         
-        table = tables[table_id]
+        with self.lock:
+            tables = self.get_tables(game_type)
+            
+            if table_id not in tables:
+                return {"success": False, "message": "Invalid table ID"}
+            
+            table = tables[table_id]
+            
+            if table['status'] != 'idle':
+                return {"success": False, "message": "Cannot change rate while table is running"}
+            
+            table['rate'] = new_rate
+            self._record_change(game_type, table_id, 'rate')
         
-        if table['status'] != 'idle':
-            return {"success": False, "message": "Cannot change rate while table is running"}
+        # Persist so a config reload or restart keeps the new rate
+        try:
+            conn = self.get_db_connection()
+            conn.execute("UPDATE table_config SET rate = ?, updated_date = CURRENT_TIMESTAMP WHERE game_type = ? AND table_id = ?",
+                         (new_rate, game_type, table_id))
+            conn.commit()
+            conn.close()
+        except sqlite3.Error as e:
+            print(f"⚠️ Could not persist rate change: {e}")
         
-        table['rate'] = new_rate
         print(f"✅ Updated {game_type} Table {table_id} rate to ₹{new_rate}/min")
         return {"success": True, "message": f"Rate updated to ₹{new_rate}/min"}
     
-    def clear_table_sessions(self, game_type, table_id):
-        """Clear recent sessions display (not database)"""
-        tables = self.get_tables(game_type)
+    def availability(self, start, end):
+        """Free and booked tables of every game type for [start, end) epoch seconds"""
+        with self.lock:
+            tables = {game_type: sorted(game_tables) for game_type, game_tables in self.tables.items()}
+            busy = {game_type: [table_id for table_id, table in game_tables.items() if table['status'] != 'idle']
+                    for game_type, game_tables in self.tables.items()}
         
-        if table_id not in tables:
-            return {"success": False, "message": "Invalid table ID"}
+        free = self.reservations.free_tables(tables, start, end)
+        # A window that has already begun also needs the table to be idle right now
+        starts_now = start <= time.time()
+        availability = {}
+        for game_type, table_ids in tables.items():
+            free_ids = [table_id for table_id in free[game_type]
+                        if not (starts_now and table_id in busy[game_type])]
+            availability[game_type] = {
+                "name": self.game_types.name(game_type),
+                "free": free_ids,
+                "unavailable": [table_id for table_id in table_ids if table_id not in free_ids],
+                "in_use": busy[game_type]
+            }
+        return availability
+    
+    def next_free_slot(self, game_type, minutes, after=None, table_id=None):
+        """Earliest (table_id, start_epoch) with `minutes` unbooked, skipping tables in use right now"""
+        now = int(time.time())
+        after = max(int(after or now), now)
+        with self.lock:
+            tables = self.get_tables(game_type)
+            if table_id is not None:
+                table_ids = [table_id] if table_id in tables else []
+            else:
+                table_ids = list(tables)
+            in_use = {tid for tid in table_ids if tables[tid]['status'] != 'idle'}
         
-        tables[table_id]['sessions'] = []
+        best = None
+        for tid in table_ids:
+            # A running session has no known end, so it can only take bookings that start later
+            search_from = after + 60 if tid in in_use and after <= now else after
+            slot = self.reservations.next_free_slot(game_type, [tid], search_from, int(minutes * 60))
+            if slot and (best is None or slot[1] < best[1]):
+                best = slot
+        return best
+    
+    @traced('TableManager.session_report')
+    def session_report(self, start, end, game_type=None):
+        """Sessions, minutes and revenue per table for sessions starting in [start, end) epoch seconds.
+        
+        One range seek per table on idx_sessions_table_start, so the report
+        reads only the index. Tables come from table_config, which keeps
+        retired tables too.
+        """
+        conn = self.get_db_connection()
+        try:
+            c = conn.cursor()
+            query = "SELECT game_type, table_id FROM table_config"
+            params = []
+            if game_type:
+                query += " WHERE game_type = ?"
+                params.append(game_type)
+            pairs = c.execute(query + " ORDER BY game_type, table_id", params).fetchall()
+            
+            rows = []
+            for key, table_id in pairs:
+                c.execute('''
+                    SELECT COUNT(*), COALESCE(SUM(duration_seconds), 0), COALESCE(SUM(amount_paise), 0)
+                    FROM sessions
+                    WHERE game_type = ? AND table_id = ? AND start_epoch >= ? AND start_epoch < ?
+                ''', (key, table_id, start, end))
+                sessions, seconds, paise = c.fetchone()
+                rows.append({"game_type": key, "table_id": table_id, "sessions": sessions,
+                             "minutes": round(seconds / 60, 1), "amount": paise / 100})
+        finally:
+            conn.close()
+        
+        return {
+            "from": format_epoch(start),
+            "to": format_epoch(end),
+            "tables": rows,
+            "totals": {
+                "sessions": sum(row["sessions"] for row in rows),
+                "minutes": round(sum(row["minutes"] for row in rows), 1),
+                "amount": round(sum(row["amount"] for row in rows), 2)
+            }
+        }
+    
+    @traced('TableManager.set_prepaid')
+    def set_prepaid(self, game_type, table_id, minutes, auto_pause=True):
+        """Set, extend or (minutes=None) clear a table's prepaid time block"""
+        with self.lock:
+            table = self.get_tables(game_type).get(table_id)
+            if table is None:
+                return {"success": False, "message": "Invalid table ID"}
+            
+            if not minutes:
+                table.update(prepaid_minutes=None, prepaid_auto_pause=False, prepaid_warned=False, prepaid_expired=False)
+                message = "Prepaid time cleared"
+            else:
+                played = table['elapsed_seconds'] / 60
+                if minutes <= played:
+                    return {"success": False, "message": f"Table has already played {played:.0f} minutes"}
+                table['prepaid_minutes'] = minutes
+                table['prepaid_auto_pause'] = bool(auto_pause)
+                # A longer block earns a fresh warning
+                table['prepaid_warned'] = minutes - played <= Config.PREPAID_WARNING_MINUTES
+                table['prepaid_expired'] = False
+                message = f"Prepaid {minutes:g} minutes" + (" (auto-pause)" if auto_pause else "")
+            
+            self._record_change(game_type, table_id, 'prepaid')
+            self.deadlines.sync(game_type, table_id, table)
+        
+        print(f"⏳ {game_type} Table {table_id}: {message}")
+        return {"success": True, "message": message}
+    
+    def clear_table_sessions(self, game_type, table_id):
+        """Clear recent sessions display (not database)"""
+        with self.lock:
+            tables = self.get_tables(game_type)
+            
+            if table_id not in tables:
+                return {"success": False, "message": "Invalid table ID"}
+            
+            tables[table_id]['sessions'] = []
+            self._publish(game_type)
         print(f"✅ Cleared recent sessions display for {game_type} Table {table_id}")
         return {"success": True, "message": "Recent sessions display cleared"}
     
+    def persist_clocks(self):
+        """Save every running or paused table's clock so the next start resumes it"""
+        with self.lock:
+            now = datetime.now()
+            rows = []
+            for game_type, tables in self.tables.items():
+                for table_id, table in tables.items():
+                    if table['status'] == 'idle':
+                        continue
+                    state = {field: table[field] for field in CLOCK_FIELDS}
+                    state['elapsed_seconds'] = int(played_seconds(table, now))
+                    state['start_time'] = table['start_time'].isoformat() if table['start_time'] else None
+                    rows.append((game_type, table_id, json.dumps(state), int(now.timestamp())))
+            
+            # Written under the lock so no action can move a clock after it was saved
+            conn = self.get_db_connection()
+            try:
+                conn.execute("DELETE FROM table_clocks")
+                conn.executemany("INSERT INTO table_clocks (game_type, table_id, state, saved_epoch) VALUES (?, ?, ?, ?)",
+                                 rows)
+                conn.commit()
+            finally:
+                conn.close()
+        
+        print(f"💾 Saved {len(rows)} running table clocks")
+        return len(rows)
+    
+    def restore_clocks(self):
+        """Resume clocks saved by persist_clocks.
+        
+        A table that was running keeps counting through a restart shorter than
+        Config.CLOCK_RESTORE_MAX_GAP_MINUTES; after a longer outage it comes
+        back paused at its saved time for staff to resume or end.
+        """
+        try:
+            conn = self.get_db_connection()
+            rows = conn.execute("SELECT game_type, table_id, state, saved_epoch FROM table_clocks").fetchall()
+            conn.execute("DELETE FROM table_clocks")
+            conn.commit()
+            conn.close()
+        except sqlite3.Error as e:
+            print(f"⚠️ Could not restore table clocks: {e}")
+            return 0
+        
+        now = datetime.now()
+        restored = 0
+        with self.lock:
+            for game_type, table_id, state, saved_epoch in rows:
+                table = self.get_tables(game_type).get(table_id)
+                if table is None or table['status'] != 'idle':
+                    continue
+                state = json.loads(state)
+                config_rate = table['rate']
+                gap = max(0, int(now.timestamp()) - saved_epoch)
+                if state['status'] == 'running':
+                    if gap > Config.CLOCK_RESTORE_MAX_GAP_MINUTES * 60:
+                        state['status'] = 'paused'
+                    else:
+                        state['elapsed_seconds'] += gap
+                
+                table.update(state)
+                table['start_time'] = datetime.fromisoformat(state['start_time']) if state['start_time'] else now
+                table['last_update'] = now
+                table['time'] = f"{table['elapsed_seconds'] // 60:02d}:{table['elapsed_seconds'] % 60:02d}"
+                table['amount'] = table['elapsed_seconds'] / 60 * table['rate']
+                if rate_to_paise(config_rate) != rate_to_paise(table['rate']):
+                    table['pending_rate'] = config_rate
+                self.deadlines.sync(game_type, table_id, table)
+                restored += 1
+                print(f"⏱️ Restored {game_type} Table {table_id}: {table['time']} ({table['status']})")
+        return restored
+    
     def update_timers(self):
         """Update table timers every second with precise timing"""
         print("⏰ Precise table timer system started")
@@ -273,22 +898,32 @@ class TableManager:
             try:
                 current_time = datetime.now()
                 
-                for tables in [self.snooker_tables, self.pool_tables]:
-                    for table_id, table in tables.items():
-                        if table['status'] == 'running' and table['last_update']:
-                            # Calculate precise time difference
-                            time_diff = (current_time - table['last_update']).total_seconds()
-                            table['elapsed_seconds'] += int(time_diff)
-                            table['last_update'] = current_time
-                            
-                            # Update display time
-                            minutes = table['elapsed_seconds'] // 60
-                            seconds = table['elapsed_seconds'] % 60
-                            table['time'] = f"{minutes:02d}:{seconds:02d}"
-                            
-                            # Update amount
-                            duration_minutes = table['elapsed_seconds'] / 60
-                            table['amount'] = duration_minutes * table['rate']
+                with self.lock:
+                    for game_type, tables in self.tables.items():
+                        ticked = False
+                        for table_id, table in tables.items():
+                            if table['status'] == 'running' and table['last_update']:
+                                ticked = True
+                                # Calculate precise time difference
+                                time_diff = (current_time - table['last_update']).total_seconds()
+                                table['elapsed_seconds'] += int(time_diff)
+                                table['last_update'] = current_time
+                                
+                                # Update display time
+                                minutes = table['elapsed_seconds'] // 60
+                                seconds = table['elapsed_seconds'] % 60
+                                table['time'] = f"{minutes:02d}:{seconds:02d}"
+                                
+                                # Update amount
+                                duration_minutes = table['elapsed_seconds'] / 60
+                                table['amount'] = duration_minutes * table['rate']
+                        
+                        # Idle game types keep their last snapshot
+                        if ticked:
+                            self._publish(game_type)
+                
+                # Calls nobody answered give their table to the next party
+                self.offer_released()
                 
                 # Sleep for exactly 1 second
                 time.sleep(1.0)
@@ -300,4 +935,5 @@ class TableManager:
     def stop(self):
         """Stop the timer system"""
         self.running = False
+        self.deadlines.stop()
         print("⏰ Table timer system stopped")
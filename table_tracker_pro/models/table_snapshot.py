@@ -0,0 +1,42 @@
+import gzip
+from datetime import datetime
+from types import MappingProxyType
+from config import Config
+from utils.serialization import dumps_bytes
+
+
+class TableSnapshot:
+    """One game type's tables frozen at publication, with the GET /tables body already encoded.
+
+    TableManager builds a new snapshot under its lock whenever a table of
+    the game type changes and swaps the reference in; readers take the
+    current reference without locking and never see it change.
+    """
+
+    __slots__ = ('version', 'game_type', 'tables', 'counts', 'published', 'body', 'gzip_body')
+
+    def __init__(self, version, game_type, tables, available_rates):
+        self.version = version
+        self.game_type = game_type
+        # Lists are copied to tuples: the live ones are appended to in place
+        self.tables = MappingProxyType({
+            table_id: MappingProxyType({key: tuple(value) if isinstance(value, list) else value
+                                        for key, value in table.items()})
+            for table_id, table in tables.items()
+        })
+        running = sum(1 for table in tables.values() if table['status'] == 'running')
+        paused = sum(1 for table in tables.values() if table['status'] == 'paused')
+        self.counts = MappingProxyType({'total': len(tables), 'running': running, 'paused': paused,
+                                        'idle': len(tables) - running - paused})
+        self.published = datetime.now().isoformat()
+        self.body = dumps_bytes({
+            "success": True,
+            "tables": self.tables,
+            "available_rates": list(available_rates),
+            "timestamp": self.published,
+            "game_type": game_type,
+            "table_count": len(tables),
+            "version": version
+        })
+        self.gzip_body = (gzip.compress(self.body, compresslevel=Config.COMPRESS_LEVEL)
+                          if len(self.body) >= Config.COMPRESS_MIN_SIZE else None)
@@ -1,21 +1,43 @@
 import json
 import os
 from flask_login import UserMixin
+from werkzeug.security import check_password_hash, generate_password_hash
 
 USERS_FILE = '/home/h21s/table_tracker_pro/data/users.json'
 ABSOLUTE_FILE = '/home/h21s/table_tracker_pro/data/users.json'
 
+def hash_password(password):
+    """Salted hash for users.json (werkzeug's default method)"""
+    return generate_password_hash(password)
+
+def _password_matches(data, password):
+    if 'password_hash' in data:
+        return check_password_hash(data['password_hash'], password)
+    # Plaintext entry not yet upgraded
+    return data.get('password') == password
+
 class User(UserMixin):
-    def __init__(self, username, password, role):
+    def __init__(self, username, password_hash, role):
         self.username = username
-        self.password = password
+        self.password_hash = password_hash
         self.role = role
+        # Set when the request was authenticated with a bearer token
+        self.token_id = None
+        self.token_expires = None
     
     def get_id(self):
         return self.username
     
     def check_password(self, password):
-        return self.password == password
+        return self.password_hash is not None and check_password_hash(self.password_hash, password)
+    
+    @staticmethod
+    def from_token(claims):
+        """User from verified token claims - no users.json read"""
+        user = User(claims['sub'], None, claims['role'])
+        user.token_id = claims['jti']
+        user.token_expires = claims['exp']
+        return user
     
     @staticmethod
     def get_all_users():
@@ -25,15 +47,17 @@ class User(UserMixin):
         return users
     
     @staticmethod
-    def add_user(username, password, role):
-        users = User.get_all_users()
-        users[username] = {'password': password, 'role': role}
-        
+    def save_all_users(users):
         with open(ABSOLUTE_FILE, 'w') as f:
             json.dump(users, f, indent=2)
             f.flush()
             os.fsync(f.fileno())
-        
+    
+    @staticmethod
+    def add_user(username, password, role):
+        users = User.get_all_users()
+        users[username] = {'password_hash': hash_password(password), 'role': role}
+        User.save_all_users(users)
         return True
     
     @staticmethod
@@ -41,15 +65,34 @@ class User(UserMixin):
         users = User.get_all_users()
         if username in users:
             data = users[username]
-            return User(username, data['password'], data['role'])
+            return User(username, data.get('password_hash'), data['role'])
         return None
     
     @staticmethod
     def authenticate(username, password):
         users = User.get_all_users()
-        if username in users and users[username]['password'] == password:
-            data = users[username]
-            return User(username, data['password'], data['role'])
-        return None
+        data = users.get(username)
+        if data is None or not _password_matches(data, password):
+            return None
+        
+        if 'password_hash' not in data:
+            # Upgrade the plaintext entry now that we have the password
+            users[username] = {'password_hash': hash_password(password), 'role': data['role']}
+            User.save_all_users(users)
+            print(f"🔐 Password for {username} upgraded to a salted hash")
+        return User(username, users[username]['password_hash'], data['role'])
+    
+    @staticmethod
+    def upgrade_password_hashes():
+        """Replace any plaintext passwords in users.json with salted hashes"""
+        users = User.get_all_users()
+        plaintext = [username for username, data in users.items() if 'password_hash' not in data]
+        for username in plaintext:
+            users[username] = {'password_hash': hash_password(users[username]['password']),
+                               'role': users[username]['role']}
+        if plaintext:
+            User.save_all_users(users)
+            print(f"🔐 Hashed stored passwords for: {', '.join(plaintext)}")
+        return plaintext
 
 print("🔧 CACHE-FREE User System Ready")
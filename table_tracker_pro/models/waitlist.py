@@ -0,0 +1,263 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from config import Config
+
+
+class RollingDuration:
+    """Mean of the last `window` session lengths, updated in O(1) per session"""
+
+    __slots__ = ('samples', 'total')
+
+    def __init__(self, window):
+        self.samples = deque(maxlen=window)
+        self.total = 0.0
+
+    def add(self, minutes):
+        if len(self.samples) == self.samples.maxlen:
+            self.total -= self.samples[0]
+        self.samples.append(minutes)
+        self.total += minutes
+
+    def mean(self):
+        if not self.samples:
+            return float(Config.WAITLIST_DEFAULT_SESSION_MINUTES)
+        return self.total / len(self.samples)
+
+
+class Waitlist:
+    """Walk-in queue per game type, handed the next party when a table frees up.
+
+    Parties that will take any table wait in a heap per game type; parties
+    waiting for one specific table wait in a heap per table. A freed table
+    compares the two heap heads, so hand-off is O(log n). Heap entries are
+    (priority, arrival, id) - a lower priority number is served first -
+    and cancelled or seated parties are dropped lazily when they surface.
+    """
+
+    def __init__(self, feed):
+        self.change_feed = feed
+        self.lock = threading.Lock()
+        self.heaps = {}
+        self.entries = {}
+        self.sequence = itertools.count(1)
+        self.durations = {}
+        # (time, entry_id) in time order, so expiry only looks at the oldest
+        self.calls = deque()
+        self.finished = deque()
+        # (game_type, table_id) -> id of the party called to it
+        self.held = {}
+        # Tables whose called party timed out or cancelled, to be offered again
+        self.released = []
+
+    # ------------------------------------------------------------------
+    # Session length stats
+    # ------------------------------------------------------------------
+
+    def _duration(self, game_type):
+        if game_type not in self.durations:
+            self.durations[game_type] = RollingDuration(Config.WAITLIST_STATS_WINDOW)
+        return self.durations[game_type]
+
+    def load_stats(self, conn, game_types):
+        """Seed the rolling stats with each game type's most recent sessions"""
+        c = conn.cursor()
+        with self.lock:
+            for game_type in game_types:
+                c.execute("""SELECT duration_seconds / 60.0 FROM sessions WHERE game_type = ? AND duration_seconds > 0
+                             ORDER BY id DESC LIMIT ?""", (game_type, Config.WAITLIST_STATS_WINDOW))
+                stats = self.durations[game_type] = RollingDuration(Config.WAITLIST_STATS_WINDOW)
+                for (minutes,) in reversed(c.fetchall()):
+                    stats.add(minutes)
+
+    def record_session(self, game_type, minutes):
+        if minutes and minutes > 0:
+            with self.lock:
+                self._duration(game_type).add(minutes)
+
+    # ------------------------------------------------------------------
+    # Queue
+    # ------------------------------------------------------------------
+
+    def _push(self, entry):
+        key = (entry['game_type'], entry['table_id'])
+        heapq.heappush(self.heaps.setdefault(key, []), (entry['priority'], entry['arrival'], entry['id']))
+
+    def _head(self, key):
+        """The best waiting entry of one heap, discarding stale ones"""
+        heap = self.heaps.get(key)
+        while heap:
+            entry = self.entries.get(heap[0][2])
+            if entry and entry['status'] == 'waiting':
+                return heap[0]
+            heapq.heappop(heap)
+        return None
+
+    def add(self, game_type, name, phone=None, party_size=None, priority=None, table_id=None, staff_user=None):
+        with self.lock:
+            entry = {
+                'id': next(self.sequence),
+                'game_type': game_type,
+                'table_id': table_id,
+                'name': name,
+                'phone': phone,
+                'party_size': party_size,
+                'priority': Config.WAITLIST_DEFAULT_PRIORITY if priority is None else int(priority),
+                'arrival': time.time(),
+                'status': 'waiting',
+                'called_table': None,
+                'called_at': None,
+                'staff_user': staff_user
+            }
+            self.entries[entry['id']] = entry
+            self._push(entry)
+        self.change_feed.record('waitlist', {'action': 'added', **self.describe(entry)})
+        print(f"🕒 Waitlist: {name} queued for {game_type}" + (f" table {table_id}" if table_id else ""))
+        return entry
+
+    def _finish(self, entry_id, status, from_statuses):
+        with self.lock:
+            entry = self.entries.get(entry_id)
+            if entry is None or entry['status'] not in from_statuses:
+                return None
+            if entry['status'] == 'called':
+                self._release(entry, offer=status != 'seated')
+            entry['status'] = status
+            self.finished.append((time.time(), entry_id))
+        self.change_feed.record('waitlist', {'action': status, **self.describe(entry)})
+        return entry
+
+    def cancel(self, entry_id):
+        return self._finish(entry_id, 'cancelled', ('waiting', 'called'))
+
+    def seat(self, entry_id):
+        return self._finish(entry_id, 'seated', ('waiting', 'called'))
+
+    def _release(self, entry, offer=True):
+        """Drop a called party's hold on its table (caller holds the lock)"""
+        key = (entry['game_type'], entry['called_table'])
+        if self.held.get(key) == entry['id']:
+            del self.held[key]
+            if offer:
+                self.released.append(key)
+
+    def take_released(self):
+        """Tables freed by expired or cancelled calls since the last call"""
+        with self.lock:
+            self._expire()
+            released, self.released = self.released, []
+        return released
+
+    def table_freed(self, game_type, table_id):
+        """Call the next party for a table that just became idle, returning their entry"""
+        with self.lock:
+            self._expire()
+            if (game_type, table_id) in self.held:
+                # Still kept for a party that was called to it
+                return None
+            candidates = [head for head in (self._head((game_type, None)), self._head((game_type, table_id))) if head]
+            if not candidates:
+                return None
+            _, _, entry_id = min(candidates)
+            heapq.heappop(self.heaps[(game_type, self.entries[entry_id]['table_id'])])
+            entry = self.entries[entry_id]
+            entry['status'] = 'called'
+            entry['called_table'] = table_id
+            entry['called_at'] = time.time()
+            self.calls.append((entry['called_at'], entry_id))
+            self.held[(game_type, table_id)] = entry_id
+
+        self.change_feed.record('waitlist', {'action': 'called', **self.describe(entry)})
+        print(f"📣 Waitlist: {entry['name']} called to {game_type} table {table_id}")
+        return entry
+
+    def _expire(self):
+        """Expire calls nobody answered and forget long-finished entries (caller holds the lock)"""
+        now = time.time()
+        call_cutoff = now - Config.WAITLIST_CALL_TIMEOUT_MINUTES * 60
+        while self.calls and self.calls[0][0] < call_cutoff:
+            _, entry_id = self.calls.popleft()
+            entry = self.entries.get(entry_id)
+            if entry and entry['status'] == 'called':
+                self._release(entry)
+                entry['status'] = 'expired'
+                self.finished.append((now, entry_id))
+
+        keep_cutoff = now - Config.WAITLIST_KEEP_FINISHED_MINUTES * 60
+        while self.finished and self.finished[0][0] < keep_cutoff:
+            _, entry_id = self.finished.popleft()
+            self.entries.pop(entry_id, None)
+
+    # ------------------------------------------------------------------
+    # Positions and estimates
+    # ------------------------------------------------------------------
+
+    def _waiting(self, game_type):
+        """Waiting entries of one game type in service order (snapshot; O(n log n))"""
+        waiting = [entry for entry in self.entries.values()
+                   if entry['game_type'] == game_type and entry['status'] == 'waiting']
+        waiting.sort(key=lambda entry: (entry['priority'], entry['arrival'], entry['id']))
+        return waiting
+
+    def queue(self, game_type, tables):
+        """Waiting parties of a game type with their position and estimated wait"""
+        with self.lock:
+            self._expire()
+            waiting = self._waiting(game_type)
+            mean = self._duration(game_type).mean()
+        estimates = estimate_waits(tables, mean, len(waiting))
+        return [{**self.describe(entry), 'position': position + 1,
+                 'estimated_wait_minutes': None if estimates[position] is None else round(estimates[position], 1)}
+                for position, entry in enumerate(waiting)]
+
+    def status(self, entry_id, tables_by_game):
+        with self.lock:
+            entry = self.entries.get(entry_id)
+            if entry is None:
+                return None
+            if entry['status'] != 'waiting':
+                return {**self.describe(entry), 'position': None, 'estimated_wait_minutes': None}
+        for item in self.queue(entry['game_type'], tables_by_game(entry['game_type'])):
+            if item['id'] == entry_id:
+                return item
+        return {**self.describe(entry), 'position': None, 'estimated_wait_minutes': None}
+
+    def average_session(self, game_type):
+        with self.lock:
+            stats = self._duration(game_type)
+            return {'mean_minutes': round(stats.mean(), 1), 'samples': len(stats.samples)}
+
+    def describe(self, entry):
+        """JSON-friendly copy of an entry"""
+        public = {key: value for key, value in entry.items() if key not in ('arrival', 'called_at')}
+        public['arrived'] = datetime.fromtimestamp(entry['arrival']).strftime('%H:%M:%S')
+        public['waited_minutes'] = round((time.time() - entry['arrival']) / 60, 1)
+        return public
+
+
+def estimate_waits(tables, mean_minutes, parties):
+    """Minutes until each of the next `parties` parties gets a table.
+
+    A running table frees after the mean session length minus its elapsed
+    time (at least a minute); every freed table then serves the next party
+    for another mean session. None when the game type has no tables.
+    """
+    free_at = []
+    for table in tables.values():
+        if table['status'] == 'idle':
+            free_at.append(0.0)
+        else:
+            free_at.append(max(1.0, mean_minutes - table['elapsed_seconds'] / 60))
+    if not free_at:
+        return [None] * parties
+
+    heapq.heapify(free_at)
+    estimates = []
+    for _ in range(parties):
+        soonest = heapq.heappop(free_at)
+        estimates.append(soonest)
+        heapq.heappush(free_at, soonest + mean_minutes)
+    return estimates
@@ -1,41 +1,64 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, Response, stream_with_context, g
+import base64
 import json
 import os
 from flask_login import current_user
+from werkzeug.local import LocalProxy
 from models.customer import CustomerModel
-from utils.decorators import api_login_required, admin_only, json_required, validate_game_type
+from models.user import User, hash_password
+from models.reservations import parse_when, format_epoch
+from database.bulk_import import BulkImporter, normalize_phone, open_text_stream
+from database.export import DATASETS, FORMATS, epoch_range, iter_export, parse_date_range
+from database.maintenance import maintenance_scheduler
+from database.venues import venue_router
+from config import Config
+from utils.admission import admission
+from utils.tokens import token_signer
+from utils.decorators import api_login_required, admin_only, json_required
 from utils.helpers import validate_customer_data
 from datetime import datetime
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
-# Initialize customer model
-customer_model = CustomerModel()
+# Initialize the default venue's customer model; other venues open on first use
+venue_router.register(Config.DEFAULT_VENUE, customer_model=CustomerModel())
+
+def _current_venue():
+    return getattr(g, 'venue', Config.DEFAULT_VENUE)
+
+# Both resolve to the requesting venue's shard on every access
+customer_model = LocalProxy(lambda: venue_router.get_customers(_current_venue()))
+table_manager = LocalProxy(lambda: venue_router.get_tables(_current_venue()))
+
+@api_bp.before_request
+def resolve_venue():
+    """Pick the venue shard from the X-Venue header or ?venue= parameter"""
+    venue = request.headers.get('X-Venue') or request.args.get('venue') or Config.DEFAULT_VENUE
+    if not venue_router.is_known(venue):
+        return jsonify({'success': False, 'error': f'Unknown venue: {venue}'}), 404
+    role = current_user.role if current_user.is_authenticated else None
+    if not venue_router.may_access(role, venue):
+        return jsonify({'success': False, 'error': f'Access denied to venue: {venue}'}), 403
+    g.venue = venue
 
 @api_bp.route('/<game_type>/tables', methods=['GET'])
 @api_login_required
-@validate_game_type
 def get_tables(game_type):
-    """Get all tables for a game type"""
+    """Get all tables for a game type (the body was encoded when the state last changed)"""
+    if not table_manager.game_types.is_valid(game_type):
+        return jsonify({"success": False, "error": f"Invalid game type: {game_type}"}), 400
+    
     try:
         print(f"🌐 API Request: GET /{game_type}/tables from user {current_user.username}")
         
-        # Import here to avoid circular import
-        from app import table_manager
+        snapshot = table_manager.snapshot(game_type)
         
-        tables = table_manager.get_tables(game_type)
-        available_rates = table_manager.available_rates
+        print(f"📊 API Response: {snapshot.counts['total']} {game_type} tables found")
         
-        print(f"📊 API Response: {len(tables)} {game_type} tables found")
-        
-        return jsonify({
-            "success": True,
-            "tables": tables,
-            "available_rates": available_rates,
-            "timestamp": datetime.now().isoformat(),
-            "game_type": game_type,
-            "table_count": len(tables)
-        })
+        if snapshot.gzip_body is not None and request.accept_encodings['gzip']:
+            return Response(snapshot.gzip_body, mimetype='application/json',
+                            headers={'Content-Encoding': 'gzip', 'Vary': 'Accept-Encoding'})
+        return Response(snapshot.body, mimetype='application/json')
         
     except Exception as e:
         print(f"❌ API Error in get_tables: {e}")
@@ -52,12 +75,12 @@ def get_tables(game_type):
 @api_bp.route('/<game_type>/table/<int:table_id>/action', methods=['POST'])
 @api_login_required
 @json_required
-@validate_game_type
 def table_action(game_type, table_id):
     """Handle table actions (start, pause, end)"""
+    if not table_manager.game_types.is_valid(game_type):
+        return jsonify({"success": False, "error": f"Invalid game type: {game_type}"}), 400
+    
     try:
-        from app import table_manager
-        
         data = request.get_json()
         action = data.get('action')
         
@@ -66,10 +89,35 @@ def table_action(game_type, table_id):
         if action not in ['start', 'pause', 'end']:
             return jsonify({"success": False, "error": "Invalid action"}), 400
         
-        result = table_manager.handle_table_action(game_type, table_id, action, current_user.username)
+        prepaid_minutes = data.get('prepaid_minutes')
+        if prepaid_minutes is not None and (not isinstance(prepaid_minutes, (int, float)) or prepaid_minutes <= 0):
+            return jsonify({"success": False, "error": "prepaid_minutes must be a positive number"}), 400
+        
+        players = data.get('players')
+        if players is not None:
+            error = _validate_players(players)
+            if not error and action == 'start' and players:
+                # Refuse before the clock starts rather than start a table nobody is bound to
+                _, error = table_manager.check_players(players, customer_model._get_current_object())
+            if error:
+                return jsonify({"success": False, "error": error}), 400
+        
+        result = table_manager.handle_table_action(game_type, table_id, action, current_user.username,
+                                                   reservation_id=data.get('reservation_id'),
+                                                   force=bool(data.get('force')),
+                                                   billing=customer_model._get_current_object())
         
         if result["success"]:
-            tables = table_manager.get_tables(game_type)
+            if action == 'start' and data.get('waitlist_id') is not None:
+                table_manager.waitlist.seat(data['waitlist_id'])
+            if action == 'start' and prepaid_minutes:
+                table_manager.set_prepaid(game_type, table_id, prepaid_minutes, data.get('auto_pause', True))
+            if action == 'start' and players:
+                bound = table_manager.set_players(game_type, table_id, players, customer_model._get_current_object())
+                if not bound["success"]:
+                    result["message"] += f" (players not bound: {bound['message']})"
+            
+            tables = table_manager.snapshot(game_type).tables
             response_data = {
                 "success": True,
                 "table": table_id,
@@ -81,8 +129,16 @@ def table_action(game_type, table_id):
             
             if result.get("show_customer_popup") and "session_data" in result:
                 response_data["session_data"] = result["session_data"]
+                response_data["waitlist_called"] = result.get("waitlist_called")
+            
+            if result.get("bill"):
+                response_data["bill"] = result["bill"]
+                response_data["waitlist_called"] = result.get("waitlist_called")
             
             return jsonify(response_data)
+        elif "reservation" in result:
+            # Booked soon: the client can seat the booking or retry with force
+            return jsonify({"success": False, "error": result["message"], "reservation": result["reservation"]}), 409
         else:
             return jsonify({"success": False, "error": result["message"]}), 400
             
@@ -90,15 +146,177 @@ def table_action(game_type, table_id):
         print(f"❌ API Error in table_action: {e}")
         return jsonify({"success": False, "error": str(e)}), 500
 
+@api_bp.route('/tables/actions:batch', methods=['POST'])
+@api_login_required
+@json_required
+def batch_table_actions():
+    """Apply an ordered list of table actions across game types in one request"""
+    try:
+        data = request.get_json()
+        actions = data.get('actions')
+        
+        if not isinstance(actions, list) or not actions:
+            return jsonify({"success": False, "error": "actions must be a non-empty list"}), 400
+        
+        if len(actions) > Config.BATCH_MAX_ACTIONS:
+            return jsonify({"success": False, "error": f"At most {Config.BATCH_MAX_ACTIONS} actions per batch"}), 400
+        
+        if not all(isinstance(item, dict) for item in actions):
+            return jsonify({"success": False, "error": "Each action must be an object"}), 400
+        
+        print(f"📦 Batch Table Actions: {len(actions)} actions by {current_user.username}")
+        
+        results = table_manager.handle_batch_actions(actions, current_user.username,
+                                                     billing=customer_model._get_current_object())
+        
+        return jsonify({
+            "success": all(result["success"] for result in results),
+            "results": results,
+            "tables": table_manager.snapshot_tables(),
+            "timestamp": datetime.now().isoformat()
+        })
+        
+    except Exception as e:
+        print(f"❌ API Error in batch_table_actions: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+def _apply_sync_operation(op_type, payload):
+    """Apply one queued client operation, returning a result dict"""
+    game_type = payload.get('game_type', 'snooker')
+    if not table_manager.game_types.is_valid(game_type):
+        return {'success': False, 'error': 'Invalid game type'}
+    
+    if op_type == 'table_action':
+        action = payload.get('action')
+        if action not in ['start', 'pause', 'end']:
+            return {'success': False, 'error': 'Invalid action'}
+        result = table_manager.handle_table_action(game_type, payload.get('table_id'), action, current_user.username,
+                                                   reservation_id=payload.get('reservation_id'),
+                                                   force=bool(payload.get('force')),
+                                                   billing=customer_model._get_current_object())
+        return {'success': result['success'], 'message': result['message'], 'session_data': result.get('session_data'),
+                'bill': result.get('bill')}
+    
+    if op_type == 'table_rate':
+        rate = payload.get('rate')
+        if not isinstance(rate, (int, float)):
+            return {'success': False, 'error': 'Invalid rate value'}
+        result = table_manager.update_table_rate(game_type, payload.get('table_id'), float(rate))
+        return {'success': result['success'], 'message': result['message']}
+    
+    if op_type == 'assign_amount':
+        customer_id = payload.get('customer_id')
+        amount = payload.get('amount')
+        minutes = payload.get('minutes')
+        if not all([customer_id, amount is not None, minutes is not None]):
+            return {'success': False, 'error': 'Missing required fields'}
+        customer_model.add_amount_to_customer(
+            customer_id, amount, minutes, payload.get('description', f'{game_type.title()} session'),
+            current_user.username, game_type, payload.get('session_id')
+        )
+        return {'success': True, 'message': f'₹{amount:.2f} added to customer balance'}
+    
+    if op_type == 'split_assign':
+        players = payload.get('players', [])
+        per_player_amount = payload.get('per_player_amount')
+        if not players or not per_player_amount:
+            return {'success': False, 'error': 'Missing required fields'}
+        description = f"Split {game_type.title()} Table {payload.get('table_id')} session ({len(players)} players)"
+        customer_model.split_amount_to_customers(players, per_player_amount, payload.get('per_player_minutes'),
+                                                 description, current_user.username, game_type,
+                                                 payload.get('session_id'))
+        return {'success': True, 'message': f'Split bill assigned to {len(players)} players'}
+    
+    if op_type == 'adjust_balance':
+        customer_id = payload.get('customer_id')
+        amount = payload.get('amount')
+        transaction_type = payload.get('transaction_type')
+        if not all([customer_id, amount is not None, transaction_type]):
+            return {'success': False, 'error': 'Missing required fields'}
+        if current_user.role == 'staff' and amount < 0:
+            return {'success': False, 'error': 'Staff cannot subtract money'}
+        customer_model.adjust_customer_balance(customer_id, amount, transaction_type, current_user.username)
+        return {'success': True, 'message': f'₹{abs(amount):.2f} balance adjustment applied'}
+    
+    return {'success': False, 'error': f'Unknown operation type: {op_type}'}
+
+@api_bp.route('/sync', methods=['POST'])
+@api_login_required
+@json_required
+def sync_operations():
+    """Apply a tablet's queued operations once each and return changes since its cursor"""
+    try:
+        data = request.get_json()
+        operations = data.get('operations', [])
+        cursor = data.get('cursor')
+        
+        if not isinstance(operations, list):
+            return jsonify({'success': False, 'error': 'operations must be a list'}), 400
+        
+        if len(operations) > Config.SYNC_MAX_OPERATIONS:
+            return jsonify({'success': False, 'error': f'At most {Config.SYNC_MAX_OPERATIONS} operations per sync'}), 400
+        
+        results = []
+        applied = 0
+        customers_changed = False
+        operation_index = venue_router.get_operations(_current_venue())
+        for op in operations:
+            op_id = op.get('op_id') if isinstance(op, dict) else None
+            if not op_id:
+                results.append({'op_id': None, 'status': 'rejected', 'error': 'Missing op_id'})
+                continue
+            
+            is_new, previous = operation_index.reserve(op_id)
+            if not is_new:
+                status = 'in_progress' if previous is operation_index.PENDING else 'duplicate'
+                results.append({'op_id': op_id, 'status': status,
+                                'result': None if previous is operation_index.PENDING else previous})
+                continue
+            
+            try:
+                result = _apply_sync_operation(op.get('type'), op.get('payload') or {})
+            except Exception as e:
+                # Each operation writes in a single transaction, so a failure left
+                # nothing behind and the client may retry it
+                operation_index.release(op_id)
+                print(f"❌ Sync operation {op_id} failed: {e}")
+                results.append({'op_id': op_id, 'status': 'error', 'error': str(e)})
+                continue
+            
+            result['client_ts'] = op.get('client_ts')
+            operation_index.complete(op_id, result)
+            applied += 1
+            customers_changed = customers_changed or op.get('type') in ('assign_amount', 'split_assign', 'adjust_balance')
+            results.append({'op_id': op_id, 'status': 'applied', 'result': result})
+        
+        if customers_changed:
+            customer_model.export_to_txt()
+        
+        changes, next_cursor, resync = customer_model.change_feed.since(cursor)
+        print(f"🔄 Sync by {current_user.username}: {applied}/{len(operations)} applied, {len(changes)} changes sent")
+        
+        return jsonify({
+            'success': True,
+            'results': results,
+            'changes': changes,
+            'cursor': next_cursor,
+            'resync': resync,
+            'timestamp': datetime.now().isoformat()
+        })
+        
+    except Exception as e:
+        print(f"❌ API Error in sync_operations: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @api_bp.route('/<game_type>/table/<int:table_id>/rate', methods=['POST'])
 @api_login_required
 @json_required
-@validate_game_type
 def update_table_rate(game_type, table_id):
     """Update table rate"""
+    if not table_manager.game_types.is_valid(game_type):
+        return jsonify({"success": False, "error": f"Invalid game type: {game_type}"}), 400
+    
     try:
-        from app import table_manager
-        
         data = request.get_json()
         new_rate = data.get('rate')
         
@@ -108,7 +326,7 @@ def update_table_rate(game_type, table_id):
         result = table_manager.update_table_rate(game_type, table_id, float(new_rate))
         
         if result["success"]:
-            tables = table_manager.get_tables(game_type)
+            tables = table_manager.snapshot(game_type).tables
             return jsonify({
                 "success": True,
                 "table": table_id,
@@ -125,12 +343,12 @@ def update_table_rate(game_type, table_id):
 
 @api_bp.route('/<game_type>/table/<int:table_id>/clear-sessions', methods=['POST'])
 @api_login_required
-@validate_game_type
 def clear_table_sessions(game_type, table_id):
     """Clear all sessions for a table"""
+    if not table_manager.game_types.is_valid(game_type):
+        return jsonify({"success": False, "error": f"Invalid game type: {game_type}"}), 400
+    
     try:
-        from app import table_manager
-        
         result = table_manager.clear_table_sessions(game_type, table_id)
         
         if result["success"]:
@@ -142,6 +360,325 @@ def clear_table_sessions(game_type, table_id):
         print(f"❌ API Error in clear_table_sessions: {e}")
         return jsonify({"success": False, "error": str(e)}), 500
 
+@api_bp.route('/<game_type>/table/<int:table_id>/prepaid', methods=['POST'])
+@api_login_required
+@json_required
+def set_table_prepaid(game_type, table_id):
+    """Set or extend a prepaid block {minutes, auto_pause}; minutes null/0 clears it"""
+    if not table_manager.game_types.is_valid(game_type):
+        return jsonify({"success": False, "error": f"Invalid game type: {game_type}"}), 400
+    
+    try:
+        data = request.get_json()
+        minutes = data.get('minutes')
+        if minutes is not None and (not isinstance(minutes, (int, float)) or minutes < 0):
+            return jsonify({"success": False, "error": "minutes must be a positive number"}), 400
+        
+        result = table_manager.set_prepaid(game_type, table_id, minutes, data.get('auto_pause', True))
+        if not result["success"]:
+            return jsonify({"success": False, "error": result["message"]}), 400
+        
+        return jsonify({"success": True, "message": result["message"],
+                        "table": table_manager.snapshot(game_type).tables.get(table_id)})
+    
+    except Exception as e:
+        print(f"❌ API Error in set_table_prepaid: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+def _validate_players(players):
+    """Error message for a malformed [{customer_id, share}] list, or None"""
+    if not isinstance(players, list):
+        return "players must be a list"
+    for player in players:
+        if not isinstance(player, dict) or not isinstance(player.get('customer_id'), int):
+            return "Each player needs an integer customer_id"
+        share = player.get('share', 1)
+        if not isinstance(share, (int, float)) or share <= 0:
+            return "share must be a positive number"
+    return None
+
+@api_bp.route('/<game_type>/table/<int:table_id>/players', methods=['POST'])
+@api_login_required
+@json_required
+def set_table_players(game_type, table_id):
+    """Bind customers to a running table {players: [{customer_id, share}]}; ending the table bills them"""
+    if not table_manager.game_types.is_valid(game_type):
+        return jsonify({"success": False, "error": f"Invalid game type: {game_type}"}), 400
+    
+    try:
+        players = request.get_json().get('players')
+        error = _validate_players(players)
+        if error:
+            return jsonify({"success": False, "error": error}), 400
+        
+        result = table_manager.set_players(game_type, table_id, players, customer_model._get_current_object())
+        if not result["success"]:
+            return jsonify({"success": False, "error": result["message"]}), 400
+        
+        return jsonify({"success": True, "message": result["message"], "players": result["players"]})
+    
+    except Exception as e:
+        print(f"❌ API Error in set_table_players: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@api_bp.route('/alerts')
+@api_login_required
+def get_alerts():
+    """Table alerts newer than ?since=<id> (?unacknowledged=1 to hide acknowledged ones)"""
+    try:
+        since = request.args.get('since', 0, type=int)
+        alerts = table_manager.deadlines.list_alerts(since, request.args.get('unacknowledged') == '1')
+        return jsonify({
+            "success": True,
+            "alerts": alerts,
+            "last_id": alerts[-1]['id'] if alerts else since,
+            "pending_deadlines": table_manager.deadlines.pending()
+        })
+    
+    except Exception as e:
+        print(f"❌ API Error in get_alerts: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@api_bp.route('/alerts/<int:alert_id>/ack', methods=['POST'])
+@api_login_required
+def acknowledge_alert(alert_id):
+    """Mark an alert as seen"""
+    if not table_manager.deadlines.acknowledge(alert_id):
+        return jsonify({"success": False, "error": "Alert not found"}), 404
+    return jsonify({"success": True})
+
+def _parse_window(args):
+    """(start, end) epoch seconds from ?from=&to= (or &minutes=), defaulting to the next hour"""
+    start = parse_when(args['from']) if args.get('from') else int(datetime.now().timestamp())
+    if args.get('to'):
+        end = parse_when(args['to'])
+    else:
+        end = start + int(float(args.get('minutes', Config.RESERVATION_DEFAULT_MINUTES)) * 60)
+    if end <= start:
+        raise ValueError("'to' must be after 'from'")
+    return start, end
+
+@api_bp.route('/availability')
+@api_login_required
+def table_availability():
+    """Free tables of every game type for a time window, e.g. ?from=19:00&to=21:00"""
+    try:
+        try:
+            start, end = _parse_window(request.args)
+        except (ValueError, TypeError) as e:
+            return jsonify({"success": False, "error": f"Invalid time window: {e}"}), 400
+        
+        return jsonify({
+            "success": True,
+            "from": format_epoch(start),
+            "to": format_epoch(end),
+            "game_types": table_manager.availability(start, end)
+        })
+    
+    except Exception as e:
+        print(f"❌ API Error in table_availability: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@api_bp.route('/<game_type>/next-free-slot')
+@api_login_required
+def next_free_slot(game_type):
+    """Earliest unbooked slot of ?minutes= on any (or ?table_id=) table, from ?after= or now"""
+    if not table_manager.game_types.is_valid(game_type):
+        return jsonify({"success": False, "error": f"Invalid game type: {game_type}"}), 400
+    
+    try:
+        try:
+            minutes = float(request.args.get('minutes', Config.RESERVATION_DEFAULT_MINUTES))
+            after = parse_when(request.args['after']) if request.args.get('after') else None
+            table_id = request.args.get('table_id', type=int)
+        except (ValueError, TypeError) as e:
+            return jsonify({"success": False, "error": f"Invalid parameters: {e}"}), 400
+        
+        slot = table_manager.next_free_slot(game_type, minutes, after, table_id)
+        if slot is None:
+            return jsonify({"success": False, "error": "No free slot - all matching tables are in use"}), 404
+        
+        return jsonify({
+            "success": True,
+            "game_type": game_type,
+            "table_id": slot[0],
+            "start": format_epoch(slot[1]),
+            "start_epoch": slot[1],
+            "minutes": minutes
+        })
+    
+    except Exception as e:
+        print(f"❌ API Error in next_free_slot: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@api_bp.route('/waitlist', methods=['GET'])
+@api_login_required
+def get_waitlist():
+    """Waiting parties with positions and estimated waits, for one (?game_type=) or every game type"""
+    try:
+        game_type = request.args.get('game_type')
+        if game_type and not table_manager.game_types.is_valid(game_type):
+            return jsonify({"success": False, "error": f"Invalid game type: {game_type}"}), 400
+        
+        tables = table_manager.snapshot_tables()
+        game_types = [game_type] if game_type else list(tables)
+        return jsonify({
+            "success": True,
+            "game_types": {
+                key: {
+                    "queue": table_manager.waitlist.queue(key, tables.get(key, {})),
+                    "session_length": table_manager.waitlist.average_session(key)
+                } for key in game_types
+            }
+        })
+    
+    except Exception as e:
+        print(f"❌ API Error in get_waitlist: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@api_bp.route('/waitlist', methods=['POST'])
+@api_login_required
+@json_required
+def join_waitlist():
+    """Queue a walk-in party: {game_type, name, phone, party_size, priority, table_id}"""
+    try:
+        data = request.get_json()
+        game_type = data.get('game_type')
+        name = (data.get('name') or '').strip()
+        table_id = data.get('table_id')
+        priority = data.get('priority')
+        
+        if not table_manager.game_types.is_valid(game_type):
+            return jsonify({"success": False, "error": f"Invalid game type: {game_type}"}), 400
+        if not name:
+            return jsonify({"success": False, "error": "Name is required"}), 400
+        if table_id is not None and table_id not in table_manager.get_tables(game_type):
+            return jsonify({"success": False, "error": f"Invalid table ID: {table_id}"}), 400
+        if priority is not None and (not isinstance(priority, int) or not 0 <= priority <= 9):
+            return jsonify({"success": False, "error": "priority must be an integer from 0 (first) to 9"}), 400
+        
+        entry = table_manager.waitlist.add(game_type, name, data.get('phone'), data.get('party_size'),
+                                           priority, table_id, current_user.username)
+        # A table may already be free for them
+        table_manager.offer_tables(game_type, None if table_id is None else [table_id])
+        status = table_manager.waitlist.status(entry['id'], lambda key: table_manager.snapshot_tables().get(key, {}))
+        return jsonify({"success": True, "entry": status})
+    
+    except Exception as e:
+        print(f"❌ API Error in join_waitlist: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@api_bp.route('/waitlist/<int:entry_id>', methods=['GET'])
+@api_login_required
+def waitlist_position(entry_id):
+    """Queue position and estimated wait for one party"""
+    try:
+        status = table_manager.waitlist.status(entry_id, lambda key: table_manager.snapshot_tables().get(key, {}))
+        if status is None:
+            return jsonify({"success": False, "error": "Waitlist entry not found"}), 404
+        return jsonify({"success": True, "entry": status})
+    
+    except Exception as e:
+        print(f"❌ API Error in waitlist_position: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@api_bp.route('/waitlist/<int:entry_id>/<any(cancel, seat):action>', methods=['POST'])
+@api_login_required
+def update_waitlist_entry(entry_id, action):
+    """Remove a party from the queue, either gone (cancel) or given a table (seat)"""
+    try:
+        waitlist = table_manager.waitlist
+        entry = waitlist.cancel(entry_id) if action == 'cancel' else waitlist.seat(entry_id)
+        if entry is None:
+            return jsonify({"success": False, "error": "Waitlist entry not found or no longer waiting"}), 404
+        # A cancelled call frees its table for the next party
+        called = table_manager.offer_released()
+        return jsonify({"success": True, "entry": waitlist.describe(entry), "waitlist_called": called})
+    
+    except Exception as e:
+        print(f"❌ API Error in update_waitlist_entry: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@api_bp.route('/reservations', methods=['GET'])
+@api_login_required
+def list_reservations():
+    """Reservations overlapping a window (default: the rest of today)"""
+    try:
+        try:
+            args = request.args.to_dict()
+            args.setdefault('from', datetime.now().strftime('%Y-%m-%dT00:00'))
+            args.setdefault('minutes', 24 * 60)
+            start, end = _parse_window(args)
+        except (ValueError, TypeError) as e:
+            return jsonify({"success": False, "error": f"Invalid time window: {e}"}), 400
+        
+        reservations = table_manager.reservations.list(start, end, request.args.get('game_type'))
+        return jsonify({"success": True, "reservations": reservations, "count": len(reservations)})
+    
+    except Exception as e:
+        print(f"❌ API Error in list_reservations: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@api_bp.route('/reservations', methods=['POST'])
+@api_login_required
+@json_required
+def create_reservation():
+    """Book a table: {game_type, table_id, start, end | minutes, name, phone, customer_id, party_size, notes}"""
+    try:
+        data = request.get_json()
+        game_type = data.get('game_type')
+        table_id = data.get('table_id')
+        name = (data.get('name') or '').strip()
+        
+        if not table_manager.game_types.is_valid(game_type):
+            return jsonify({"success": False, "error": f"Invalid game type: {game_type}"}), 400
+        if table_id not in table_manager.get_tables(game_type):
+            return jsonify({"success": False, "error": f"Invalid table ID: {table_id}"}), 400
+        if not name:
+            return jsonify({"success": False, "error": "Name is required"}), 400
+        
+        try:
+            start = parse_when(data.get('start'))
+            if data.get('end'):
+                end = parse_when(data['end'])
+            else:
+                end = start + int(float(data.get('minutes', Config.RESERVATION_DEFAULT_MINUTES)) * 60)
+        except (ValueError, TypeError) as e:
+            return jsonify({"success": False, "error": f"Invalid start/end: {e}"}), 400
+        
+        result = table_manager.reservations.book(
+            game_type, table_id, start, end, name, data.get('phone'), data.get('customer_id'),
+            data.get('party_size'), data.get('notes'), current_user.username
+        )
+        if not result["success"]:
+            status = 409 if "conflict" in result else 400
+            return jsonify({"success": False, "error": result["message"], "conflict": result.get("conflict")}), status
+        
+        table_manager.change_feed.record('reservation', {"action": "booked", **result["reservation"]})
+        return jsonify({"success": True, "message": result["message"], "reservation": result["reservation"]})
+    
+    except Exception as e:
+        print(f"❌ API Error in create_reservation: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@api_bp.route('/reservations/<int:reservation_id>/cancel', methods=['POST'])
+@api_login_required
+def cancel_reservation(reservation_id):
+    """Cancel a booking, or mark it as a no-show with {"no_show": true}"""
+    try:
+        data = request.get_json(silent=True) or {}
+        status = 'no_show' if data.get('no_show') else 'cancelled'
+        result = table_manager.reservations.cancel(reservation_id, status)
+        if not result["success"]:
+            return jsonify({"success": False, "error": result["message"]}), 404
+        
+        table_manager.change_feed.record('reservation', {"action": status, "id": reservation_id})
+        return jsonify({"success": True, "message": result["message"]})
+    
+    except Exception as e:
+        print(f"❌ API Error in cancel_reservation: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
 @api_bp.route('/customers/search')
 @api_login_required
 def search_customers():
@@ -177,6 +714,11 @@ def add_customer():
         if errors:
             return jsonify({'success': False, 'error': '; '.join(errors)}), 400
         
+        # Stored the way bulk import stores it, so the same number can't be added twice
+        phone = normalize_phone(phone)
+        if phone is None:
+            return jsonify({'success': False, 'error': 'Invalid phone number format'}), 400
+        
         customer_id = customer_model.add_customer(name, phone)
         
         if customer_id:
@@ -195,6 +737,33 @@ def add_customer():
         print(f"❌ API Error in add_customer: {e}")
         return jsonify({'success': False, 'error': f'Failed to add customer: {str(e)}'}), 500
 
+@api_bp.route('/customers/import', methods=['POST'])
+@admin_only
+def import_customers():
+    """Bulk upsert customers from an uploaded CSV or JSON Lines file (Admin only)"""
+    try:
+        upload = request.files.get('file')
+        fmt = request.args.get('format')
+        if not fmt:
+            filename = upload.filename if upload else ''
+            fmt = 'jsonl' if filename.endswith(('.jsonl', '.ndjson')) or request.mimetype == 'application/x-ndjson' else 'csv'
+        
+        if fmt not in ['csv', 'jsonl']:
+            return jsonify({'success': False, 'error': 'format must be csv or jsonl'}), 400
+        
+        stream = open_text_stream(upload.stream if upload else request.stream)
+        report = BulkImporter(customer_model.db_path).run(stream, fmt)
+        
+        customer_model._load_leaderboard()
+        customer_model.change_feed.record('customers_imported', {'inserted': report['inserted'], 'updated': report['updated']})
+        customer_model.export_to_txt()
+        
+        return jsonify({'success': True, **report})
+        
+    except Exception as e:
+        print(f"❌ API Error in import_customers: {e}")
+        return jsonify({'success': False, 'error': f'Import failed: {str(e)}'}), 500
+
 @api_bp.route('/customers/assign-amount', methods=['POST'])
 @api_login_required
 @json_required
@@ -207,15 +776,16 @@ def assign_amount_to_customer():
         minutes = data.get('minutes')
         game_type = data.get('game_type', 'snooker')
         description = data.get('description', f'{game_type.title()} session')
+        session_id = data.get('session_id')
         
         if not all([customer_id, amount is not None, minutes is not None]):
             return jsonify({'success': False, 'error': 'Missing required fields'}), 400
         
-        if game_type not in ['snooker', 'pool']:
+        if not table_manager.game_types.is_valid(game_type):
             return jsonify({'success': False, 'error': 'Invalid game type'}), 400
         
         customer_model.add_amount_to_customer(
-            customer_id, amount, minutes, description, current_user.username, game_type
+            customer_id, amount, minutes, description, current_user.username, game_type, session_id
         )
         customer_model.export_to_txt()
         return jsonify({'success': True, 'message': f'₹{amount:.2f} added to customer balance'})
@@ -267,21 +837,15 @@ def split_assign_amount():
         per_player_minutes = data.get('per_player_minutes')
         game_type = data.get('game_type', 'snooker')
         table_id = data.get('table_id')
+        session_id = data.get('session_id')
         
         if not players or not per_player_amount:
             return jsonify({'success': False, 'error': 'Missing required fields'}), 400
         
-        # Process each player
-        for player in players:
-            customer_id = player.get('customer_id')
-            name = player.get('name')
-            
-            description = f"Split {game_type.title()} Table {table_id} session ({len(players)} players)"
-            
-            customer_model.add_amount_to_customer(
-                customer_id, per_player_amount, per_player_minutes, 
-                description, current_user.username, game_type
-            )
+        # All players are charged in one transaction, or none are
+        description = f"Split {game_type.title()} Table {table_id} session ({len(players)} players)"
+        customer_model.split_amount_to_customers(players, per_player_amount, per_player_minutes,
+                                                 description, current_user.username, game_type, session_id)
         
         customer_model.export_to_txt()
         
@@ -300,6 +864,7 @@ def get_all_customers():
     """Get all customers with statistics"""
     try:
         customers = customer_model.get_all_customers()
+        game_stats = customer_model.get_game_stats()
         today_stats = customer_model.get_today_stats()
         top_customers = customer_model.get_top_customers(5)
         
@@ -311,7 +876,8 @@ def get_all_customers():
                 'snooker_amount': c[5] or 0, 'snooker_minutes': c[6] or 0,
                 'pool_amount': c[7] or 0, 'pool_minutes': c[8] or 0,
                 'today_amount': c[9] or 0, 'today_minutes': c[10] or 0,
-                'last_session_time': c[13]
+                'last_session_time': c[13],
+                'games': game_stats.get(c[0], {})
             } for c in customers],
             'today_stats': today_stats,
             'top_customers': top_customers
@@ -327,38 +893,220 @@ def get_all_customers():
             'top_customers': []
         }), 500
 
+def _encode_history_cursor(created_date, row_id):
+    raw = json.dumps([created_date, row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def _decode_history_cursor(cursor):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    created_date, row_id = json.loads(base64.urlsafe_b64decode(padded))
+    return created_date, int(row_id)
+
+@api_bp.route('/customers/<int:customer_id>/history')
+@api_login_required
+def customer_history(customer_id):
+    """Stream a page of a customer's transactions with their sessions"""
+    try:
+        limit = min(max(request.args.get('limit', 50, type=int), 1), 500)
+        cursor = request.args.get('cursor')
+        before = _decode_history_cursor(cursor) if cursor else None
+    except (ValueError, TypeError):
+        return jsonify({'success': False, 'error': 'Invalid cursor'}), 400
+    
+    # Checked up front: once streaming starts the status is already 200
+    try:
+        if customer_model.get_balance(customer_id) is None:
+            return jsonify({'success': False, 'error': 'Customer not found'}), 404
+    except Exception as e:
+        print(f"❌ API Error in customer_history: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+    
+    def generate():
+        # "success" comes last: it is only known once every row has been read
+        yield f'{{"customer_id": {customer_id}, "transactions": ['
+        last = None
+        count = 0
+        try:
+            for row in customer_model.iter_customer_history(customer_id, limit, before):
+                yield (',' if count else '') + json.dumps(row)
+                last = row
+                count += 1
+        except Exception as e:
+            print(f"❌ API Error in customer_history: {e}")
+            yield f'], "count": {count}, "next_cursor": null, "success": false, "error": {json.dumps(str(e))}}}'
+            return
+        
+        next_cursor = _encode_history_cursor(last['created_date'], last['id']) if count == limit else None
+        yield f'], "count": {count}, "next_cursor": {json.dumps(next_cursor)}, "success": true}}'
+    
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+@api_bp.route('/customers/<int:customer_id>/balance')
+@api_login_required
+def customer_balance(customer_id):
+    """A customer's totals from the last ledger snapshot plus newer entries"""
+    try:
+        row = customer_model.get_balance(customer_id)
+        if row is None:
+            return jsonify({'success': False, 'error': 'Customer not found'}), 404
+        
+        return jsonify({
+            'success': True,
+            'customer_id': customer_id,
+            'name': row[1],
+            'total_amount': round(row[3] or 0, 2),
+            'total_minutes': row[4] or 0,
+            'today_amount': round(row[9] or 0, 2),
+            'games': customer_model.get_game_stats(customer_id).get(customer_id, {})
+        })
+    
+    except Exception as e:
+        print(f"❌ API Error in customer_balance: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api_bp.route('/customers/transactions/<int:transaction_id>/reverse', methods=['POST'])
+@admin_only
+@json_required
+def reverse_transaction(transaction_id):
+    """Reverse a transaction with a compensating entry, optionally re-posting a corrected amount (Admin only)"""
+    try:
+        data = request.get_json()
+        reason = (data.get('reason') or '').strip()
+        if not reason:
+            return jsonify({'success': False, 'error': 'A reason is required'}), 400
+        
+        corrected_amount = data.get('corrected_amount')
+        if corrected_amount is not None:
+            corrected_amount = float(corrected_amount)
+        
+        result = customer_model.reverse_transaction(transaction_id, current_user.username, reason, corrected_amount)
+        if not result['success']:
+            status = 404 if result['error'] == 'Transaction not found' else 409
+            return jsonify(result), status
+        
+        return jsonify(result)
+    
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'Invalid corrected_amount'}), 400
+    except Exception as e:
+        print(f"❌ API Error in reverse_transaction: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api_bp.route('/customers/leaderboard')
+@api_login_required
+def customer_leaderboard():
+    """Top customers overall, per game type or for today"""
+    try:
+        board = request.args.get('board', 'total')
+        limit = request.args.get('limit', 10, type=int)
+        
+        ranked = customer_model.leaderboard.top(board, limit)
+        if ranked is None:
+            return jsonify({'success': False, 'error': f'Unknown board or limit above {customer_model.leaderboard.capacity}'}), 400
+        
+        return jsonify({
+            'success': True,
+            'board': board,
+            'customers': [{'id': customer_id, 'name': name, 'amount': amount} for customer_id, name, amount in ranked]
+        })
+        
+    except Exception as e:
+        print(f"❌ API Error in customer_leaderboard: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api_bp.route('/customers/leaderboard/check')
+@admin_only
+def check_leaderboard():
+    """Compare the in-process leaderboards against SQL (Admin only)"""
+    try:
+        # SQL only sees snapshotted totals, so fold the ledger tail in first
+        customer_model.ledger.snapshot()
+        conn = customer_model.get_connection()
+        report = customer_model.leaderboard.check_consistency(conn)
+        conn.close()
+        
+        if request.args.get('rebuild') == '1' and not all(r['consistent'] for r in report.values()):
+            customer_model._load_leaderboard()
+        
+        return jsonify({
+            'success': True,
+            'consistent': all(r['consistent'] for r in report.values()),
+            'boards': report
+        })
+        
+    except Exception as e:
+        print(f"❌ API Error in check_leaderboard: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @api_bp.route('/system/status')
 @api_login_required
 def system_status():
     """Get system status"""
     try:
-        from app import table_manager
-        
-        snooker_running = sum(1 for table in table_manager.snooker_tables.values() if table['status'] == 'running')
-        pool_running = sum(1 for table in table_manager.pool_tables.values() if table['status'] == 'running')
+        tables = {}
+        for game_type, snapshot in table_manager.published.items():
+            counts = snapshot.counts
+            tables[game_type] = {
+                'total': counts['total'],
+                'running': counts['running'],
+                'paused': counts['paused'],
+                'idle': counts['idle'],
+                'version': snapshot.version
+            }
         
         return jsonify({
             'success': True,
             'system_status': 'online',
             'timestamp': datetime.now().isoformat(),
-            'tables': {
-                'snooker': {
-                    'total': len(table_manager.snooker_tables),
-                    'running': snooker_running,
-                    'idle': len(table_manager.snooker_tables) - snooker_running
-                },
-                'pool': {
-                    'total': len(table_manager.pool_tables),
-                    'running': pool_running,
-                    'idle': len(table_manager.pool_tables) - pool_running
-                }
-            }
+            'venue': _current_venue(),
+            'tables': tables,
+            'maintenance': maintenance_scheduler.status(_current_venue()),
+            'admission': admission.status(),
+            'tokens': token_signer.status()
         })
         
     except Exception as e:
         print(f"❌ API Error in system_status: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@api_bp.route('/reports/sessions')
+@api_login_required
+def session_report():
+    """Sessions, minutes and revenue per table for ?from=&to= (YYYY-MM-DD, default today) and optional ?game_type="""
+    try:
+        game_type = request.args.get('game_type')
+        if game_type and not table_manager.game_types.is_valid(game_type):
+            return jsonify({"success": False, "error": f"Invalid game type: {game_type}"}), 400
+        
+        try:
+            date_from, date_to = parse_date_range(request.args.get('from'), request.args.get('to'))
+        except ValueError:
+            return jsonify({'success': False, 'error': 'from/to must be YYYY-MM-DD'}), 400
+        date_from = date_from or datetime.now().date().isoformat()
+        start, end = epoch_range(date_from, date_to or date_from)
+        if end <= start:
+            return jsonify({'success': False, 'error': 'to must not be before from'}), 400
+        
+        return jsonify({'success': True, **table_manager.session_report(start, end, game_type)})
+    
+    except Exception as e:
+        print(f"❌ API Error in session_report: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api_bp.route('/system/maintenance', methods=['POST'])
+@api_login_required
+@admin_only
+def run_maintenance():
+    """Run the close-out maintenance for the current venue now"""
+    try:
+        print(f"🧹 Close-out maintenance requested by {current_user.username}")
+        report = maintenance_scheduler.run(_current_venue())
+        return jsonify({'success': report['ok'], 'report': report}), 200 if report['ok'] else 500
+    
+    except Exception as e:
+        print(f"❌ API Error in run_maintenance: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @api_bp.route('/system/export', methods=['POST'])
 @api_login_required
 def export_data():
@@ -378,6 +1126,223 @@ def export_data():
         print(f"❌ API Error in export_data: {e}")
         return jsonify({'success': False, 'error': f'Export failed: {str(e)}'}), 500
 
+@api_bp.route('/system/export/download')
+@api_login_required
+@admin_only
+def download_export():
+    """Stream customers, transactions or sessions as CSV, JSON Lines or text"""
+    dataset = request.args.get('dataset', 'customers')
+    fmt = request.args.get('format', 'csv')
+    
+    if dataset not in DATASETS:
+        return jsonify({'success': False, 'error': f"dataset must be one of {', '.join(DATASETS)}"}), 400
+    if fmt not in FORMATS:
+        return jsonify({'success': False, 'error': f"format must be one of {', '.join(FORMATS)}"}), 400
+    
+    try:
+        date_from, date_to = parse_date_range(request.args.get('from'), request.args.get('to'))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'from/to must be YYYY-MM-DD'}), 400
+    
+    print(f"📤 Export download: {dataset}.{fmt} ({date_from or '*'} → {date_to or '*'}) by {current_user.username}")
+    
+    filename = f"{dataset}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}"
+    return Response(
+        stream_with_context(iter_export(customer_model.db_path, dataset, fmt, date_from, date_to)),
+        mimetype=FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+# ============================================================================
+# TABLE CONFIGURATION API ENDPOINTS (Admin only, applied without restart)
+# ============================================================================
+
+@api_bp.route('/admin/table-config', methods=['GET'])
+@admin_only
+def get_table_config():
+    """List configured tables and rate options"""
+    try:
+        conn = customer_model.get_connection()
+        c = conn.cursor()
+        c.execute("SELECT game_type, table_id, rate, active, updated_date FROM table_config ORDER BY game_type, table_id")
+        tables = [{'game_type': r[0], 'table_id': r[1], 'rate': r[2], 'active': bool(r[3]), 'updated_date': r[4]}
+                  for r in c.fetchall()]
+        c.execute("SELECT rate_paise FROM rate_options ORDER BY rate_paise")
+        rates = [r[0] / 100 for r in c.fetchall()]
+        conn.close()
+        
+        return jsonify({'success': True, 'tables': tables, 'available_rates': rates})
+        
+    except Exception as e:
+        print(f"❌ API Error in get_table_config: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api_bp.route('/admin/table-config', methods=['POST'])
+@admin_only
+@json_required
+def save_table_config():
+    """Add a table, change its rate or (de)activate it"""
+    try:
+        from models.table import rate_to_paise
+        
+        data = request.get_json()
+        game_type = data.get('game_type')
+        table_id = data.get('table_id')
+        rate = data.get('rate')
+        active = 1 if data.get('active', True) else 0
+        
+        if not table_manager.game_types.is_valid(game_type):
+            return jsonify({'success': False, 'error': 'Invalid game type'}), 400
+        if not isinstance(table_id, int) or table_id < 1:
+            return jsonify({'success': False, 'error': 'table_id must be a positive integer'}), 400
+        if not isinstance(rate, (int, float)) or rate_to_paise(rate) not in table_manager.rate_paise:
+            return jsonify({'success': False, 'error': 'Rate must be one of the available rates'}), 400
+        
+        conn = customer_model.get_connection()
+        conn.execute("""INSERT INTO table_config (game_type, table_id, rate, active) VALUES (?, ?, ?, ?)
+                        ON CONFLICT(game_type, table_id) DO UPDATE SET
+                            rate = excluded.rate, active = excluded.active, updated_date = CURRENT_TIMESTAMP""",
+                     (game_type, table_id, float(rate), active))
+        conn.commit()
+        conn.close()
+        
+        summary = table_manager.reload_config()
+        return jsonify({'success': True, 'applied': summary})
+        
+    except Exception as e:
+        print(f"❌ API Error in save_table_config: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api_bp.route('/admin/rates', methods=['POST'])
+@admin_only
+@json_required
+def save_rate_options():
+    """Replace the list of selectable rates"""
+    try:
+        from models.table import rate_to_paise
+        
+        rates = request.get_json().get('rates')
+        if not isinstance(rates, list) or not rates or not all(isinstance(r, (int, float)) and r > 0 for r in rates):
+            return jsonify({'success': False, 'error': 'rates must be a non-empty list of positive numbers'}), 400
+        
+        conn = customer_model.get_connection()
+        with conn:
+            conn.execute("DELETE FROM rate_options")
+            conn.executemany("INSERT OR IGNORE INTO rate_options (rate_paise) VALUES (?)",
+                             [(rate_to_paise(r),) for r in rates])
+        conn.close()
+        
+        summary = table_manager.reload_config()
+        return jsonify({'success': True, 'available_rates': table_manager.available_rates, 'applied': summary})
+        
+    except Exception as e:
+        print(f"❌ API Error in save_rate_options: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api_bp.route('/admin/table-config/reload', methods=['POST'])
+@admin_only
+def reload_table_config():
+    """Re-read table_config after it was edited outside the app"""
+    try:
+        return jsonify({'success': True, 'applied': table_manager.reload_config()})
+    except Exception as e:
+        print(f"❌ API Error in reload_table_config: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api_bp.route('/admin/game-types', methods=['GET'])
+@admin_only
+def get_game_types():
+    """List registered game types"""
+    try:
+        return jsonify({
+            'success': True,
+            'game_types': [{'key': key, 'name': table_manager.game_types.name(key)} for key in table_manager.game_types.keys()]
+        })
+    except Exception as e:
+        print(f"❌ API Error in get_game_types: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api_bp.route('/admin/game-types', methods=['POST'])
+@admin_only
+@json_required
+def add_game_type():
+    """Register a new game type (e.g. carrom); add its tables via /admin/table-config"""
+    try:
+        data = request.get_json()
+        key = str(data.get('key', '')).strip().lower()
+        name = str(data.get('name', '')).strip() or key.replace('_', ' ').title()
+        
+        if not table_manager.game_types.add(key, name[:40]):
+            return jsonify({'success': False, 'error': 'key must be 2-31 lowercase letters, digits or _ and not total/today'}), 400
+        
+        summary = table_manager.reload_config()
+        return jsonify({'success': True, 'key': key, 'name': name, 'applied': summary})
+        
+    except Exception as e:
+        print(f"❌ API Error in add_game_type: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api_bp.route('/admin/venues', methods=['GET'])
+@admin_only
+def list_venues():
+    """List configured venue shards"""
+    return jsonify({'success': True, 'default': Config.DEFAULT_VENUE, 'venues': venue_router.status()})
+
+# ============================================================================
+# API TOKENS
+# ============================================================================
+
+@api_bp.route('/auth/token', methods=['POST'])
+@json_required
+def issue_token():
+    """Exchange username/password for a short-lived bearer token"""
+    try:
+        data = request.get_json()
+        username = data.get('username', '').strip()
+        user = User.authenticate(username, data.get('password', '').strip())
+        if user is None:
+            print(f"❌ Token refused: {username}")
+            return jsonify({'success': False, 'error': 'Invalid username or password'}), 401
+        
+        token, claims = token_signer.issue(user.username, user.role)
+        print(f"🔑 Token issued: {user.username} ({user.role})")
+        return jsonify({
+            'success': True,
+            'token': token,
+            'token_type': 'Bearer',
+            'expires_in': claims['exp'] - int(claims['iat']),
+            'expires_at': datetime.fromtimestamp(claims['exp']).isoformat(),
+            'username': user.username,
+            'role': user.role
+        })
+    
+    except Exception as e:
+        print(f"❌ API Error in issue_token: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api_bp.route('/auth/revoke', methods=['POST'])
+@api_login_required
+def revoke_token():
+    """Revoke the bearer token of this request, or (admin) every token of {"username"}"""
+    try:
+        data = request.get_json(silent=True) or {}
+        username = data.get('username')
+        if username and username != current_user.username:
+            if current_user.role != 'admin':
+                return jsonify({'success': False, 'error': 'Admin access required'}), 403
+            token_signer.revoke_user(username)
+            print(f"🔑 All tokens of {username} revoked by {current_user.username}")
+            return jsonify({'success': True, 'message': f"Tokens of '{username}' revoked"})
+        
+        if current_user.token_id is None:
+            return jsonify({'success': False, 'error': 'Request was not made with a bearer token'}), 400
+        token_signer.revoke(current_user.token_id, current_user.token_expires)
+        return jsonify({'success': True, 'message': 'Token revoked'})
+    
+    except Exception as e:
+        print(f"❌ API Error in revoke_token: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 # ============================================================================
 # USER MANAGEMENT API ENDPOINTS - FIXED
 # ============================================================================
@@ -449,7 +1414,7 @@ def add_user():
         
         # Add user to JSON file
         print("   ➕ Adding to JSON file...")
-        users[username] = {"password": password, "role": role}
+        users[username] = {"password_hash": hash_password(password), "role": role}
         
         with open(USERS_FILE, "w") as f:
             json.dump(users, f, indent=2)
@@ -525,6 +1490,8 @@ def remove_user():
             verify_users = json.load(f)
         
         if username not in verify_users:
+            # Tokens already issued would otherwise stay valid until they expire
+            token_signer.revoke_user(username)
             print(f"   📁 File now has: {list(verify_users.keys())}")
             return jsonify({"success": True, "message": f"User '{username}' removed successfully"})
         else:
@@ -553,7 +1520,8 @@ def edit_customer(customer_id):
         # Validate phone format
         phone_pattern = r'^[\d\s\-\+\(\)]+$'
         import re
-        if not re.match(phone_pattern, new_phone):
+        new_phone = normalize_phone(new_phone) if re.match(phone_pattern, new_phone) else None
+        if new_phone is None:
             return jsonify({'success': False, 'error': 'Invalid phone number format'}), 400
         
         # Update customer in database
@@ -567,7 +1535,8 @@ def edit_customer(customer_id):
             return jsonify({'success': False, 'error': 'Phone number already exists for another customer'}), 400
         
         # Update customer
-        c.execute("UPDATE customers SET name = ?, phone = ? WHERE id = ?", (new_name, new_phone, customer_id))
+        c.execute("UPDATE customers SET name = ?, phone = ? WHERE id = ? AND deleted_date IS NULL",
+                  (new_name, new_phone, customer_id))
         
         if c.rowcount == 0:
             conn.close()
@@ -576,6 +1545,8 @@ def edit_customer(customer_id):
         conn.commit()
         conn.close()
         
+        customer_model.leaderboard.set_name(customer_id, new_name)
+        customer_model.change_feed.record('customer_updated', {'customer_id': customer_id, 'name': new_name, 'phone': new_phone})
         customer_model.export_to_txt()
         
         return jsonify({
@@ -590,7 +1561,7 @@ def edit_customer(customer_id):
 @api_bp.route('/customers/<int:customer_id>/delete', methods=['POST'])
 @api_login_required
 def delete_customer(customer_id):
-    """Delete customer (Admin only)"""
+    """Delete customer (Admin only) - their transactions stay in the ledger"""
     try:
         if current_user.role != 'admin':
             return jsonify({'success': False, 'error': 'Only admin can delete customers'}), 403
@@ -599,22 +1570,17 @@ def delete_customer(customer_id):
         c = conn.cursor()
         
         # Get customer name for confirmation
-        c.execute("SELECT name FROM customers WHERE id = ?", (customer_id,))
+        c.execute("SELECT name FROM customers WHERE id = ? AND deleted_date IS NULL", (customer_id,))
         customer = c.fetchone()
+        conn.close()
         
         if not customer:
-            conn.close()
             return jsonify({'success': False, 'error': 'Customer not found'}), 404
         
         customer_name = customer[0]
         
-        # Delete customer and related transactions
-        c.execute("DELETE FROM transactions WHERE customer_id = ?", (customer_id,))
-        c.execute("DELETE FROM customers WHERE id = ?", (customer_id,))
-        
-        conn.commit()
-        conn.close()
-        
+        if not customer_model.soft_delete_customer(customer_id):
+            return jsonify({'success': False, 'error': 'Customer not found'}), 404
         customer_model.export_to_txt()
         
         return jsonify({
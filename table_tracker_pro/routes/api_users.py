@@ -1,5 +1,6 @@
 from flask import Blueprint, jsonify, request
 from flask_login import current_user
+from models.user import hash_password
 from utils.decorators import admin_only, json_required
 import json
 import os
@@ -48,7 +49,7 @@ def add_user():
         print(f"   Before: {list(users.keys())}")
         
         # Add new user
-        users[username] = {'password': password, 'role': role}
+        users[username] = {'password_hash': hash_password(password), 'role': role}
         print(f"   After: {list(users.keys())}")
         
         # Write to file
@@ -12,13 +12,10 @@ def login():
         
         print(f"🔐 Login attempt: {username}")
         
-        # Use our fresh user system
-        all_users = User.get_all_users()
-        print(f"📋 Available users: {list(all_users.keys())}")
+        # Checks the salted hash (and upgrades a plaintext entry)
+        user = User.authenticate(username, password)
         
-        if username in all_users and all_users[username]['password'] == password:
-            user_data = all_users[username]
-            user = User(username, user_data['password'], user_data['role'])
+        if user is not None:
             login_user(user)
             print(f"✅ Login successful: {username}")
             flash(f'Welcome back, {username}!', 'success')
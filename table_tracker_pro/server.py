@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Production server for Table Tracker Pro
+
+`python3 app.py` serves through waitress with Config.SERVER_* tuning and
+falls back to the Flask development server if waitress is not installed.
+On SIGTERM (systemctl stop) or Ctrl+C it stops taking requests, waits up to
+Config.SERVER_DRAIN_TIMEOUT for in-flight ones, then saves running table
+clocks, folds the ledger tail and checkpoints every open venue database.
+
+This module is also a gunicorn config file:
+    gunicorn -c python:server app:app
+"""
+
+import _thread
+import signal
+import threading
+import time
+from config import Config
+
+try:
+    import waitress
+except ImportError:  # waitress is optional - fall back to the Flask development server
+    waitress = None
+
+
+class DrainMiddleware:
+    """Counts in-flight requests and turns new ones away once draining starts"""
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+        self.condition = threading.Condition()
+        self.in_flight = 0
+        self.draining = False
+
+    def __call__(self, environ, start_response):
+        with self.condition:
+            if self.draining:
+                start_response('503 Service Unavailable', [('Content-Type', 'text/plain'),
+                                                           ('Retry-After', '5'), ('Connection', 'close')])
+                return [b'Server is restarting\n']
+            self.in_flight += 1
+        try:
+            body = self.wsgi_app(environ, start_response)
+        except BaseException:
+            self._done()
+            raise
+        return ClosingIterator(body, self._done)
+
+    def _done(self):
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def drain(self, timeout):
+        """Refuse new requests and wait for running ones; True if all finished in time"""
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            self.draining = True
+            while self.in_flight and time.monotonic() < deadline:
+                self.condition.wait(deadline - time.monotonic())
+            return self.in_flight == 0
+
+
+class ClosingIterator:
+    """Response body wrapper that reports completion once the server closes it"""
+
+    def __init__(self, body, on_close):
+        self.body = body
+        self.on_close = on_close
+
+    def __iter__(self):
+        return iter(self.body)
+
+    def close(self):
+        try:
+            if hasattr(self.body, 'close'):
+                self.body.close()
+        finally:
+            self.on_close()
+
+
+def flush_and_close():
+    """Persist everything held in memory before the process exits"""
+    from database.maintenance import maintenance_scheduler
+    from database.venues import venue_router
+    started = time.perf_counter()
+    maintenance_scheduler.stop()
+    venue_router.shutdown()
+    print(f"✅ Shutdown flush finished in {time.perf_counter() - started:.2f}s")
+
+
+def _workers():
+    if Config.SERVER_WORKERS > 1:
+        # Table clocks, waitlists and deadlines live in process memory
+        print(f"⚠️ SERVER_WORKERS={Config.SERVER_WORKERS} would split table state across processes - using 1")
+    return 1
+
+
+def serve(app):
+    """Run the app until SIGTERM/SIGINT, then drain and flush"""
+    drain = DrainMiddleware(app.wsgi_app)
+    app.wsgi_app = drain
+
+    def handle_sigterm(signum, frame):
+        if drain.draining:
+            return
+        print(f"🛑 Signal {signum}: draining {drain.in_flight} in-flight requests")
+        if server is not None:
+            server.accepting = False
+
+        def finish():
+            if not drain.drain(Config.SERVER_DRAIN_TIMEOUT):
+                print(f"⚠️ {drain.in_flight} requests still running after {Config.SERVER_DRAIN_TIMEOUT}s")
+            # Unblocks the server loop in the main thread, which then flushes
+            _thread.interrupt_main()
+
+        threading.Thread(target=finish, name='drain', daemon=True).start()
+
+    server = None
+    signal.signal(signal.SIGTERM, handle_sigterm)
+    try:
+        if waitress is not None:
+            server = waitress.create_server(app, host=Config.HOST, port=Config.PORT,
+                                            threads=Config.SERVER_THREADS,
+                                            connection_limit=Config.SERVER_CONNECTION_LIMIT,
+                                            channel_timeout=Config.SERVER_KEEPALIVE_SECONDS,
+                                            ident='table-tracker')
+            print(f"🚀 waitress: {Config.SERVER_THREADS} threads, keep-alive {Config.SERVER_KEEPALIVE_SECONDS}s, "
+                  f"up to {Config.SERVER_CONNECTION_LIMIT} connections")
+            server.run()
+        else:
+            print("⚠️ waitress is not installed (pip3 install waitress) - using the Flask development server")
+            app.run(host=Config.HOST, port=Config.PORT, debug=False, threaded=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # Ctrl+C skips the signal handler, so drain here as well
+        drain.drain(Config.SERVER_DRAIN_TIMEOUT)
+        flush_and_close()
+
+
+# gunicorn settings (gunicorn -c python:server app:app); gunicorn drains
+# workers itself on SIGTERM, the hook below flushes each worker on exit
+bind = f"{Config.HOST}:{Config.PORT}"
+workers = _workers()
+worker_class = 'gthread'
+threads = Config.SERVER_THREADS
+keepalive = Config.SERVER_KEEPALIVE_SECONDS
+graceful_timeout = Config.SERVER_DRAIN_TIMEOUT
+worker_connections = Config.SERVER_CONNECTION_LIMIT
+
+
+def worker_exit(server, worker):
+    flush_and_close()
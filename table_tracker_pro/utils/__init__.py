@@ -0,0 +1 @@
+# Utils package initialization
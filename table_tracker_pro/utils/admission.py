@@ -0,0 +1,220 @@
+import threading
+import time
+from flask import g, jsonify, request, Response
+from flask_login import current_user
+from config import Config
+
+READ_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+
+# Streamed responses hold their slot until the client has read them all
+STREAM_ENDPOINTS = {'api.download_export', 'api.customer_history'}
+
+# Endpoints whose POSTs are rate limited per username as logins
+LOGIN_ENDPOINTS = {'auth.login', 'api.issue_token'}
+
+
+class Pool:
+    """A concurrency limit with a short bounded queue; waiters give up at a deadline"""
+
+    def __init__(self, name, limit, queue_size, queue_timeout):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.condition = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+        self.peak_active = 0
+        self.admitted = 0
+        self.queued = 0
+        self.shed_queue_full = 0
+        self.shed_timeout = 0
+
+    def acquire(self):
+        """Take a slot; returns None when admitted, or the reason the request was shed"""
+        with self.condition:
+            if self.active >= self.limit:
+                if self.waiting >= self.queue_size:
+                    self.shed_queue_full += 1
+                    return 'queue full'
+                deadline = time.monotonic() + self.queue_timeout
+                self.waiting += 1
+                self.queued += 1
+                try:
+                    while self.active >= self.limit:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.shed_timeout += 1
+                            if self.active < self.limit:
+                                # A release woke us just as we timed out; pass it on
+                                self.condition.notify()
+                            return 'queue timeout'
+                        self.condition.wait(remaining)
+                finally:
+                    self.waiting -= 1
+            self.active += 1
+            self.admitted += 1
+            self.peak_active = max(self.peak_active, self.active)
+            return None
+
+    def release(self):
+        with self.condition:
+            self.active -= 1
+            self.condition.notify()
+
+    def status(self):
+        with self.condition:
+            return {
+                'limit': self.limit,
+                'active': self.active,
+                'waiting': self.waiting,
+                'peak_active': self.peak_active,
+                'admitted': self.admitted,
+                'queued': self.queued,
+                'shed_queue_full': self.shed_queue_full,
+                'shed_timeout': self.shed_timeout
+            }
+
+
+class TokenBucket:
+    __slots__ = ('tokens', 'updated')
+
+    def __init__(self, burst, now):
+        self.tokens = float(burst)
+        self.updated = now
+
+
+class RateLimiter:
+    """Per-key token buckets: `rate` tokens per second refill up to `burst`"""
+
+    def __init__(self, name, rate, burst, max_keys=10000):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.lock = threading.Lock()
+        self.buckets = {}
+        self.allowed = 0
+        self.limited = 0
+
+    def take(self, key):
+        """Spend one token for key; returns 0 if allowed, else seconds until the next token"""
+        now = time.monotonic()
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                if len(self.buckets) >= self.max_keys:
+                    self._prune(now)
+                bucket = self.buckets[key] = TokenBucket(self.burst, now)
+            else:
+                bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+                bucket.updated = now
+
+            if bucket.tokens >= 1:
+                bucket.tokens -= 1
+                self.allowed += 1
+                return 0
+            self.limited += 1
+            return (1 - bucket.tokens) / self.rate
+
+    def _prune(self, now):
+        # Buckets that have refilled completely carry no state worth keeping
+        full_after = self.burst / self.rate
+        for key in [key for key, bucket in self.buckets.items() if now - bucket.updated >= full_after]:
+            del self.buckets[key]
+
+    def status(self):
+        with self.lock:
+            return {'rate': self.rate, 'burst': self.burst, 'keys': len(self.buckets),
+                    'allowed': self.allowed, 'limited': self.limited}
+
+
+class AdmissionController:
+    """Bounds concurrent API work and sheds overload early with 503 + Retry-After.
+
+    Reads and writes get separate pools, so writers queued behind SQLite's
+    write lock cannot starve the cheap snapshot reads; streamed downloads
+    have a pool of their own, so slow clients cannot sit on the read slots.
+    A request that cannot get a slot within the queue timeout is turned
+    away instead of holding a server thread until the client gives up.
+    Logins and writes are also rate limited per user.
+    """
+
+    def __init__(self):
+        self.pools = {
+            'read': Pool('read', Config.ADMISSION_READ_LIMIT, Config.ADMISSION_READ_QUEUE,
+                         Config.ADMISSION_QUEUE_TIMEOUT),
+            'write': Pool('write', Config.ADMISSION_WRITE_LIMIT, Config.ADMISSION_WRITE_QUEUE,
+                          Config.ADMISSION_QUEUE_TIMEOUT),
+            'stream': Pool('stream', Config.ADMISSION_STREAM_LIMIT, Config.ADMISSION_STREAM_QUEUE,
+                           Config.ADMISSION_QUEUE_TIMEOUT)
+        }
+        self.limiters = {
+            'login': RateLimiter('login', Config.RATE_LIMIT_LOGIN_PER_MINUTE / 60.0, Config.RATE_LIMIT_LOGIN_BURST),
+            'write': RateLimiter('write', Config.RATE_LIMIT_WRITES_PER_SECOND, Config.RATE_LIMIT_WRITES_BURST)
+        }
+
+    def _reject(self, status, message, retry_after):
+        retry_after = max(1, int(retry_after + 0.999))
+        if request.path.startswith('/api/'):
+            response = jsonify({'success': False, 'error': message, 'retry_after': retry_after})
+            response.status_code = status
+        else:
+            response = Response(message + '\n', status=status, mimetype='text/plain')
+        response.headers['Retry-After'] = str(retry_after)
+        return response
+
+    def _user_key(self):
+        if current_user.is_authenticated:
+            return current_user.username
+        return request.remote_addr or 'unknown'
+
+    def admit(self):
+        """Rate limit, then take a read or write slot (None if admitted, else the rejection)"""
+        if request.method == 'POST' and request.endpoint in LOGIN_ENDPOINTS:
+            username = (request.form.get('username') or (request.get_json(silent=True) or {}).get('username') or '')
+            wait = self.limiters['login'].take(f"{username.strip().lower()}@{request.remote_addr}")
+            if wait:
+                print(f"🚦 Login rate limit hit for {username!r} from {request.remote_addr}")
+                return self._reject(429, 'Too many login attempts, try again shortly', wait)
+            return None
+
+        if not request.path.startswith('/api/'):
+            return None
+
+        kind = 'read' if request.method in READ_METHODS else 'write'
+        if kind == 'read' and request.endpoint in STREAM_ENDPOINTS:
+            kind = 'stream'
+        if kind == 'write':
+            wait = self.limiters['write'].take(self._user_key())
+            if wait:
+                return self._reject(429, 'Too many changes, slow down', wait)
+
+        pool = self.pools[kind]
+        reason = pool.acquire()
+        if reason:
+            print(f"🚦 Shed {request.method} {request.path}: {kind} {reason}")
+            return self._reject(503, f'Server busy ({reason}), retry shortly', Config.ADMISSION_RETRY_AFTER)
+        g.admission_pool = pool
+        return None
+
+    def status(self):
+        return {
+            'pools': {name: pool.status() for name, pool in self.pools.items()},
+            'rate_limits': {name: limiter.status() for name, limiter in self.limiters.items()}
+        }
+
+    def init_app(self, app):
+        @app.before_request
+        def admit_request():
+            return self.admit()
+
+        @app.teardown_request
+        def release_slot(exc):
+            # Streamed responses hold their slot until the stream is closed
+            pool = g.pop('admission_pool', None)
+            if pool is not None:
+                pool.release()
+
+
+admission = AdmissionController()
@@ -0,0 +1,57 @@
+import gzip
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+from config import Config
+from utils.serialization import JSON_BACKEND, dumps, dumps_bytes, loads
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson when installed, stdlib json otherwise"""
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj)
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        # Encode straight to bytes instead of str -> bytes via the default provider
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj), mimetype=self.mimetype)
+
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/html', 'text/plain', 'text/css', 'application/javascript')
+
+
+def init_compression(app):
+    """Gzip responses above Config.COMPRESS_MIN_SIZE when the client accepts it"""
+
+    @app.after_request
+    def compress_response(response):
+        if (response.direct_passthrough or response.is_streamed
+                or response.status_code < 200 or response.status_code in (204, 304)
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_TYPES):
+            return response
+
+        if not request.accept_encodings['gzip']:
+            return response
+
+        data = response.get_data()
+        if len(data) < Config.COMPRESS_MIN_SIZE:
+            return response
+
+        response.set_data(gzip.compress(data, compresslevel=Config.COMPRESS_LEVEL))
+        response.headers['Content-Encoding'] = 'gzip'
+        response.vary.add('Accept-Encoding')
+        return response
+
+    return app
+
+
+def init_json(app):
+    """Register the fast JSON provider and response compression on the app"""
+    app.json = FastJSONProvider(app)
+    init_compression(app)
+    print(f"⚡ JSON provider: {JSON_BACKEND}, gzip above {Config.COMPRESS_MIN_SIZE} bytes")
+    return app
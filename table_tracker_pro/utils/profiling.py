@@ -0,0 +1,210 @@
+import cProfile
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+from flask import g, request
+from config import Config
+
+
+def _output_path(prefix, extension):
+    os.makedirs(Config.PROFILE_DIR, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    return os.path.join(Config.PROFILE_DIR, f"{prefix}_{timestamp}.{extension}")
+
+
+class RouteProfiler:
+    """cProfile the next N requests to chosen endpoints, one .pstats file each.
+
+    Only one profile runs at a time (Python 3.12+ refuses to enable a second
+    profiler); requests arriving while one is running are served unprofiled
+    and do not use up the count.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.remaining = {}
+        self.active = False
+
+    def arm(self, endpoint, count):
+        with self.lock:
+            self.remaining[endpoint] = count
+        print(f"🔬 Profiling next {count} requests to {endpoint}")
+
+    def status(self):
+        with self.lock:
+            return dict(self.remaining)
+
+    def _claim(self, endpoint):
+        with self.lock:
+            left = self.remaining.get(endpoint, 0)
+            if left <= 0 or self.active:
+                return False
+            self.active = True
+            if left == 1:
+                del self.remaining[endpoint]
+            else:
+                self.remaining[endpoint] = left - 1
+            return True
+
+    def _release(self):
+        with self.lock:
+            self.active = False
+
+    def init_app(self, app):
+        @app.before_request
+        def start_route_profile():
+            if self.remaining and request.endpoint and self._claim(request.endpoint):
+                g.route_profile = cProfile.Profile()
+                try:
+                    g.route_profile.enable()
+                except ValueError as e:
+                    # Another profiler (not ours) is already running
+                    g.pop('route_profile')
+                    self._release()
+                    print(f"⚠️ Route profile skipped: {e}")
+
+        @app.teardown_request
+        def finish_route_profile(exc):
+            profile = g.pop('route_profile', None)
+            if profile is None:
+                return
+            profile.disable()
+            self._release()
+            path = _output_path(f"route_{request.endpoint.replace('.', '_')}", 'pstats')
+            profile.dump_stats(path)
+            print(f"🔬 Profile written: {os.path.basename(path)}")
+
+
+class StackSampler:
+    """Low-overhead whole-process sampler producing collapsed (flamegraph) stacks"""
+
+    def __init__(self):
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.samples = Counter()
+        self.sample_count = 0
+        self.started_at = None
+        self.interval = Config.PROFILE_SAMPLE_INTERVAL
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, interval=None, duration=None):
+        if self.running:
+            return False
+        self.interval = interval or Config.PROFILE_SAMPLE_INTERVAL
+        self.samples = Counter()
+        self.sample_count = 0
+        self.started_at = time.time()
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, args=(duration,), name='stack-sampler', daemon=True)
+        self.thread.start()
+        print(f"🔬 Stack sampler started every {self.interval * 1000:.0f}ms")
+        return True
+
+    def _run(self, duration):
+        own_id = threading.get_ident()
+        deadline = time.monotonic() + duration if duration else None
+        while not self.stop_event.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.samples[';'.join(reversed(stack))] += 1
+            self.sample_count += 1
+            if deadline and time.monotonic() >= deadline:
+                break
+
+    def stop(self):
+        """Stop sampling and write the collapsed-stack file, returning its path"""
+        if self.thread is None:
+            return None
+        self.stop_event.set()
+        self.thread.join()
+        self.thread = None
+
+        path = _output_path('sampler', 'collapsed')
+        with open(path, 'w') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        print(f"🔬 Stack sampler stopped after {self.sample_count} samples: {os.path.basename(path)}")
+        return path
+
+    def status(self):
+        return {
+            'running': self.running,
+            'interval': self.interval,
+            'samples': self.sample_count,
+            'started_at': self.started_at
+        }
+
+
+class MemoryProfiler:
+    """tracemalloc snapshots with top allocations and a diff against the previous one"""
+
+    def __init__(self):
+        self.previous = None
+
+    def snapshot(self, limit=25):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(Config.TRACEMALLOC_FRAMES)
+            print("🔬 tracemalloc started")
+
+        current = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ))
+        top = current.statistics('lineno')[:limit]
+        diff = current.compare_to(self.previous, 'lineno')[:limit] if self.previous else []
+        self.previous = current
+
+        path = _output_path('memory', 'txt')
+        with open(path, 'w') as f:
+            f.write(f"TOP {limit} ALLOCATIONS\n")
+            for stat in top:
+                f.write(f"{stat}\n")
+            if diff:
+                f.write(f"\nTOP {limit} CHANGES SINCE PREVIOUS SNAPSHOT\n")
+                for stat in diff:
+                    f.write(f"{stat}\n")
+
+        traced, peak = tracemalloc.get_traced_memory()
+        return {
+            'file': os.path.basename(path),
+            'traced_bytes': traced,
+            'peak_bytes': peak,
+            'top': [str(stat) for stat in top],
+            'diff': [str(stat) for stat in diff]
+        }
+
+    def stop(self):
+        self.previous = None
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+            print("🔬 tracemalloc stopped")
+
+
+def list_profile_files():
+    if not os.path.isdir(Config.PROFILE_DIR):
+        return []
+    files = []
+    for name in sorted(os.listdir(Config.PROFILE_DIR), reverse=True):
+        path = os.path.join(Config.PROFILE_DIR, name)
+        files.append({'name': name, 'size': os.path.getsize(path)})
+    return files
+
+
+route_profiler = RouteProfiler()
+stack_sampler = StackSampler()
+memory_profiler = MemoryProfiler()
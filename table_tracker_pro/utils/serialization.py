@@ -0,0 +1,39 @@
+import json
+from datetime import date, datetime
+from types import MappingProxyType
+
+try:
+    import orjson
+except ImportError:  # orjson is optional - fall back to the standard library
+    orjson = None
+
+JSON_BACKEND = 'orjson' if orjson else 'json'
+
+
+def _default(obj):
+    """Encode the non-JSON types that appear in table and customer payloads"""
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, MappingProxyType):
+        return dict(obj)
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps_bytes(obj):
+    """Serialize to compact UTF-8 JSON bytes"""
+    if orjson:
+        # Table dicts are keyed by int table id
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def dumps(obj):
+    return dumps_bytes(obj).decode('utf-8')
+
+
+def loads(data):
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
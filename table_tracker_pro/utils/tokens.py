@@ -0,0 +1,141 @@
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from config import Config
+from utils.serialization import dumps_bytes, loads
+
+
+def _b64encode(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b'=')
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + b'=' * (-len(text) % 4))
+
+
+class TokenSigner:
+    """Short-lived HMAC-SHA256 bearer tokens: base64(claims).base64(signature).
+
+    Claims carry the username and role, so a verified token is a complete
+    login with no session or users.json read. Revocation is an in-memory
+    deny-list of token ids, each kept only until that token would have
+    expired anyway, plus a per-user cutoff that voids every token issued
+    before it (user removed). Neither survives a restart; the short TTL
+    bounds how long a revoked token could come back.
+    """
+
+    def __init__(self, secret=None, ttl_minutes=None):
+        self.secret = secret
+        self.mac = None
+        self.ttl = (ttl_minutes or Config.API_TOKEN_TTL_MINUTES) * 60
+        self.lock = threading.Lock()
+        # Replaced, never mutated, so verify() reads them without the lock
+        self.denied = {}
+        self.user_cutoffs = {}
+
+    def _secret(self):
+        secret = self.secret or Config.API_TOKEN_SECRET
+        if secret:
+            return secret.encode('utf-8')
+        # No configured secret: a random key, created once and shared by every process.
+        # Written to a private temp file, then linked into place so no one reads a partial key
+        path = Config.API_TOKEN_KEY_FILE
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(secrets.token_bytes(32))
+                f.flush()
+                os.fsync(f.fileno())
+            try:
+                os.link(tmp_path, path)
+                print(f"🔑 Generated API token key: {path}")
+            except FileExistsError:
+                pass
+            finally:
+                os.remove(tmp_path)
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def _keyed_mac(self):
+        if self.mac is None:
+            with self.lock:
+                if self.mac is None:
+                    key = hmac.new(self._secret(), b'table-tracker-api-token', hashlib.sha256).digest()
+                    # Keyed once; each signature copies it instead of re-keying
+                    self.mac = hmac.new(key, digestmod=hashlib.sha256)
+        return self.mac
+
+    def _sign(self, payload):
+        mac = self._keyed_mac().copy()
+        mac.update(payload)
+        return _b64encode(mac.digest())
+
+    def issue(self, username, role):
+        """Return (token, claims) for a freshly authenticated user"""
+        now = time.time()
+        claims = {
+            'sub': username,
+            'role': role,
+            'iat': round(now, 3),
+            'exp': int(now + self.ttl),
+            'jti': secrets.token_urlsafe(12)
+        }
+        payload = _b64encode(dumps_bytes(claims))
+        return (payload + b'.' + self._sign(payload)).decode('ascii'), claims
+
+    def verify(self, token):
+        """Claims of a valid, unexpired, unrevoked token, else None"""
+        try:
+            payload, signature = token.encode('ascii').split(b'.')
+        except (AttributeError, UnicodeEncodeError, ValueError):
+            return None
+        if not hmac.compare_digest(self._sign(payload), signature):
+            return None
+        try:
+            claims = loads(_b64decode(payload))
+        except ValueError:
+            return None
+
+        if claims['exp'] <= time.time() or claims['jti'] in self.denied:
+            return None
+        cutoff = self.user_cutoffs.get(claims['sub'])
+        if cutoff is not None and claims['iat'] <= cutoff:
+            return None
+        return claims
+
+    def verify_header(self, authorization):
+        """Verify an `Authorization: Bearer <token>` header value"""
+        if not authorization:
+            return None
+        scheme, _, token = authorization.partition(' ')
+        if scheme.lower() != 'bearer':
+            return None
+        return self.verify(token.strip())
+
+    def revoke(self, token_id, expires):
+        with self.lock:
+            now = time.time()
+            denied = {jti: exp for jti, exp in self.denied.items() if exp > now}
+            denied[token_id] = expires
+            self.denied = denied
+
+    def revoke_user(self, username):
+        """Void every token issued to username so far"""
+        with self.lock:
+            cutoffs = {user: cutoff for user, cutoff in self.user_cutoffs.items()
+                       if cutoff > time.time() - self.ttl}
+            cutoffs[username] = round(time.time(), 3)
+            self.user_cutoffs = cutoffs
+
+    def status(self):
+        return {'ttl_minutes': self.ttl // 60, 'revoked': len(self.denied),
+                'revoked_users': len(self.user_cutoffs)}
+
+
+token_signer = TokenSigner()
@@ -0,0 +1,225 @@
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from config import Config
+
+_local = threading.local()
+
+
+class Trace:
+    """One request's spans, timed relative to the request start"""
+
+    def __init__(self, trace_id, name):
+        self.trace_id = trace_id
+        self.name = name
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.duration_ms = None
+        self.status = None
+        self.spans = []
+        self.depth = 0
+
+    def to_dict(self):
+        return {
+            'trace_id': self.trace_id,
+            'name': self.name,
+            'started_at': self.started_at,
+            'duration_ms': self.duration_ms,
+            'status': self.status,
+            'spans': self.spans
+        }
+
+
+class Tracer:
+    """Per-request traces kept in a ring buffer, slow ones appended to a JSONL file"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # Only orders appends to the slow log, so disk writes never hold up self.lock
+        self.log_lock = threading.Lock()
+        self.recent = deque(maxlen=Config.TRACE_BUFFER_SIZE)
+        self.slow = deque(maxlen=Config.TRACE_BUFFER_SIZE)
+
+    def begin(self, name, trace_id=None):
+        trace = Trace(trace_id or uuid.uuid4().hex[:16], name)
+        _local.trace = trace
+        return trace
+
+    def finish(self, error=None):
+        trace = getattr(_local, 'trace', None)
+        if trace is None:
+            return None
+        _local.trace = None
+        trace.duration_ms = round((time.perf_counter() - trace.start) * 1000, 3)
+        if error is not None:
+            trace.status = f"error: {type(error).__name__}"
+
+        slow = trace.duration_ms >= Config.TRACE_SLOW_MS
+        # The trace is complete, so its record can be built outside the lock
+        record = json.dumps(trace.to_dict()) + "\n" if slow else None
+        with self.lock:
+            self.recent.append(trace)
+            if slow:
+                self.slow.append(trace)
+        if slow:
+            self._dump_slow(record)
+        return trace
+
+    def _dump_slow(self, record):
+        try:
+            os.makedirs(os.path.dirname(Config.TRACE_SLOW_LOG), exist_ok=True)
+            with self.log_lock, open(Config.TRACE_SLOW_LOG, 'a') as f:
+                f.write(record)
+        except OSError as e:
+            print(f"⚠️ Could not write slow trace: {e}")
+
+    def find(self, trace_id):
+        with self.lock:
+            for trace in reversed(self.recent):
+                if trace.trace_id == trace_id:
+                    return trace
+        return None
+
+    def list(self, slow_only=False, limit=50):
+        with self.lock:
+            traces = list(self.slow if slow_only else self.recent)
+        return [
+            {'trace_id': t.trace_id, 'name': t.name, 'started_at': t.started_at,
+             'duration_ms': t.duration_ms, 'status': t.status, 'span_count': len(t.spans)}
+            for t in reversed(traces[-limit:])
+        ]
+
+
+tracer = Tracer()
+
+
+def current_trace_id():
+    trace = getattr(_local, 'trace', None)
+    return trace.trace_id if trace else None
+
+
+class span:
+    """Time a block inside the current request's trace (no-op outside a request)"""
+
+    def __init__(self, name, **attrs):
+        self.name = name
+        self.attrs = attrs
+        self.trace = None
+
+    def __enter__(self):
+        self.trace = getattr(_local, 'trace', None)
+        if self.trace is not None:
+            self.start = time.perf_counter()
+            self.depth = self.trace.depth
+            self.trace.depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        trace = self.trace
+        if trace is None:
+            return False
+        trace.depth -= 1
+        if len(trace.spans) < Config.TRACE_MAX_SPANS:
+            entry = {
+                'name': self.name,
+                'offset_ms': round((self.start - trace.start) * 1000, 3),
+                'duration_ms': round((time.perf_counter() - self.start) * 1000, 3),
+                'depth': self.depth
+            }
+            if self.attrs:
+                entry['attrs'] = self.attrs
+            if exc_type is not None:
+                entry['error'] = exc_type.__name__
+            trace.spans.append(entry)
+        return False
+
+
+def traced(name=None):
+    """Decorator wrapping a function or method call in a span"""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if getattr(_local, 'trace', None) is None:
+                return func(*args, **kwargs)
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _statement_name(sql):
+    words = sql.split(None, 3)
+    return 'sql ' + ' '.join(words[:3]) if words else 'sql'
+
+
+class TracedCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        with span(_statement_name(sql), sql=' '.join(sql.split())[:200]):
+            return super().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        with span(_statement_name(sql), sql=' '.join(sql.split())[:200], many=True):
+            return super().executemany(sql, seq_of_parameters)
+
+
+class TracedConnection(sqlite3.Connection):
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def commit(self):
+        with span('sql COMMIT'):
+            return super().commit()
+
+
+def connect(path, **kwargs):
+    """sqlite3.connect whose statements show up as spans in the current trace"""
+    return sqlite3.connect(path, factory=TracedConnection, **kwargs)
+
+
+def waterfall(trace):
+    """Render a trace's spans as text bars scaled to the request duration"""
+    total = trace.duration_ms or 1
+    width = 50
+    lines = [f"{trace.name}  {trace.trace_id}  {trace.duration_ms:.1f}ms"]
+    for entry in sorted(trace.spans, key=lambda s: s['offset_ms']):
+        start = int(entry['offset_ms'] / total * width)
+        length = max(1, int(entry['duration_ms'] / total * width))
+        bar = ' ' * start + '█' * length
+        label = '  ' * entry['depth'] + entry['name']
+        lines.append(f"{bar:<{width + 1}} {entry['duration_ms']:8.2f}ms  {label}")
+    return "\n".join(lines)
+
+
+def init_tracing(app):
+    """Trace every request, honouring an incoming X-Request-ID header"""
+    from flask import request
+
+    @app.before_request
+    def start_trace():
+        incoming = request.headers.get('X-Request-ID', '')
+        trace_id = incoming[:64] if incoming.replace('-', '').isalnum() else None
+        tracer.begin(f"{request.method} {request.path}", trace_id)
+
+    @app.after_request
+    def tag_response(response):
+        trace = getattr(_local, 'trace', None)
+        if trace is not None:
+            trace.status = response.status_code
+            response.headers['X-Request-ID'] = trace.trace_id
+        return response
+
+    @app.teardown_request
+    def end_trace(exc):
+        tracer.finish(exc)
+
+    return app